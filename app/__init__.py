@@ -1,39 +1,53 @@
 import logging
 from app.commands import Command, CommandHandler
-from app.commands.add import AddCommand
-from app.commands.subtract import SubtractCommand
-from app.commands.multiply import MultiplyCommand
-from app.commands.divide import DivideCommand
 
-# Configure the logger
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured once by app.logging_setup.configure_logging
 logger = logging.getLogger(__name__)
 
+# Built-in commands, registered lazily: a command's module is only imported
+# the first time the command is executed
+COMMANDS = {
+    "add": "app.commands.add:AddCommand",
+    "subtract": "app.commands.subtract:SubtractCommand",
+    "multiply": "app.commands.multiply:MultiplyCommand",
+    "divide": "app.commands.divide:DivideCommand",
+}
+# Commands that are constructed with the handler they report on
+HANDLER_COMMANDS = {
+    "stats": "app.commands.stats:StatsCommand",
+}
+
+# Other names of the built-in commands; unambiguous abbreviations ("mul") need none
+ALIASES = {
+    "+": "add",
+    "-": "subtract",
+    "*": "multiply",
+    "/": "divide",
+}
+
 # Initialize the CommandHandler
 command_handler = CommandHandler()
 
-# Register all available commands with logging
-def register_commands():
-    try:
-        logger.info("Registering commands...")
-        
-        command_handler.Register_Command("add", AddCommand())
-        logger.info("Command 'add' registered.")
-        
-        command_handler.Register_Command("subtract", SubtractCommand())
-        logger.info("Command 'subtract' registered.")
-        
-        command_handler.Register_Command("multiply", MultiplyCommand())
-        logger.info("Command 'multiply' registered.")
-        
-        command_handler.Register_Command("divide", DivideCommand())
-        logger.info("Command 'divide' registered.")
-    
-    except Exception as e:
-        logger.error(f"Error during command registration: {e}")
-
-# Call the register_commands function to register commands
+# Register all available commands without importing them
+def register_commands(handler=command_handler):
+    for command_name, target in COMMANDS.items():
+        handler.register_lazy(command_name, target)
+    for command_name, target in HANDLER_COMMANDS.items():
+        handler.register_lazy(command_name, target, handler)
+    for alias, command_name in ALIASES.items():
+        handler.register_alias(alias, command_name)
+    logger.debug("Registered commands: %s", ", ".join([*COMMANDS, *HANDLER_COMMANDS]))
+    return handler
+
 register_commands()
 
-# Expose relevant components for external use
-__all__ = ["command_handler", "Command"]
+def __getattr__(name):
+    # AddCommand and friends stay importable from app, but are only loaded on access
+    for target in [*COMMANDS.values(), *HANDLER_COMMANDS.values()]:
+        module_name, _, class_name = target.partition(":")
+        if class_name == name:
+            from importlib import import_module
+            return getattr(import_module(module_name), class_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = ["command_handler", "Command", "CommandHandler", "register_commands"]
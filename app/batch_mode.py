@@ -0,0 +1,127 @@
+'''
+Streaming, non-interactive batch mode.
+
+Reads "command arg arg ..." lines, evaluates each one with the
+CommandHandler and writes one output line per input line, in input order.
+Every stage is a generator, so input is consumed lazily and memory stays
+constant no matter how large the input is:
+
+    read_lines -> parse_lines -> evaluate_lines -> write_results
+
+Blank lines and lines starting with '#' are skipped. A line may be a
+pipeline, "add 1 2 | multiply 3", evaluated with
+CommandHandler.evaluate_pipeline. Errors are reported on the error stream
+with their line number and written to the output as "Error: <message>" so
+output lines still line up with input commands.
+'''
+import time
+from collections import deque
+from decimal import Decimal
+from fractions import Fraction
+from typing import Iterable, Iterator, NamedTuple, Optional, TextIO, Tuple
+
+from app.pipeline import PIPE, split_pipe
+
+# Output is collected into chunks of this many lines before each write()
+WRITE_CHUNK_LINES = 4096
+
+
+class BatchSummary(NamedTuple):
+    '''Totals reported at the end of a batch run.'''
+    lines: int
+    errors: int
+    seconds: float
+
+    def __str__(self):
+        rate = self.lines / self.seconds if self.seconds else float("inf")
+        return f"Processed {self.lines} commands ({self.errors} errors) in {self.seconds:.3f}s ({rate:,.0f} commands/s)"
+
+
+def format_result(result) -> str:
+    '''str(result), also for exact results past Python's int/str digit limit (sys.get_int_max_str_digits).'''
+    try:
+        return str(result)
+    except ValueError:
+        if isinstance(result, Fraction):
+            return f"{format_result(result.numerator)}/{format_result(result.denominator)}"
+        if isinstance(result, int):
+            return str(Decimal(result))  # Decimal formats any number of digits, in subquadratic time
+        raise
+
+
+def parse_lines(lines: Iterable[str]) -> Iterator[Tuple[int, str, list]]:
+    '''Yield (line_number, command_name, args) for each non-blank, non-comment line.'''
+    for line_number, line in enumerate(lines, start=1):
+        # Pipes become tokens of their own; evaluate_one spots them among the args
+        fields = line.split() if PIPE not in line else split_pipe(line)
+        if not fields or fields[0].startswith("#"):
+            continue
+        yield line_number, fields[0].lower(), fields[1:]
+
+
+def evaluate_one(command_handler, command_name: str, args) -> Tuple[object, Optional[str]]:
+    '''Evaluate one command, returning (result, None) or (None, error_message).'''
+    try:
+        # Any PIPE token makes a pipeline, a leading one too ("| add 1": an empty first stage)
+        if command_name == PIPE or PIPE in args:
+            return command_handler.evaluate_pipeline((command_name, *args)), None
+        return command_handler.evaluate(command_name, *args), None
+    except KeyError as e:
+        return None, e.args[0]
+    except (ValueError, TypeError, ArithmeticError) as e:
+        return None, str(e)
+
+
+def evaluate_lines(command_handler, parsed: Iterable[Tuple[int, str, list]]) -> Iterator[Tuple[int, object, Optional[str]]]:
+    '''Yield (line_number, result, error_message) for each parsed command.'''
+    for line_number, command_name, args in parsed:
+        yield (line_number, *evaluate_one(command_handler, command_name, args))
+
+
+def parallel_evaluate_lines(executor, parsed: Iterable[Tuple[int, str, list]]) -> Iterator[Tuple[int, object, Optional[str]]]:
+    '''Like evaluate_lines, but evaluates on a ParallelExecutor's worker processes.'''
+    line_numbers = deque()
+
+    def invocations():
+        for line_number, command_name, args in parsed:
+            line_numbers.append(line_number)
+            yield command_name, args
+
+    # The executor returns results in submission order, so line numbers pair up FIFO
+    for result, error in executor.map(invocations()):
+        yield line_numbers.popleft(), result, error
+
+
+def write_results(results: Iterable[Tuple[int, object, Optional[str]]], out: TextIO, err: TextIO) -> Tuple[int, int]:
+    '''Write results in chunks; returns (commands, errors).'''
+    chunk = []
+    commands = errors = 0
+    for line_number, result, error in results:
+        commands += 1
+        if error is not None:
+            errors += 1
+            err.write(f"line {line_number}: {error}\n")
+            chunk.append(f"Error: {error}\n")
+        else:
+            chunk.append(f"{format_result(result)}\n")
+        if len(chunk) >= WRITE_CHUNK_LINES:
+            out.write("".join(chunk))
+            chunk.clear()
+    out.write("".join(chunk))
+    out.flush()
+    return commands, errors
+
+
+def run_batch(command_handler, lines: Iterable[str], out: TextIO, err: TextIO, executor=None) -> BatchSummary:
+    '''Run every command in lines through the handler and return a summary.
+
+    With an executor (see app.parallel), commands are evaluated on its
+    worker processes instead of by command_handler.'''
+    started = time.perf_counter()
+    parsed = parse_lines(lines)
+    if executor is None:
+        results = evaluate_lines(command_handler, parsed)
+    else:
+        results = parallel_evaluate_lines(executor, parsed)
+    commands, errors = write_results(results, out, err)
+    return BatchSummary(commands, errors, time.perf_counter() - started)
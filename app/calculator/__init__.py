@@ -23,20 +23,112 @@ This code demonstrates effective use of object-oriented and functional programmi
 from app.calculator.calculations import Calculations  # Manages history of calculations
 from app.calculator.operations import add, subtract, multiply, divide  # Arithmetic operations
 from app.calculator.calculation import Calculation  # Represents a single calculation
+from app.calculator.journal import Journal, replay_frames  # Optional on-disk persistence of the history
+from app.calculator.cache import OperationCache  # Optional memoization of operation results
+from app.calculator.sessions import history_context  # The history to record into: Calculations or a Session
+from app.numeric import BackendSpec, NumericBackend, get_backend  # Selectable number types
+import atexit  # To flush the journal's last group commit on exit
 from decimal import Decimal  # For high-precision arithmetic
-from typing import Callable  # For type hinting callable objects
+from typing import Callable, Optional  # For type hinting callable objects
 
 # Definition of the Calculator class
 class Calculator:
+    # Journal that every performed calculation is appended to; None keeps history in memory only
+    journal: Optional[Journal] = None
+    # Memoization cache for operation results; None (the default) computes every time
+    cache: Optional[OperationCache] = None
+    # Numeric backend operands are coerced to (see app.numeric); None takes the operands as given
+    backend: Optional[NumericBackend] = None
+
+    @staticmethod
+    def use_backend(spec: Optional[BackendSpec]) -> Optional[NumericBackend]:
+        """Coerce operands with a numeric backend ("float", "decimal", "fraction", "auto" or an instance); None turns it off."""
+        Calculator.backend = get_backend(spec) if spec is not None else None
+        return Calculator.backend
+
+    @staticmethod
+    def enable_cache(maxsize: int = 4096, ttl: Optional[float] = None) -> OperationCache:
+        """Start memoizing operation results with an LRU (and optional TTL) cache."""
+        Calculator.cache = OperationCache(maxsize=maxsize, ttl=ttl)
+        return Calculator.cache
+
+    @staticmethod
+    def disable_cache():
+        """Stop memoizing and drop the cache."""
+        Calculator.cache = None
+
+    @staticmethod
+    def open_journal(path: str, sync: str = "group", group_size: int = 256) -> int:
+        """Replay a journal into the history, then record new calculations to it. Returns the replay count.
+
+        A bounded history (CompactHistory) only gets, and counts, the newest calculations it can hold."""
+        Calculator.close_journal()
+        count = Calculations.load(replay_frames(path, getattr(Calculations.history, "capacity", None)))
+        Calculator.journal = Journal(path, sync=sync, group_size=group_size)
+        atexit.unregister(Calculator.close_journal)
+        atexit.register(Calculator.close_journal)
+        return count
+
+    @staticmethod
+    def close_journal():
+        """Flush and detach the journal, if one is open."""
+        if Calculator.journal is not None:
+            Calculator.journal.close()
+            Calculator.journal = None
+
+    @staticmethod
+    def compact_journal():
+        """Rewrite the open journal as a snapshot of the current history."""
+        if Calculator.journal is not None:
+            Calculator.journal.compact(Calculations.get_history())
+
     @staticmethod
     def _perform_operation(a: Decimal, b: Decimal, operation: Callable[[Decimal, Decimal], Decimal]) -> Decimal:
         """Create and perform a calculation, then return the result."""
+        backend = Calculator.backend
+        if backend is not None:
+            # Coerce the operands and compute under the backend's context (e.g. its Decimal precision)
+            a, b = backend.coerce(a), backend.coerce(b)
+            with backend.context():
+                return Calculator._record(a, b, operation)
+        return Calculator._record(a, b, operation)
+
+    @staticmethod
+    def _record(a: Decimal, b: Decimal, operation: Callable[[Decimal, Decimal], Decimal]) -> Decimal:
+        """Perform a calculation (through the cache, if any), record it and return the result."""
         # Create a Calculation object using the static create method, passing in operands and the operation
         calculation = Calculation.create(a, b, operation)
-        # Add the calculation to the history managed by the Calculations class
-        Calculations.add_calculation(calculation)
-        # Perform the calculation and return the result
-        return calculation.perform()
+        try:
+            # Perform it before recording, so the history holds the computed result and never recomputes it
+            if Calculator.cache is None:
+                result = calculation.perform()
+            else:
+                # Reuse a cached result when memoizing; on a hit the calculation is built with that result
+                result = Calculator.cache.lookup(operation, a, b, calculation.perform)
+                if not calculation.evaluated:
+                    calculation = Calculation(a, b, operation, result)
+        finally:
+            # Add the calculation to the active history (Calculations, or the current Session), even if it raised
+            Calculator._add_to_history(calculation)
+        return result
+
+    @staticmethod
+    def _add_to_history(calculation: Calculation):
+        """Record a calculation in the active history; the journal only persists the shared one."""
+        history = history_context.get()
+        history.add_calculation(calculation)
+        # Persist it as well when a journal is open
+        if Calculator.journal is not None and history is Calculations:
+            Calculator.journal.append(calculation)
+
+    @staticmethod
+    def defer(a: Decimal, b: Decimal, operation: Callable[[Decimal, Decimal], Decimal]) -> Calculation:
+        """Record a calculation without evaluating it; its result is computed on the first perform()."""
+        if Calculator.backend is not None:
+            a, b = Calculator.backend.coerce(a), Calculator.backend.coerce(b)
+        calculation = Calculation.create(a, b, operation)
+        Calculator._add_to_history(calculation)
+        return calculation
 
     @staticmethod
     def add(a: Decimal, b: Decimal) -> Decimal:
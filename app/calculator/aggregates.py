@@ -0,0 +1,253 @@
+'''
+Running aggregates over a Calculations history.
+
+HistoryAggregates keeps, per operation name, the count, sum, minimum and
+maximum of the results, and their mean and variance (Welford's online
+algorithm). Calculations feeds it every batch of calculations it merges into
+history, so reading the aggregates is O(1) however long history is.
+
+Batches are folded in with Chan et al.'s parallel form of Welford's update:
+a batch's own count, mean and sum of squared deviations are computed with
+C-speed builtins, then combined with the running values, instead of paying
+a Python-level update per calculation.
+
+Calculations whose result is not known yet (deferred ones, and ones whose
+operation raised) wait in a pending queue, trimmed to the entries history
+still holds. Calculation.perform hands each one back as soon as its result
+is computed, and it is folded in then, so neither keeping them nor
+summarizing walks the queue. Sum, min and max keep the results' own type (Decimal,
+Fraction, ...); mean and variance are floats. NaN results (and any that
+cannot be compared or converted) have no place in them: they are only
+counted, as "invalid", so one of them can never break a merge.
+'''
+from collections import OrderedDict, deque
+import math
+import operator
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.calculator.calculation import PENDING, result_listeners
+
+
+def _floats(values: list) -> List[float]:
+    try:
+        return list(map(float, values))
+    except OverflowError:
+        # Integers beyond float range count as infinities of their sign
+        return [(math.inf if value > 0 else -math.inf) if abs(value) > 1e308 else float(value) for value in values]
+
+
+def _is_nan(value) -> bool:
+    try:
+        return value != value
+    except ArithmeticError:
+        return True  # a signalling Decimal NaN
+
+
+def _has_nan(values: list) -> bool:
+    '''Whether any value is NaN, the only value not equal to itself; one C-level pass.'''
+    try:
+        return not all(map(operator.eq, values, values))
+    except ArithmeticError:
+        return True
+
+
+class RunningStats:
+    '''Count, sum, min, max, mean and variance of a stream of results.'''
+
+    __slots__ = ("count", "total", "minimum", "maximum", "mean", "m2", "invalid")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.invalid = 0  # NaN (or incomparable) results, left out of everything else
+
+    def add_batch(self, results: list):
+        '''Fold a non-empty list of results in; NaN results are only counted, as invalid.
+
+        Nothing changes if it raises (e.g. for results that do not compare).'''
+        nans = 0
+        if _has_nan(results):
+            numbers = [result for result in results if not _is_nan(result)]
+            nans = len(results) - len(numbers)
+            if not numbers:
+                self.invalid += nans
+                return
+            results = numbers
+        # Everything is computed first and assigned last, so a failure leaves the stats as they were
+        try:
+            total = sum(results, self.total)
+        except TypeError:
+            # Results of incompatible types (e.g. Decimal and float): the sum continues in float
+            total = math.fsum(_floats(results)) + float(self.total)
+        low, high = min(results), max(results)
+        values = _floats(results)
+        batch_count = len(values)
+        batch_mean = math.fsum(values) / batch_count
+        # The Euclidean distance to (mean, mean, ...) is the root of the squared deviations, summed in C
+        batch_m2 = math.dist(values, [batch_mean] * batch_count) ** 2
+        minimum = low if self.minimum is None or low < self.minimum else self.minimum
+        maximum = high if self.maximum is None or high > self.maximum else self.maximum
+
+        self.total, self.minimum, self.maximum = total, minimum, maximum
+        self.invalid += nans
+        count = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.mean += delta * batch_count / count
+        self.m2 += batch_m2 + delta * delta * self.count * batch_count / count
+        self.count = count
+
+    def combine(self, other: "RunningStats"):
+        '''Fold in another RunningStats (Chan et al.'s pairwise update).'''
+        self.invalid += other.invalid
+        if not other.count:
+            return
+        try:
+            self.total = self.total + other.total
+        except TypeError:
+            self.total = float(self.total) + float(other.total)
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self) -> float:
+        '''Sample variance (0.0 below two results).'''
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.mean if self.count else None,
+            "variance": self.variance,
+            "invalid": self.invalid,
+        }
+
+
+class HistoryAggregates:
+    '''RunningStats per operation, plus the calculations still waiting for a result.'''
+
+    def __init__(self):
+        # Keyed by the operation function; summary() reports them by name
+        self.by_operation: Dict[Callable, RunningStats] = {}
+        # Calculations waiting for a result, oldest first (the values are unused)
+        self.pending: OrderedDict = OrderedDict()
+        # Pending calculations evaluated since; Calculation.perform appends them from any thread
+        self.ready = deque()
+        # Calculations added with track=False whose result is not known: only counted
+        self.untracked = 0
+
+    def clear(self):
+        self.by_operation.clear()
+        for calculation in self.pending:
+            result_listeners.pop(calculation, None)
+        self.pending.clear()
+        self.ready.clear()
+        self.untracked = 0
+
+    def _wait(self, calculation):
+        '''Keep a calculation pending until perform() reports its result.'''
+        self.pending[calculation] = None
+        result_listeners[calculation] = self.ready.append
+        # Evaluated before the listener was in place: whoever pops the listener reports it, once
+        if calculation.evaluated and result_listeners.pop(calculation, None) is not None:
+            self.ready.append(calculation)
+
+    def _trim(self, retained: int):
+        '''Drop the oldest pending calculations beyond the newest retained, which history no longer holds.'''
+        if self.untracked:
+            self.untracked = max(0, min(self.untracked, retained - len(self.pending)))
+        pending = self.pending
+        while len(pending) > retained:
+            calculation, _ = pending.popitem(last=False)
+            result_listeners.pop(calculation, None)
+
+    def add(self, calculations: Iterable, retained: Optional[int] = None, track: bool = True):
+        '''Fold in a batch of calculations; unevaluated ones are kept pending.
+
+        retained, the number of entries history holds, bounds the pending
+        queue. With track=False unevaluated ones are only counted (e.g. a
+        replayed journal, whose results are only known after a rebuild).'''
+        groups: Dict[Callable, list] = {}
+        for calculation in calculations:
+            result = calculation._result  # pylint: disable=protected-access
+            if result is PENDING:
+                if track:
+                    self._wait(calculation)
+                else:
+                    self.untracked += 1
+                continue
+            results = groups.get(calculation.operation)
+            if results is None:
+                results = groups[calculation.operation] = []
+            results.append(result)
+        if retained is not None:
+            self._trim(retained)
+        for operation, results in groups.items():
+            stats = self.by_operation.get(operation)
+            if stats is None:
+                stats = self.by_operation[operation] = RunningStats()
+            try:
+                stats.add_batch(results)
+            except (ArithmeticError, TypeError, ValueError):
+                # A result that does not compare or convert must not cost the others their place
+                for result in results:
+                    try:
+                        stats.add_batch([result])
+                    except (ArithmeticError, TypeError, ValueError):
+                        stats.invalid += 1
+
+    def resolve_pending(self, retained: int):
+        '''Fold in pending calculations evaluated since they were added; O(number evaluated).
+
+        Only the newest retained pending calculations can still be in a
+        history holding retained entries; older ones are dropped.'''
+        self._trim(retained)
+        ready, pending = self.ready, self.pending
+        if not ready:
+            return
+        resolved = []
+        for _ in range(len(ready)):
+            calculation = ready.popleft()
+            if calculation in pending:  # not dropped by a trim meanwhile
+                del pending[calculation]
+                resolved.append(calculation)
+        self.add(resolved)
+
+    def rebuild(self, calculations: Iterable, evaluate: bool = False):
+        '''Recompute from scratch; evaluate=True also performs calculations whose result is unknown.'''
+        self.clear()
+        if evaluate:
+            calculations = list(calculations)
+            for calculation in calculations:
+                if not calculation.evaluated:
+                    try:
+                        calculation.perform()
+                    except (ArithmeticError, ValueError):
+                        pass  # stays pending, like it would have when first recorded
+        self.add(calculations)
+
+    def summary(self) -> dict:
+        '''Per-operation aggregates, overall count, and the number of results still unknown.'''
+        by_name: Dict[str, RunningStats] = {}
+        for operation, stats in self.by_operation.items():
+            # Distinct functions with the same name (e.g. from plugins) are reported together
+            by_name.setdefault(operation.__name__, RunningStats()).combine(stats)
+        operations = {name: stats.snapshot() for name, stats in sorted(by_name.items())}
+        return {
+            "count": sum(stats["count"] for stats in operations.values()),
+            "pending": len(self.pending) + self.untracked,
+            "operations": operations,
+        }
@@ -0,0 +1,99 @@
+'''
+Opt-in memoization of Calculator operations.
+
+OperationCache maps (operation, a, b, decimal context precision, rounding)
+to a result, with least-recently-used eviction once maxsize entries are held
+and an optional time-to-live after which an entry is treated as a miss.
+Hit, miss, eviction and expiration counters make the cache observable.
+
+Decimal operands are keyed on their exact representation (as_tuple), not
+their value, so Decimal('2.0') and Decimal('2') do not share an entry: their
+results print differently even though they compare equal.
+'''
+from collections import OrderedDict
+from decimal import Decimal, getcontext
+import time
+from typing import Callable, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+def _operand_key(value) -> Hashable:
+    '''Key that tells apart operands which compare equal but print differently.'''
+    if isinstance(value, Decimal):
+        return value.as_tuple()
+    return type(value), value
+
+
+class OperationCache:
+    '''LRU cache with optional TTL for Calculator results.'''
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("Cache size must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[object, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(operation: Callable, a, b) -> Hashable:
+        '''Build the cache key for an operation under the active decimal context.'''
+        context = getcontext()
+        return operation, _operand_key(a), _operand_key(b), context.prec, context.rounding
+
+    def get(self, key: Hashable):
+        '''Return the cached result, or the module's _MISSING sentinel on a miss.'''
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        result, expires = entry
+        if expires and self.clock() >= expires:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Hashable, result):
+        '''Store a result, evicting the least recently used entry when full.'''
+        expires = self.clock() + self.ttl if self.ttl else 0.0
+        self._entries[key] = (result, expires)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, operation: Callable, a, b, compute: Callable[[], object]):
+        '''Return the cached result for (operation, a, b), computing and storing it on a miss.'''
+        key = self.key(operation, a, b)
+        result = self.get(key)
+        if result is _MISSING:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def clear(self):
+        '''Drop all entries; counters are kept.'''
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        '''Snapshot of the cache counters.'''
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -18,10 +18,30 @@ from typing import Callable
 # Import arithmetic operations from a module named calculator.operations
 from app.calculator.operations import add, subtract, multiply, divide
 
+# Marker for "not evaluated yet"; pickles by name so it stays a singleton across processes
+class _Pending:
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "PENDING"
+
+    def __repr__(self):
+        return "PENDING"
+
+PENDING = _Pending()
+
+# Calculations someone waits on (see app.calculator.aggregates): calculation -> callback,
+# called with the calculation once perform() has computed its result
+result_listeners: dict = {}
+
 # Definition of the Calculation class with type annotations for improved readability and safety
 class Calculation:
+    # __slots__ drops the per-instance __dict__, which matters when history holds millions of calculations
+    __slots__ = ("a", "b", "operation", "_result")
+
     # Constructor method with type hints for parameters and the return type
-    def __init__(self, a: Decimal, b: Decimal, operation: Callable[[Decimal, Decimal], Decimal]):
+    # A known result can be passed in; otherwise it is computed lazily on the first perform()
+    def __init__(self, a: Decimal, b: Decimal, operation: Callable[[Decimal, Decimal], Decimal], result=PENDING):
         # Initialize the first operand of the calculation
         self.a = a
         # Initialize the second operand of the calculation
@@ -29,7 +49,9 @@ class Calculation:
         # Store the operation as a callable that takes two Decimals and returns a Decimal
         # This allows for flexible assignment of any function that matches this signature (like add, subtract, etc.)
         self.operation = operation
-    
+        # Cached result of the operation, PENDING until it has been computed
+        self._result = result
+
     # Static method to create a new instance of Calculation
     # This method provides an alternative constructor that can be used without instantiating the class directly
     @staticmethod    
@@ -39,9 +61,23 @@ class Calculation:
 
     # Method to perform the calculation stored in this object
     def perform(self) -> Decimal:
-        """Perform the stored calculation and return the result."""
-        # The operation (e.g., add, subtract) is called with the operands (a and b) and the result is returned
-        return self.operation(self.a, self.b)
+        """Perform the stored calculation and return the result, computing it at most once."""
+        result = self._result
+        if result is PENDING:
+            # The operation (e.g., add, subtract) is called with the operands (a and b) and the result is cached
+            # An operation that raises (like dividing by zero) caches nothing and raises again on the next call
+            result = self._result = self.operation(self.a, self.b)
+            if result_listeners:
+                listener = result_listeners.pop(self, None)
+                if listener is not None:
+                    listener(self)
+        return result
+
+    # Property telling whether the result has been computed (or supplied) already
+    @property
+    def evaluated(self) -> bool:
+        """True once the result is known, so perform() will not call the operation again."""
+        return self._result is not PENDING
 
     # Special method to provide a string representation of the Calculation instance
     def __repr__(self):
@@ -1,34 +1,225 @@
+from collections import deque
 from decimal import Decimal
-from typing import Callable, List
+from heapq import merge
+from itertools import count
+from operator import itemgetter
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
 
+from app.calculator.aggregates import HistoryAggregates
 from app.calculator.calculation import Calculation
+from app.calculator.history import ListHistory
+from app.calculator.indexes import HistoryIndex
+
+# The calling thread's append buffer, and the global stamp that orders entries across buffers
+_local = threading.local()
+_next_stamp = count().__next__
+# _unmerged is set after every append and cleared before buffers are drained; _merging is set
+# while a flush runs. While both are False nothing is buffered, so flush returns without its lock.
+# Module globals rather than class attributes, since assigning those invalidates attribute caches
+_unmerged = False
+_merging = False
 
 class Calculations:
-    history: List[Calculation] = []
+    """History of calculations, shared by every thread.
+
+    add_calculation never takes a lock: each thread appends to its own
+    buffer, stamped from a global counter. Buffers are merged into history
+    (and its indexes) in stamp order whenever history is read, and by every
+    FLUSH_EVERY-th append, under a single lock. Reads hold that lock too: a
+    query can update the indexes (sorting in queued results), and a compact
+    backend cannot be read while an entry is being packed into it.
+
+    Running aggregates of the results (see app.calculator.aggregates) are
+    updated with every merged batch, so summary() never walks history."""
+    # Default backend is an unbounded list; see use_backend for the compact ring buffer
+    history: List[Calculation] = ListHistory()
+    # Secondary indexes, built on the first indexed query and then maintained on every insert
+    index: Optional[HistoryIndex] = None
+    # Per-operation count/sum/min/max/mean/variance of every calculation added since the last clear
+    aggregates = HistoryAggregates()
+    # Every FLUSH_EVERY-th append (counted across threads) merges the buffers
+    FLUSH_EVERY = 1024
+    # (thread, buffer) per appending thread; replaced, never mutated, so it can be scanned without the lock
+    _buffers: Tuple[Tuple[threading.Thread, deque], ...] = ()
+    _lock = threading.RLock()
+
+    @classmethod
+    def use_backend(cls, history):
+        """Replace the history backend, e.g. with a bounded CompactHistory."""
+        with cls._lock:
+            cls.flush()
+            cls.history = history
+            cls.index = None
+            cls.aggregates.rebuild(history)
+
+    @classmethod
+    def _buffer(cls) -> deque:
+        """Create and register the calling thread's append buffer."""
+        buffer = deque()
+        with cls._lock:
+            cls._buffers += ((threading.current_thread(), buffer),)
+        _local.buffer = buffer
+        return buffer
+
+    @classmethod
+    def _drain(cls) -> List[list]:
+        """Take every buffered entry, per thread; drops the buffers of threads that have exited."""
+        pending = []
+        for _, buffer in cls._buffers:
+            popleft = buffer.popleft
+            # Entries appended meanwhile stay for the next flush; deque operations are atomic
+            drained = [popleft() for _ in range(len(buffer))]
+            if drained:
+                pending.append(drained)
+        if any(not thread.is_alive() for thread, _ in cls._buffers):
+            cls._buffers = tuple(entry for entry in cls._buffers if entry[0].is_alive() or entry[1])
+        return pending
+
+    @classmethod
+    def flush(cls):
+        """Merge every thread's buffered calculations into history, in the order they were added."""
+        global _unmerged, _merging
+        if not (_unmerged or _merging):
+            return  # nothing buffered: appends and reads skip the merge
+        with cls._lock:
+            # _merging first: a reader that sees _unmerged cleared then waits for this merge
+            _merging = True
+            _unmerged = False
+            try:
+                cls._merge(cls._drain())
+            finally:
+                _merging = False
+
+    @classmethod
+    def _merge(cls, pending: List[list]):
+        """Append drained (stamp, calculation) entries to history and its indexes, in stamp order."""
+        # One thread's buffer is already in order; several are merged by stamp
+        entries = pending[0] if len(pending) == 1 else merge(*pending, key=itemgetter(0))
+        cls._extend([calculation for _, calculation in entries])
+
+    @classmethod
+    def _extend(cls, calculations: List[Calculation], track: bool = True):
+        """Append calculations to history, its indexes and the aggregates; the caller holds _lock."""
+        history, index = cls.history, cls.index
+        if index is None:
+            history.extend(calculations)
+        else:
+            for calculation in calculations:
+                sequence = history.next_sequence()
+                history.append(calculation)
+                index.add(sequence, calculation)
+        cls.aggregates.add(calculations, len(history), track)
+
+    @classmethod
+    def load(cls, batches: Iterable[List[Calculation]]) -> int:
+        """Append batches of calculations straight to history, e.g. a replayed journal; returns how many.
+
+        Unlike add_calculation nothing goes through the per-thread buffers.
+        Loaded calculations without a result are counted as pending by
+        summary(), but only folded in by rebuild_summary(evaluate=True)."""
+        count = 0
+        with cls._lock:
+            cls.flush()
+            for calculations in batches:
+                cls._extend(calculations, track=False)
+                count += len(calculations)
+        return count
+
+    @classmethod
+    def _index(cls) -> HistoryIndex:
+        """Return the secondary indexes, building them from the current history if needed.
+
+        Callers hold _lock for as long as they use the index."""
+        cls.flush()
+        if cls.index is None:
+            cls.index = HistoryIndex(cls.history)
+        return cls.index
 
     @classmethod
     def add_calculation(cls, calculation: Calculation):
         """Add a new calculation to the history."""
-        cls.history.append(calculation)
+        try:
+            buffer = _local.buffer
+        except AttributeError:
+            buffer = cls._buffer()
+        stamp = _next_stamp()
+        buffer.append((stamp, calculation))
+        global _unmerged
+        _unmerged = True
+        if not stamp % cls.FLUSH_EVERY:
+            cls.flush()
 
     @classmethod
     def get_history(cls) -> List[Calculation]:
         """Retrieve the entire history of calculations."""
-        return cls.history
+        with cls._lock:
+            cls.flush()
+            return cls.history.as_list()
 
     @classmethod
     def clear_history(cls):
         """Clear the history of calculations."""
-        cls.history.clear()
+        with cls._lock:
+            cls._drain()  # buffered entries are cleared too
+            cls.history.clear()
+            if cls.index is not None:
+                cls.index.clear()
+            cls.aggregates.clear()
+
+    @classmethod
+    def summary(cls) -> dict:
+        """Per-operation count, sum, min, max, mean and variance of the results, without walking history.
+
+        Covers every calculation added since the last clear (with a bounded
+        backend, evicted ones too); "pending" counts those whose result is
+        not known yet, such as deferred calculations never performed."""
+        with cls._lock:
+            cls.flush()
+            cls.aggregates.resolve_pending(len(cls.history))
+            return cls.aggregates.summary()
+
+    @classmethod
+    def rebuild_summary(cls, evaluate: bool = False) -> dict:
+        """Recompute the aggregates from the history currently held, e.g. after loading or merging one.
+
+        evaluate=True performs calculations whose result is unknown, such
+        as ones replayed from a journal, so they are counted too."""
+        with cls._lock:
+            cls.flush()
+            cls.aggregates.rebuild(cls.history, evaluate)
+            return cls.aggregates.summary()
 
     @classmethod
     def get_latest(cls) -> Calculation:
         """Get the latest calculation. Returns None if there's no history."""
-        if cls.history:
-            return cls.history[-1]
-        return None
+        with cls._lock:
+            cls.flush()
+            return cls.history.latest()
 
     @classmethod
     def find_by_operation(cls, operation_name: str) -> List[Calculation]:
         """Find and return a list of calculations by operation name."""
-        return [calc for calc in cls.history if calc.operation.__name__ == operation_name]
\ No newline at end of file
+        with cls._lock:
+            return cls._index().find_by_operation(operation_name)
+
+    @classmethod
+    def find_by_operand(cls, value) -> List[Calculation]:
+        """Find calculations that use value as either operand, in insertion order."""
+        with cls._lock:
+            return cls._index().find_by_operand(value)
+
+    @classmethod
+    def find_by_result_range(cls, lo, hi) -> List[Calculation]:
+        """Find calculations whose result lies in [lo, hi], ordered by result."""
+        with cls._lock:
+            return cls._index().find_by_result_range(lo, hi)
+
+    @classmethod
+    def find_by_sequence(cls, start: int, stop: int) -> List[Calculation]:
+        """Return the calculations inserted with sequence numbers in [start, stop)."""
+        with cls._lock:
+            cls.flush()
+            start = max(start, cls.history.first_sequence())
+            stop = min(stop, cls.history.next_sequence())
+            return [cls.history.get(sequence) for sequence in range(start, stop)]
@@ -0,0 +1,355 @@
+'''
+Bulk export and import of calculation history.
+
+Three formats, chosen by file extension:
+
+* .csv   -- header "operation,a,b,result", one row per calculation
+* .jsonl -- one {"operation", "a", "b", "result"} object per line
+* .npz   -- columnar, readable with numpy.load: operation (uint8 codes),
+            operations (their names), a, b and result (float64; NaN where
+            the result is not known)
+
+CSV and JSON Lines are written and read as streams, and keep operands and
+results exactly: they are written with str() and read back like the
+journal reads them (Decimal, or Fraction for "n/d"). The .npz columns are
+binary64, like CompactHistory stores them, so Decimals beyond 17
+significant digits are rounded there.
+
+The .npz members are stored uncompressed, each .npy header is padded to 64
+bytes (like NumPy pads them) and every member starts on a 64-byte boundary
+(a zip extra field pads the local header). So load_columns() can
+memory-map the file and hand out each column as a memoryview over the
+mapping: no row objects, no copies, whatever the number of rows. NumPy is
+not needed for either direction.
+
+    python -m app.calculator.export history.journal history.npz
+'''
+import argparse
+import ast
+import csv
+import json
+import mmap
+import struct
+import sys
+import zipfile
+from array import array
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+from app.calculator.calculation import PENDING, Calculation
+from app.calculator.calculations import Calculations
+from app.calculator.history import OPERATIONS, Columns, columns_of
+from app.calculator.journal import decode_operand, replay
+
+FORMATS = ("csv", "jsonl", "npz")
+FIELDS = ("operation", "a", "b", "result")
+ALIGNMENT = 64
+NPY_MAGIC = b"\x93NUMPY"
+# Zip extra field id used for alignment padding (the one Android's zipalign uses)
+_PADDING_EXTRA_ID = 0xD935
+_LOCAL_HEADER = struct.Struct("<4s22xHH")
+_OPERATIONS = {operation.__name__: operation for operation in OPERATIONS}
+_CHUNK_ROWS = 4096
+
+
+def format_of(path: str, fmt: Optional[str] = None) -> str:
+    '''The format named by fmt, or by the path's extension.'''
+    fmt = fmt or path.rpartition(".")[2].lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown history format {fmt!r}; use one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def _operation(name: str):
+    try:
+        return _OPERATIONS[name]
+    except KeyError:
+        raise ValueError(f"Unknown operation {name!r}") from None
+
+
+def _result(calculation: Calculation):
+    '''The known result, or None.'''
+    return calculation.perform() if calculation.evaluated else None
+
+
+# Text formats
+
+def write_csv(calculations: Iterable[Calculation], stream: TextIO) -> int:
+    '''Write calculations as CSV rows; returns the number written.'''
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow(FIELDS)
+    count = 0
+    rows = []
+    for calculation in calculations:
+        result = _result(calculation)
+        rows.append((calculation.operation.__name__, calculation.a, calculation.b, "" if result is None else result))
+        if len(rows) >= _CHUNK_ROWS:
+            writer.writerows(rows)
+            count += len(rows)
+            rows.clear()
+    writer.writerows(rows)
+    return count + len(rows)
+
+
+def read_csv(stream: TextIO) -> Iterator[Calculation]:
+    '''Yield the calculations of a CSV export, one row at a time.'''
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    if tuple(header) != FIELDS:
+        raise ValueError(f"Not a history CSV: expected header {','.join(FIELDS)}")
+    for name, a, b, result in reader:
+        yield Calculation(decode_operand(a), decode_operand(b), _operation(name),
+                          decode_operand(result) if result else PENDING)
+
+
+def _json_number(value) -> str:
+    '''A JSON literal for a number: a bare number where JSON has one, a string otherwise.'''
+    if value is None:
+        return "null"
+    text = str(value) if not isinstance(value, float) else repr(value)
+    if isinstance(value, (int, Decimal, float)) and text.lstrip("-")[:1].isdigit():
+        return text
+    return json.dumps(text)  # Fractions ("1/3"), NaN and infinities
+
+
+def write_jsonl(calculations: Iterable[Calculation], stream: TextIO) -> int:
+    '''Write calculations as JSON Lines; returns the number written.'''
+    names: Dict[object, str] = {}
+    lines = []
+    count = 0
+    for calculation in calculations:
+        operation = calculation.operation
+        name = names.get(operation)
+        if name is None:
+            name = names[operation] = json.dumps(operation.__name__)
+        lines.append(f'{{"operation": {name}, "a": {_json_number(calculation.a)}, '
+                     f'"b": {_json_number(calculation.b)}, "result": {_json_number(_result(calculation))}}}\n')
+        if len(lines) >= _CHUNK_ROWS:
+            stream.write("".join(lines))
+            count += len(lines)
+            lines.clear()
+    stream.write("".join(lines))
+    return count + len(lines)
+
+
+def _json_operand(value):
+    return decode_operand(value) if isinstance(value, str) else value
+
+
+def read_jsonl(stream: TextIO) -> Iterator[Calculation]:
+    '''Yield the calculations of a JSON Lines export, one line at a time.'''
+    for line in stream:
+        if not line.strip():
+            continue
+        record = json.loads(line, parse_float=Decimal, parse_int=Decimal)
+        result = record.get("result")
+        yield Calculation(_json_operand(record["a"]), _json_operand(record["b"]), _operation(record["operation"]),
+                          PENDING if result is None else _json_operand(result))
+
+
+# Binary columnar format
+
+def npy_header(descr: str, length: int) -> bytes:
+    '''A version 1.0 .npy header for a 1-D array, padded so the data after it is 64-byte aligned.'''
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({length},), }}"
+    header += " " * (-(len(NPY_MAGIC) + 4 + len(header) + 1) % ALIGNMENT) + "\n"
+    return NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "little":
+        return memoryview(column)
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return memoryview(swapped)
+
+
+def _write_member(archive: zipfile.ZipFile, name: str, header: bytes, payload):
+    '''Write one stored member whose data starts on an ALIGNMENT boundary.'''
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_STORED
+    info.file_size = len(header) + len(payload)
+    # zipfile appends a 20 byte zip64 field to the local header for large members
+    zip64 = info.file_size * 1.05 > zipfile.ZIP64_LIMIT
+    fixed = _LOCAL_HEADER.size + len(name.encode("utf-8")) + 4 + (20 if zip64 else 0)
+    padding = -(archive.fp.tell() + fixed) % ALIGNMENT
+    info.extra = struct.pack("<HH", _PADDING_EXTRA_ID, padding) + bytes(padding)
+    with archive.open(info, "w") as member:
+        member.write(header)
+        member.write(payload)
+
+
+def write_npz(columns: Columns, path: str) -> int:
+    '''Write history columns as an uncompressed, aligned .npz; returns the number of rows.'''
+    length = len(columns.codes)
+    names = [operation.__name__ for operation in columns.operations]
+    width = max(map(len, names))
+    # NumPy's fixed-width unicode dtype: UTF-32 code units, zero padded
+    text = b"".join(name.ljust(width, "\0").encode("utf-32-le") for name in names)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        _write_member(archive, "operation.npy", npy_header("|u1", length), memoryview(columns.codes))
+        _write_member(archive, "operations.npy", npy_header(f"<U{width}", len(names)), text)
+        for name, column in (("a", columns.a), ("b", columns.b), ("result", columns.results)):
+            _write_member(archive, f"{name}.npy", npy_header("<f8", length), _little_endian(column))
+    return length
+
+
+def _npy_layout(data, offset: int):
+    '''(descr, length, data offset) of the .npy array stored at offset.'''
+    if bytes(data[offset:offset + 6]) != NPY_MAGIC:
+        raise ValueError("Not a .npy member")
+    major = data[offset + 6]
+    if major == 1:
+        (header_length,), start = struct.unpack_from("<H", data, offset + 8), offset + 10
+    else:
+        (header_length,), start = struct.unpack_from("<I", data, offset + 8), offset + 12
+    header = ast.literal_eval(bytes(data[start:start + header_length]).decode("latin1"))
+    if header.get("fortran_order") or len(header["shape"]) != 1:
+        raise ValueError("Only 1-D C-order columns are supported")
+    return header["descr"], header["shape"][0], start + header_length
+
+
+class ColumnarHistory:
+    '''A memory-mapped .npz history export: columns are memoryviews over the file.
+
+    operation is a "B" view of operation codes, a, b and result are "d"
+    views; operation_names maps codes to names. Close it (or use it as a
+    context manager) once every view taken from it has been released.'''
+
+    def __init__(self, path: str):
+        with zipfile.ZipFile(path) as archive:
+            members = {info.filename: info for info in archive.infolist()}
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self.columns: Dict[str, memoryview] = {}
+        try:
+            for name in ("operation", "a", "b", "result"):
+                self.columns[name] = self._column(members, name)
+            descr, count, start = self._layout(members, "operations")
+            width = int(descr.lstrip("<U"))
+            text = bytes(self._view[start:start + 4 * width * count]).decode("utf-32-le")
+            self.operation_names = [text[i:i + width].rstrip("\0") for i in range(0, len(text), width)]
+        except Exception:
+            self.close()
+            raise
+        self.operation = self.columns["operation"]
+        self.a, self.b, self.result = self.columns["a"], self.columns["b"], self.columns["result"]
+
+    def _layout(self, members, name):
+        info = members.get(f"{name}.npy")
+        if info is None:
+            raise ValueError(f"History export has no {name!r} column")
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"Column {name!r} is compressed and cannot be memory-mapped; use numpy.load")
+        _, name_length, extra_length = _LOCAL_HEADER.unpack_from(self._map, info.header_offset)
+        return _npy_layout(self._map, info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+
+    def _column(self, members, name) -> memoryview:
+        descr, count, start = self._layout(members, name)
+        typecode = {"|u1": "B", "<f8": "d"}.get(descr)
+        if typecode is None:
+            raise ValueError(f"Unsupported column type {descr!r} for {name!r}")
+        view = self._view[start:start + count * (8 if typecode == "d" else 1)]
+        if typecode == "d" and sys.byteorder != "little":
+            column = array("d", view)  # big-endian host: the only case that copies
+            column.byteswap()
+            return memoryview(column)
+        return view.cast(typecode)
+
+    def __len__(self) -> int:
+        return len(self.operation)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def calculations(self) -> Iterator[Calculation]:
+        '''Rebuild Calculation objects row by row (only for callers that need them).'''
+        operations = [_operation(name) for name in self.operation_names]
+        for code, a, b, result in zip(self.operation, self.a, self.b, self.result):
+            yield Calculation(Decimal(repr(a)), Decimal(repr(b)), operations[code],
+                              PENDING if result != result else Decimal(repr(result)))
+
+    def close(self):
+        '''Release the columns and unmap the file.'''
+        for column in self.columns.values():
+            column.release()
+        self.columns.clear()
+        if self._map is not None:
+            self._view.release()
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+
+def load_columns(path: str) -> ColumnarHistory:
+    '''Memory-map a .npz history export; see ColumnarHistory.'''
+    return ColumnarHistory(path)
+
+
+# Whole histories
+
+def _history_columns(calculations) -> Columns:
+    columns = getattr(calculations, "columns", None)
+    return columns() if columns is not None else columns_of(calculations)
+
+
+def export_history(path: str, fmt: Optional[str] = None, calculations: Optional[Iterable[Calculation]] = None) -> int:
+    '''Write calculations (default: the shared history) to path; returns the number of rows.'''
+    fmt = format_of(path, fmt)
+    if calculations is None:
+        Calculations.flush()
+        calculations = Calculations.history
+    if fmt == "npz":
+        return write_npz(_history_columns(calculations), path)
+    with open(path, "w", encoding="utf-8", newline="") as stream:
+        return (write_csv if fmt == "csv" else write_jsonl)(calculations, stream)
+
+
+def read_history(path: str, fmt: Optional[str] = None) -> Iterator[Calculation]:
+    '''Yield the calculations stored in an export, streaming text formats.'''
+    fmt = format_of(path, fmt)
+    if fmt == "npz":
+        with load_columns(path) as columns:
+            yield from columns.calculations()
+        return
+    with open(path, encoding="utf-8", newline="") as stream:
+        yield from (read_csv if fmt == "csv" else read_jsonl)(stream)
+
+
+def import_history(path: str, fmt: Optional[str] = None) -> int:
+    '''Add the calculations of an export to the shared history; returns how many.'''
+    count = 0
+    for calculation in read_history(path, fmt):
+        Calculations.add_calculation(calculation)
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a calculation journal for analytics")
+    parser.add_argument("journal")
+    parser.add_argument("output", help="file to write; its extension (.csv, .jsonl, .npz) picks the format")
+    parser.add_argument("--format", choices=FORMATS)
+    args = parser.parse_args(argv)
+
+    def evaluated() -> Iterator[Calculation]:
+        # Journals hold operands only: compute each result, leaving failed ones unknown
+        for calculation in replay(args.journal):
+            try:
+                calculation.perform()
+            except (ArithmeticError, ValueError):
+                pass
+            yield calculation
+
+    count = export_history(args.output, args.format, evaluated())
+    print(f"Exported {count} calculations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
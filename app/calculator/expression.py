@@ -0,0 +1,211 @@
+'''
+Infix expression engine built on the calculator operations.
+
+An expression such as "(a + b) * c / 2" is evaluated in three stages:
+
+1. Parsing builds a tree of Calculation nodes: each node's operands are
+   Decimal constants, Variable leaves or other Calculation nodes, and its
+   operation is one of app.calculator.operations (add, subtract, ...).
+2. While the tree is built, constant sub-expressions are folded into a
+   single Decimal, and structurally identical sub-expressions are shared
+   (common-subexpression elimination), which turns the tree into a DAG.
+3. Compilation flattens the DAG into a list of register instructions
+   (operation, destination, left, right), so each shared node runs once.
+
+Compiled plans are cached by expression text and the active decimal
+context, so evaluating the same formula again with new variable bindings
+only runs the instruction list:
+
+    >>> evaluate("(a + b) * c / d", a=1, b=2, c=3, d=4)
+    Decimal('2.25')
+'''
+from decimal import Decimal, getcontext
+from functools import lru_cache
+import re
+from typing import Dict, List, Tuple
+
+from app.calculator.calculation import Calculation
+from app.calculator.operations import add, subtract, multiply, divide
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|([A-Za-z_]\w*)|(\S))")
+_BINARY = {"+": add, "-": subtract, "*": multiply, "/": divide}
+_ZERO = Decimal(0)
+
+
+class Variable:
+    '''Leaf node standing for a value bound at evaluation time.'''
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+def _tokenize(text: str) -> List[Tuple[str, str, int]]:
+    '''Split text into (kind, token, position) triples.'''
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        number, name, symbol = match.groups()
+        if number is not None:
+            tokens.append(("number", number, match.start(1)))
+        elif name is not None:
+            tokens.append(("name", name, match.start(2)))
+        elif symbol in "+-*/()":
+            tokens.append(("symbol", symbol, match.start(3)))
+        else:
+            raise ValueError(f"Unexpected character {symbol!r} at position {match.start(3)}")
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    '''Recursive-descent parser that folds constants and shares common sub-expressions.'''
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.nodes: Dict[tuple, object] = {}  # structural key -> shared node
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Empty expression")
+        node = self.expression()
+        if self.position < len(self.tokens):
+            _, token, at = self.tokens[self.position]
+            raise ValueError(f"Unexpected {token!r} at position {at}")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.position][1] if self.position < len(self.tokens) else None
+
+    def _next(self):
+        if self.position >= len(self.tokens):
+            raise ValueError("Unexpected end of expression")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expression(self):
+        node = self.term()
+        while self._peek() in ("+", "-"):
+            node = self.combine(_BINARY[self._next()[1]], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self._peek() in ("*", "/"):
+            node = self.combine(_BINARY[self._next()[1]], node, self.unary())
+        return node
+
+    def unary(self):
+        if self._peek() == "-":
+            self._next()
+            return self.combine(subtract, _ZERO, self.unary())
+        if self._peek() == "+":
+            self._next()
+            return self.unary()
+        return self.primary()
+
+    def primary(self):
+        kind, token, at = self._next()
+        if kind == "number":
+            return Decimal(token)
+        if kind == "name":
+            return self.share(("var", token), lambda: Variable(token))
+        if token == "(":
+            node = self.expression()
+            if self._peek() != ")":
+                raise ValueError(f"Missing ')' for '(' at position {at}")
+            self._next()
+            return node
+        raise ValueError(f"Unexpected {token!r} at position {at}")
+
+    def share(self, key, build):
+        '''Return the existing node for key, or build and remember a new one.'''
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = build()
+        return node
+
+    def combine(self, operation, a, b):
+        '''Build (or reuse) the node for operation(a, b), folding constant operands.'''
+        if isinstance(a, Decimal) and isinstance(b, Decimal):
+            try:
+                return operation(a, b)
+            except (ArithmeticError, ValueError):
+                pass  # e.g. division by zero: leave it to raise at evaluation time
+        key = (operation, _node_key(a), _node_key(b))
+        return self.share(key, lambda: Calculation.create(a, b, operation))
+
+
+def _node_key(node):
+    '''Structural identity of an operand: constants by exact value, nodes by identity.'''
+    if isinstance(node, Decimal):
+        return ("const", node.as_tuple())
+    return ("node", id(node))
+
+
+class CompiledExpression:
+    '''A flat register program for one expression.'''
+
+    def __init__(self, root):
+        self.variables: Dict[str, int] = {}
+        self.code: List[tuple] = []
+        self._registers: List[object] = []
+        slots: Dict[int, int] = {}
+        self.result = self._emit(root, slots)
+
+    def _emit(self, node, slots: Dict[int, int]) -> int:
+        '''Assign a register to node, emitting instructions for it and its operands once.'''
+        if isinstance(node, Decimal):
+            self._registers.append(node)
+            return len(self._registers) - 1
+        register = slots.get(id(node))
+        if register is not None:
+            return register
+        if isinstance(node, Variable):
+            self._registers.append(None)
+            register = self.variables[node.name] = len(self._registers) - 1
+        else:
+            left = self._emit(node.a, slots)
+            right = self._emit(node.b, slots)
+            self._registers.append(None)
+            register = len(self._registers) - 1
+            self.code.append((node.operation, register, left, right))
+        slots[id(node)] = register
+        return register
+
+    def evaluate(self, **bindings) -> Decimal:
+        '''Run the program with the given variable values.'''
+        registers = self._registers.copy()
+        for name, register in self.variables.items():
+            try:
+                value = bindings[name]
+            except KeyError:
+                raise ValueError(f"No value bound for variable {name!r}") from None
+            registers[register] = value if isinstance(value, Decimal) else Decimal(str(value))
+        for operation, destination, left, right in self.code:
+            registers[destination] = operation(registers[left], registers[right])
+        return registers[self.result]
+
+
+@lru_cache(maxsize=512)
+def _compile(text: str, precision: int, rounding: str) -> CompiledExpression:
+    # precision and rounding are only part of the key: constant folding depends on them
+    return CompiledExpression(_Parser(text).parse())
+
+
+def compile_expression(text: str) -> CompiledExpression:
+    '''Parse, optimize and compile an expression, reusing a cached plan when possible.'''
+    context = getcontext()
+    return _compile(text, context.prec, context.rounding)
+
+
+def evaluate(text: str, **bindings) -> Decimal:
+    '''Evaluate an expression with the given variable values.'''
+    return compile_expression(text).evaluate(**bindings)
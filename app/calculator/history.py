@@ -0,0 +1,246 @@
+'''
+History backends used by the Calculations class.
+
+ListHistory is the default: a plain list of Calculation objects, unbounded.
+CompactHistory is a bounded ring buffer stored as a struct of arrays: one
+operation code byte plus packed binary64 operands and result per entry,
+instead of one Python object (and two Decimals) per entry. Calculation
+objects are only rebuilt when history is read.
+
+Operands and results that do not survive a round trip through a float (for
+example Decimals with more than 17 significant digits) are kept exactly in a
+small side table, so reading history back always gives the original values.
+Rebuilt calculations carry their stored result; a NaN in the result column
+means it was not known yet, and the calculation comes back pending.
+'''
+from array import array
+from decimal import Decimal
+from itertools import chain
+import math
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from app.calculator.calculation import PENDING, Calculation
+from app.calculator.operations import add, subtract, multiply, divide
+
+# Operation codes stored in the compact backend; new operations get the next free code
+OPERATIONS = (add, subtract, multiply, divide)
+NAN = float("nan")
+
+
+class Columns(NamedTuple):
+    '''History as columns, in insertion order: operation codes index into operations.'''
+    operations: List[Callable]
+    codes: array  # "B"
+    a: array  # "d"
+    b: array  # "d"
+    results: array  # "d", NaN where the result is not known
+
+
+def _pack(value) -> float:
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+
+def columns_of(calculations: Iterable[Calculation]) -> Columns:
+    '''Columns of any iterable of calculations; operands and results are packed as binary64.'''
+    operations = list(OPERATIONS)
+    known = {operation: code for code, operation in enumerate(operations)}
+    codes, a, b, results = array("B"), array("d"), array("d"), array("d")
+    for calculation in calculations:
+        operation = calculation.operation
+        code = known.get(operation)
+        if code is None:
+            if len(operations) > 255:
+                raise ValueError("Too many distinct operations for a columnar export")
+            code = known[operation] = len(operations)
+            operations.append(operation)
+        codes.append(code)
+        a.append(_pack(calculation.a))
+        b.append(_pack(calculation.b))
+        if calculation.evaluated:
+            results.append(_pack(calculation.perform()))
+        else:
+            results.append(NAN)
+    return Columns(operations, codes, a, b, results)
+
+
+class ListHistory(list):
+    '''Unbounded history kept as a list of Calculation objects.'''
+
+    def as_list(self) -> List[Calculation]:
+        '''Return the history itself; it is already a list.'''
+        return self
+
+    # A list never evicts, so an entry's insertion sequence is its position
+    def first_sequence(self) -> int:
+        '''Sequence number of the oldest entry still held.'''
+        return 0
+
+    def next_sequence(self) -> int:
+        '''Sequence number the next appended entry will get.'''
+        return len(self)
+
+    def get(self, sequence: int) -> Calculation:
+        '''Return the entry with the given insertion sequence number.'''
+        return self[sequence]
+
+    def latest(self) -> Optional[Calculation]:
+        '''Return the most recent calculation, or None if empty.'''
+        return self[-1] if self else None
+
+    def find_by_operation(self, operation_name: str) -> List[Calculation]:
+        '''Return calculations whose operation has the given name.'''
+        return [calc for calc in self if calc.operation.__name__ == operation_name]
+
+    def columns(self) -> Columns:
+        '''The history as packed columns (one pass over the Calculation objects).'''
+        return columns_of(self)
+
+
+def restore(value: float) -> Decimal:
+    '''Turn a packed float back into the shortest Decimal that represents it.'''
+    if value.is_integer():
+        return Decimal(int(value))
+    return Decimal(repr(value))
+
+
+class CompactHistory:
+    '''Bounded, array-backed history with ring-buffer eviction.'''
+
+    def __init__(self, capacity: int = 1_000_000):
+        if capacity <= 0:
+            raise ValueError("History capacity must be positive")
+        self.capacity = capacity
+        # Struct of arrays: column i of every array describes the same entry
+        self._ops = array("B", bytes(capacity))
+        self._a = array("d", bytes(8 * capacity))
+        self._b = array("d", bytes(8 * capacity))
+        self._results = array("d", bytes(8 * capacity))
+        # slot -> (a, b, result) for entries whose operands or result a float cannot hold exactly
+        self._exact: Dict[int, tuple] = {}
+        self._operations: List[Callable] = list(OPERATIONS)
+        self._codes = {operation: code for code, operation in enumerate(self._operations)}
+        self._start = 0  # slot of the oldest entry
+        self._size = 0
+        self._appended = 0  # entries appended since the last clear, i.e. the next sequence number
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        return (self._load(slot) for slot in self._slots())
+
+    def _code(self, operation: Callable) -> int:
+        '''Return the code of an operation, assigning a new one on first use.'''
+        code = self._codes.get(operation)
+        if code is None:
+            if len(self._operations) > 255:
+                raise ValueError("Too many distinct operations for the compact history")
+            code = len(self._operations)
+            self._operations.append(operation)
+            self._codes[operation] = code
+        return code
+
+    def _slots(self):
+        '''Slots in insertion order, oldest first.'''
+        end = self._start + self._size
+        return chain(range(self._start, min(end, self.capacity)), range(0, max(0, end - self.capacity)))
+
+    def _load(self, slot: int) -> Calculation:
+        '''Rebuild the Calculation stored in a slot.'''
+        exact = self._exact.get(slot)
+        if exact is not None:
+            a, b, result = exact
+        else:
+            a, b = restore(self._a[slot]), restore(self._b[slot])
+            packed = self._results[slot]
+            result = restore(packed) if packed == packed else PENDING  # NaN: not known when stored
+        return Calculation(a, b, self._operations[self._ops[slot]], result)
+
+    def append(self, calculation: Calculation):
+        '''Store a calculation, evicting the oldest entry when full.'''
+        slot = (self._start + self._size) % self.capacity
+        if self._size == self.capacity:
+            self._start = (self._start + 1) % self.capacity
+        else:
+            self._size += 1
+        self._exact.pop(slot, None)
+        self._appended += 1
+
+        a, b = calculation.a, calculation.b
+        packed_a, packed_b = _pack(a), _pack(b)
+        self._ops[slot] = self._code(calculation.operation)
+        self._a[slot] = packed_a
+        self._b[slot] = packed_b
+        # Deferred calculations are not forced here; their result column stays NaN
+        result = calculation.perform() if calculation.evaluated else PENDING
+        packed_result = NAN if result is PENDING else _pack(result)
+        self._results[slot] = packed_result
+        if (restore(packed_a) != a or restore(packed_b) != b
+                or packed_result == packed_result and restore(packed_result) != result):
+            self._exact[slot] = (a, b, result)
+
+    def extend(self, calculations: Iterable[Calculation]):
+        '''Store calculations in order, evicting the oldest entries as needed.'''
+        for calculation in calculations:
+            self.append(calculation)
+
+    def clear(self):
+        '''Drop every entry; the preallocated arrays are kept for reuse.'''
+        self._start = 0
+        self._size = 0
+        self._appended = 0
+        self._exact.clear()
+
+    def first_sequence(self) -> int:
+        '''Sequence number of the oldest entry still held.'''
+        return self._appended - self._size
+
+    def next_sequence(self) -> int:
+        '''Sequence number the next appended entry will get.'''
+        return self._appended
+
+    def get(self, sequence: int) -> Calculation:
+        '''Return the entry with the given insertion sequence number.'''
+        offset = sequence - self.first_sequence()
+        if not 0 <= offset < self._size:
+            raise IndexError("Calculation has been evicted or does not exist yet")
+        return self._load((self._start + offset) % self.capacity)
+
+    def as_list(self) -> List[Calculation]:
+        '''Materialize the history as a list of Calculation objects.'''
+        return list(self)
+
+    def latest(self) -> Optional[Calculation]:
+        '''Return the most recent calculation, or None if empty.'''
+        if not self._size:
+            return None
+        return self._load((self._start + self._size - 1) % self.capacity)
+
+    def find_by_operation(self, operation_name: str) -> List[Calculation]:
+        '''Return calculations whose operation has the given name.'''
+        codes = {code for code, operation in enumerate(self._operations) if operation.__name__ == operation_name}
+        ops = self._ops
+        return [self._load(slot) for slot in self._slots() if ops[slot] in codes]
+
+    def columns(self) -> Columns:
+        '''The history as packed columns, sliced straight out of the ring buffer's arrays.
+
+        Operands held exactly in the side table appear as their nearest float.'''
+        end = self._start + self._size
+        wrapped = max(0, end - self.capacity)
+        end = min(end, self.capacity)
+        sliced = []
+        for column in (self._ops, self._a, self._b, self._results):
+            part = column[self._start:end]
+            if wrapped:
+                part += column[:wrapped]
+            sliced.append(part)
+        return Columns(list(self._operations), *sliced)
+
+    def results(self) -> List[float]:
+        '''Return the packed results in insertion order (NaN where the result was not known on insert).'''
+        results = self._results
+        return [results[slot] for slot in self._slots()]
@@ -0,0 +1,122 @@
+'''
+Secondary indexes over a Calculations history backend.
+
+Every entry in a history backend has an insertion sequence number (see
+first_sequence/next_sequence/get on the backends), and that is what the
+indexes store:
+
+* by_operation: operation name -> sorted list of sequence numbers
+* by_operand: operand value -> sorted list of sequence numbers
+* by_result: list of (result, sequence) pairs sorted by result. New pairs
+  are appended to an unsorted list and merged in with one sort by the next
+  result range query (Timsort merges the sorted run with the sorted new
+  pairs in linear time), so neither inserting nor rebuilding shifts the
+  list once per entry; deferred (not yet evaluated) calculations wait in a
+  pending list and are only evaluated by the first result range query
+
+Because sequence numbers only grow, each posting list is sorted for free and
+entries evicted by a ring-buffer backend are simply the ones below
+history.first_sequence(); queries skip them with a bisect, and the index is
+rebuilt once stale entries outnumber live ones.
+'''
+from bisect import bisect_left, bisect_right
+import math
+from typing import Dict, List
+
+from app.calculator.calculation import Calculation
+
+
+class HistoryIndex:
+    '''Incrementally maintained indexes for one history backend.'''
+
+    def __init__(self, history):
+        self.history = history
+        self.by_operation: Dict[str, List[int]] = {}
+        self.by_operand: Dict[object, List[int]] = {}
+        self.by_result: List[tuple] = []
+        self.unsorted: List[tuple] = []  # (result, sequence) pairs not merged into by_result yet
+        self.pending: List[int] = []  # sequences whose result is not known yet
+        self.indexed = 0
+        self.rebuild()
+
+    def clear(self):
+        '''Drop every index entry.'''
+        self.by_operation.clear()
+        self.by_operand.clear()
+        self.by_result.clear()
+        self.unsorted.clear()
+        self.pending.clear()
+        self.indexed = 0
+
+    def rebuild(self):
+        '''Re-index every entry currently held by the history backend.'''
+        self.clear()
+        history = self.history
+        for sequence in range(history.first_sequence(), history.next_sequence()):
+            self.add(sequence, history.get(sequence))
+
+    def add(self, sequence: int, calculation: Calculation):
+        '''Index one calculation stored under the given sequence number.'''
+        self.by_operation.setdefault(calculation.operation.__name__, []).append(sequence)
+        self.by_operand.setdefault(calculation.a, []).append(sequence)
+        if calculation.b != calculation.a:
+            self.by_operand.setdefault(calculation.b, []).append(sequence)
+        if calculation.evaluated:
+            self._index_result(sequence, calculation)
+        else:
+            # Deferred calculation: only evaluate it if a result range query needs it
+            self.pending.append(sequence)
+        self.indexed += 1
+        # Evicted entries are dead weight; rebuild once they dominate
+        if self.indexed - len(self.history) > max(1024, len(self.history)):
+            self.rebuild()
+
+    def _index_result(self, sequence: int, calculation: Calculation):
+        '''Queue a calculation's result for the result-sorted index.'''
+        try:
+            result = calculation.perform()
+        except (ArithmeticError, ValueError):
+            return  # failed calculations have no result to range over
+        if result == result:  # skip NaN, it has no order
+            self.unsorted.append((result, sequence))
+
+    def _resolve_pending(self):
+        '''Evaluate deferred calculations that are still held and index their results.'''
+        first = self.history.first_sequence()
+        for sequence in self.pending:
+            if sequence >= first:
+                self._index_result(sequence, self.history.get(sequence))
+        self.pending.clear()
+
+    def _sort_results(self):
+        '''Merge the queued (result, sequence) pairs into by_result.'''
+        by_result = self.by_result
+        by_result.extend(self.unsorted)
+        by_result.sort()
+        self.unsorted.clear()
+
+    def _live(self, postings: List[int]) -> List[Calculation]:
+        '''Load the calculations of a posting list, skipping evicted entries.'''
+        first = self.history.first_sequence()
+        get = self.history.get
+        return [get(sequence) for sequence in postings[bisect_left(postings, first):]]
+
+    def find_by_operation(self, operation_name: str) -> List[Calculation]:
+        '''Calculations with the given operation name, in insertion order.'''
+        return self._live(self.by_operation.get(operation_name, []))
+
+    def find_by_operand(self, value) -> List[Calculation]:
+        '''Calculations with value as either operand, in insertion order.'''
+        return self._live(self.by_operand.get(value, []))
+
+    def find_by_result_range(self, lo, hi) -> List[Calculation]:
+        '''Calculations whose result r satisfies lo <= r <= hi, ordered by result.'''
+        if self.pending:
+            self._resolve_pending()
+        if self.unsorted:
+            self._sort_results()
+        start = bisect_left(self.by_result, (lo,))
+        stop = bisect_right(self.by_result, (hi, math.inf))
+        first = self.history.first_sequence()
+        get = self.history.get
+        return [get(sequence) for _, sequence in self.by_result[start:stop] if sequence >= first]
@@ -0,0 +1,341 @@
+'''
+Durable, append-only journal for calculation history.
+
+The journal is a binary file: an 8 byte magic header followed by frames of
+
+    length (u32) | crc32 of payload (u32) | payload
+
+Each frame is one group commit, and its payload holds the group's
+calculations as columns, like CompactHistory stores them:
+
+    rows (u32) | exact rows (u32) | operation codes (u8 each) |
+    a (little-endian binary64 each) | b (binary64 each) | exact rows
+
+Operands are packed as binary64 when they come back from it as the same
+Decimal, digit for digit (see pack_exactly), so Decimal("1.10") keeps its
+trailing zero. Every other operand (Decimals with more than 17 significant
+digits, Fractions from the "fraction" numeric backend, floats) is written
+as text in an exact row, row (u32) | length (u32) | a | length (u32) | b,
+and comes back exactly as it went in: a Fraction for "n/d", else a Decimal.
+
+Appends are group-committed: calculations collect in memory and are
+written as one frame in one write() call every group_size records (or on
+flush/close). The sync policy decides when os.fsync runs: "always" after
+every record, "group" after every group write, "never" leaves it to the
+operating system.
+
+Replay memory-maps the file and decodes each frame's columns with
+array.frombytes, so nothing runs per record until the calculations are
+rebuilt; Calculator.open_journal loads them into history a frame at a time
+and, for a bounded history, only rebuilds the newest ones it can hold. A
+torn or corrupt frame (a crash in the middle of a write) ends replay and is
+truncated away when the journal is reopened for appending. Compaction
+rewrites the journal as a snapshot of the current history and atomically
+replaces the old file.
+
+Usage from the command line:
+
+    python -m app.calculator.journal compact PATH [--keep N]
+'''
+import argparse
+from array import array
+from collections import deque
+import mmap
+import os
+import struct
+import sys
+import zlib
+from decimal import Decimal
+from fractions import Fraction
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.calculator.calculation import Calculation
+from app.calculator.history import OPERATIONS, restore
+
+MAGIC = b"CALCJRN2"
+FRAME_HEADER = struct.Struct("<II")
+FRAME_ROWS = struct.Struct("<II")
+EXACT_ROW = struct.Struct("<II")
+OPERAND_LENGTH = struct.Struct("<I")
+SYNC_POLICIES = ("always", "group", "never")
+# Longest operand text an exact row can hold
+MAX_OPERAND_LENGTH = (1 << 31) - 1
+# A group is written early once its exact rows hold this much text, so a frame's length fits its u32
+MAX_FRAME_TEXT = 1 << 24
+NAN = float("nan")
+
+_CODES = {operation: code for code, operation in enumerate(OPERATIONS)}
+_SWAP = sys.byteorder != "little"
+
+
+def decode_operand(text: str):
+    '''An operand as written in an exact row: a Fraction for "n/d", a Decimal otherwise.'''
+    return Fraction(text) if "/" in text else Decimal(text)
+
+
+def pack_exactly(value) -> Optional[float]:
+    '''value as a binary64 that restore() turns back into the same Decimal, digit for digit, else None.
+
+    Only ints and Decimals qualify: anything else would come back as another type.'''
+    kind = type(value)
+    if kind is int:
+        return float(value) if -(1 << 53) <= value <= 1 << 53 else None
+    if kind is not Decimal:
+        return None
+    text = str(value)
+    try:
+        packed = float(text)
+    except ValueError:
+        return None  # a signalling NaN
+    # restore() reads whole floats back as int digits and others from their repr: the same text, the same Decimal
+    if packed.is_integer():
+        return packed if str(int(packed)) == text else None
+    return packed if repr(packed) == text else None
+
+
+def _operand_text(value) -> bytes:
+    text = str(value).encode("ascii")
+    if len(text) > MAX_OPERAND_LENGTH:
+        raise ValueError(f"Operand of {len(text)} characters is too long to journal (at most {MAX_OPERAND_LENGTH})")
+    return text
+
+
+class FrameWriter:
+    '''Columns of the calculations queued for the next frame.'''
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.codes = array("B")
+        self.a = array("d")
+        self.b = array("d")
+        self.exact: List[bytes] = []
+        self.text = 0  # bytes of operand text in the exact rows
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def add(self, calculation: Calculation):
+        '''Queue one calculation; raises ValueError, queueing nothing, if it cannot be journaled.'''
+        code = _CODES.get(calculation.operation)
+        if code is None:
+            raise ValueError(f"Operation {calculation.operation.__name__} cannot be journaled")
+        a, b = calculation.a, calculation.b
+        packed_a, packed_b = pack_exactly(a), pack_exactly(b)
+        if packed_a is None or packed_b is None:
+            text_a, text_b = _operand_text(a), _operand_text(b)
+            self.exact.append(b"".join((EXACT_ROW.pack(len(self.codes), len(text_a)), text_a,
+                                        OPERAND_LENGTH.pack(len(text_b)), text_b)))
+            self.text += len(text_a) + len(text_b)
+            packed_a = packed_b = NAN
+        self.codes.append(code)
+        self.a.append(packed_a)
+        self.b.append(packed_b)
+
+    def take(self) -> bytes:
+        '''The queued calculations as one framed, checksummed frame; the queue is emptied.'''
+        a, b = self.a, self.b
+        if _SWAP:
+            a.byteswap()
+            b.byteswap()
+        payload = b"".join((FRAME_ROWS.pack(len(self.codes), len(self.exact)), self.codes.tobytes(),
+                            a.tobytes(), b.tobytes(), *self.exact))
+        self._reset()
+        return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class Frame:
+    '''The calculations of one journal frame, as columns.'''
+
+    __slots__ = ("codes", "a", "b", "exact")
+
+    def __init__(self, payload: bytes):
+        rows, exact_rows = FRAME_ROWS.unpack_from(payload)
+        position = FRAME_ROWS.size
+        self.codes = array("B", payload[position:position + rows])
+        position += rows
+        self.a, self.b = array("d"), array("d")
+        for column in (self.a, self.b):
+            column.frombytes(payload[position:position + 8 * rows])
+            if _SWAP:
+                column.byteswap()
+            position += 8 * rows
+        # row -> (a, b) for the operands written as text
+        self.exact: Dict[int, tuple] = {}
+        for _ in range(exact_rows):
+            row, length = EXACT_ROW.unpack_from(payload, position)
+            position += EXACT_ROW.size
+            a = payload[position:position + length].decode("ascii")
+            position += length
+            (length,) = OPERAND_LENGTH.unpack_from(payload, position)
+            position += OPERAND_LENGTH.size
+            b = payload[position:position + length].decode("ascii")
+            position += length
+            self.exact[row] = (decode_operand(a), decode_operand(b))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def calculations(self, start: int = 0) -> List[Calculation]:
+        '''Rebuild the calculations from row start on.'''
+        operations = map(OPERATIONS.__getitem__, self.codes[start:])
+        calculations = list(map(Calculation, map(restore, self.a[start:]), map(restore, self.b[start:]), operations))
+        for row, (a, b) in self.exact.items():
+            if row >= start:
+                calculations[row - start] = Calculation(a, b, OPERATIONS[self.codes[row]])
+        return calculations
+
+
+def _payloads(path: str) -> Iterator[Tuple[int, bytes]]:
+    '''Yield (end_offset, payload) for every intact frame in a journal file.
+
+    Stops at the first truncated or corrupt frame.'''
+    if not os.path.exists(path) or os.path.getsize(path) <= len(MAGIC):
+        return
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a calculation journal")
+        unpack_header = FRAME_HEADER.unpack_from
+        header_size = FRAME_HEADER.size
+        end = len(data)
+        offset = len(MAGIC)
+        while offset + header_size <= end:
+            length, checksum = unpack_header(data, offset)
+            start = offset + header_size
+            stop = start + length
+            if stop > end:
+                break
+            payload = data[start:stop]
+            if zlib.crc32(payload) != checksum:
+                break
+            yield stop, payload
+            offset = stop
+
+
+def scan(path: str) -> Iterator[Tuple[int, Frame]]:
+    '''Yield (end_offset, frame) for every intact frame in a journal file.'''
+    for stop, payload in _payloads(path):
+        yield stop, Frame(payload)
+
+
+def replay_frames(path: str, keep: Optional[int] = None) -> Iterator[List[Calculation]]:
+    '''Yield the calculations of a journal file frame by frame, oldest first.
+
+    With keep, only the newest keep calculations are rebuilt: older frames
+    are decoded but dropped, which is all a history of keep entries holds.'''
+    frames = (frame for _, frame in scan(path))
+    if keep is None:
+        for frame in frames:
+            yield frame.calculations()
+        return
+    tail = deque()
+    held = 0
+    for frame in frames:
+        tail.append(frame)
+        held += len(frame)
+        while held - len(tail[0]) >= keep:
+            held -= len(tail.popleft())
+    skip = max(0, held - keep)
+    for frame in tail:
+        yield frame.calculations(skip)
+        skip = 0
+
+
+def replay(path: str) -> Iterator[Calculation]:
+    '''Yield every intact calculation recorded in a journal file, oldest first.'''
+    for calculations in replay_frames(path):
+        yield from calculations
+
+
+class Journal:
+    '''Append-only, checksummed journal file with group commit.'''
+
+    def __init__(self, path: str, sync: str = "group", group_size: int = 256):
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f"sync must be one of {', '.join(SYNC_POLICIES)}")
+        self.path = path
+        self.sync = sync
+        self.group_size = 1 if sync == "always" else max(1, group_size)
+        self._pending = FrameWriter()
+        self._file = self._open_for_append()
+
+    def _open_for_append(self):
+        '''Open the journal, writing the header or cutting off a torn tail.'''
+        valid_end = len(MAGIC)
+        for valid_end, _ in _payloads(self.path):
+            pass
+        file = open(self.path, "ab")
+        if file.tell() < len(MAGIC):
+            file.truncate(0)
+            file.write(MAGIC)
+        elif file.tell() > valid_end:
+            file.truncate(valid_end)
+        file.flush()
+        return file
+
+    def append(self, calculation: Calculation):
+        '''Queue a calculation; it is written when the current group fills.
+
+        Raises ValueError for an operation or operand the journal cannot hold.'''
+        self._pending.add(calculation)
+        if len(self._pending) >= self.group_size or self._pending.text >= MAX_FRAME_TEXT:
+            self.flush()
+
+    def flush(self):
+        '''Write the queued group as one frame in one call and fsync according to the policy.'''
+        if self._pending:
+            self._file.write(self._pending.take())
+        self._file.flush()
+        if self.sync != "never":
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        '''Flush outstanding records and close the file.'''
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def compact(self, calculations: Iterable[Calculation]):
+        '''Rewrite the journal as a snapshot holding exactly the given calculations.
+
+        The snapshot is written to a temporary file, synced and then renamed
+        over the journal, so a crash leaves either the old or the new file.'''
+        self.flush()
+        temporary = self.path + ".compact"
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(MAGIC)
+            frame = FrameWriter()
+            for calculation in calculations:
+                frame.add(calculation)
+                if len(frame) >= 4096 or frame.text >= MAX_FRAME_TEXT:
+                    snapshot.write(frame.take())
+            if frame:
+                snapshot.write(frame.take())
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        self._file.close()
+        os.replace(temporary, self.path)
+        self._file = open(self.path, "ab")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculation journal maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    compact = subcommands.add_parser("compact", help="rewrite a journal into a snapshot")
+    compact.add_argument("path")
+    compact.add_argument("--keep", type=int, help="only keep the newest N calculations")
+    args = parser.parse_args(argv)
+
+    calculations = list(replay(args.path))
+    if args.keep is not None:
+        calculations = calculations[-args.keep:] if args.keep > 0 else []
+    journal = Journal(args.path)
+    journal.compact(calculations)
+    journal.close()
+    print(f"Compacted {args.path}: {len(calculations)} calculations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+'''
+Session-scoped calculation histories with per-session quotas.
+
+By default the Calculator records into Calculations, one history shared by
+the whole process. A Session is a separate history with its own limits on
+the number of entries and on their estimated memory, evicting its oldest
+calculations to stay within them. The Calculator records into whichever
+history is active in the current context:
+
+    with sessions.get("tenant-42").activate():
+        Calculator.add(Decimal(1), Decimal(2))   # recorded in tenant-42 only
+
+The active history lives in a context variable (history_context), so each
+thread and each asyncio task sees its own; tasks start with the context of
+the code that created them. Outside any session it is the Calculations
+class itself, which offers the same add_calculation/get_history/...
+methods as a Session.
+
+SessionRegistry hands out sessions by name, lists them with their usage,
+and releases them explicitly or once they have been idle for a while.
+Sessions are not written to the Calculator's journal, which only persists
+the shared history.
+'''
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.calculator.calculation import Calculation
+from app.calculator.calculations import Calculations
+
+# Per-entry cost of the deque slot that holds a calculation
+_SLOT_BYTES = 8
+
+
+def entry_bytes(calculation: Calculation) -> int:
+    '''Estimated memory of one history entry: the calculation, its operands and a known result.'''
+    size = _SLOT_BYTES + sys.getsizeof(calculation) + sys.getsizeof(calculation.a) + sys.getsizeof(calculation.b)
+    if calculation.evaluated:
+        try:
+            size += sys.getsizeof(calculation.perform())
+        except (ArithmeticError, ValueError):
+            pass
+    return size
+
+
+class Session:
+    '''A named history of calculations, bounded by max_entries and/or max_bytes.
+
+    Calculations are held in insertion order; when adding one breaks a quota
+    the oldest are evicted. Memory is the entry_bytes estimate taken when a
+    calculation is added (a deferred calculation's later result is not
+    counted).'''
+
+    def __init__(self, name: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evicted = 0
+        self._clock = clock
+        self.last_used = clock()
+        self._entries = deque()  # (calculation, entry_bytes) oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"Session({self.name!r}, entries={len(self)}, bytes={self.bytes})"
+
+    @contextmanager
+    def activate(self) -> Iterator["Session"]:
+        '''Make this the history the Calculator records into, for the current context.'''
+        token = history_context.set(self)
+        self.last_used = self._clock()
+        try:
+            yield self
+        finally:
+            history_context.reset(token)
+
+    def add_calculation(self, calculation: Calculation):
+        '''Add a calculation, evicting the oldest ones while a quota is exceeded.'''
+        size = entry_bytes(calculation)
+        with self._lock:
+            entries = self._entries
+            entries.append((calculation, size))
+            self.bytes += size
+            while (self.max_entries is not None and len(entries) > self.max_entries
+                   or self.max_bytes is not None and self.bytes > self.max_bytes and len(entries) > 1):
+                _, evicted = entries.popleft()
+                self.bytes -= evicted
+                self.evicted += 1
+            self.last_used = self._clock()
+
+    def get_history(self) -> List[Calculation]:
+        '''The session's calculations, oldest first.'''
+        with self._lock:
+            return [calculation for calculation, _ in self._entries]
+
+    def get_latest(self) -> Optional[Calculation]:
+        '''The most recent calculation, or None if there is none.'''
+        with self._lock:
+            return self._entries[-1][0] if self._entries else None
+
+    def find_by_operation(self, operation_name: str) -> List[Calculation]:
+        '''Calculations whose operation has the given name, oldest first.'''
+        return [calculation for calculation in self.get_history() if calculation.operation.__name__ == operation_name]
+
+    def clear_history(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        '''Usage and quotas, as plain data.'''
+        return {
+            "entries": len(self),
+            "bytes": self.bytes,
+            "evicted": self.evicted,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self._clock() - self.last_used,
+        }
+
+
+# The history the Calculator records into; the shared Calculations unless a session is active
+history_context: ContextVar = ContextVar("history_context", default=Calculations)
+
+
+def current_history():
+    '''The active Session, or the Calculations class outside any session.'''
+    return history_context.get()
+
+
+class SessionRegistry:
+    '''Sessions by name, created on first use with the registry's default quotas.'''
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 idle_timeout: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sessions
+
+    def get(self, name: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> Session:
+        '''The named session, created with the given (or the registry's default) quotas if needed.'''
+        session = self._sessions.get(name)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(name)
+                if session is None:
+                    session = self._sessions[name] = Session(
+                        name,
+                        max_entries if max_entries is not None else self.max_entries,
+                        max_bytes if max_bytes is not None else self.max_bytes,
+                        self._clock,
+                    )
+        return session
+
+    def sessions(self) -> Dict[str, dict]:
+        '''Session name -> Session.stats(), sorted by name.'''
+        return {name: session.stats() for name, session in sorted(self._sessions.copy().items())}
+
+    def total_bytes(self) -> int:
+        return sum(session.bytes for session in self._sessions.copy().values())
+
+    def release(self, name: str) -> Optional[Session]:
+        '''Forget a session; returns it, or None if there was none. Code still holding it keeps working.'''
+        with self._lock:
+            return self._sessions.pop(name, None)
+
+    def release_idle(self, idle_timeout: Optional[float] = None) -> List[str]:
+        '''Release the sessions unused for idle_timeout seconds (default: the registry's); returns their names.'''
+        idle_timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        if idle_timeout is None:
+            raise ValueError("No idle timeout given")
+        cutoff = self._clock() - idle_timeout
+        with self._lock:
+            idle = [name for name, session in self._sessions.items() if session.last_used <= cutoff]
+            for name in idle:
+                del self._sessions[name]
+        return idle
+
+
+# Process-wide registry; deployments set its default quotas (and idle_timeout) at start-up
+sessions = SessionRegistry()
@@ -1,8 +1,14 @@
 import logging
+import threading
 from abc import ABC, abstractmethod
+from importlib import import_module
+from time import perf_counter_ns
+from app.logging_setup import sample_operation
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured once by app.logging_setup; modules only create loggers
+logger = logging.getLogger(__name__)
+# One record per executed command, subject to app.logging_setup.set_operation_sampling
+operations_logger = logging.getLogger("app.commands.operations")
 
 class Command(ABC):
     '''This is the abstract base class for commands.'''
@@ -10,28 +16,290 @@ class Command(ABC):
     def execute(self, *args):
         pass
 
+    def execute_batch(self, *columns):
+        '''Executes the command once per row of the operand columns.
+
+        Subclasses override this with a vectorized kernel; this fallback
+        just calls execute and flags rows that returned None.'''
+        from app.commands.batch import BatchResult
+        values = [self.execute(*row) for row in zip(*columns)]
+        return BatchResult(values, [value is None for value in values])
+
 class CommandHandler:
-    '''This is the CommandHandler class.'''
+    '''This is the CommandHandler class.
+
+    Commands are either registered as instances, or lazily as a
+    "module:Class" path that is only imported and instantiated the first
+    time the command is used.
+
+    Registration is copy-on-write: commands and lazy_commands are never
+    mutated, only replaced (under a lock) by updated copies, so looking a
+    command up takes no lock from any number of threads. version counts
+    the changes, for callers that cache anything derived from the commands.
+
+    Per-command metrics (see app.metrics) are off by default; while they
+    are off, Execute_Command and evaluate only pay one "is None" check.
+
+    The arithmetic commands compute with their built-in int/float path
+    unless a numeric backend (see app.numeric) is chosen with use_backend.
+
+    evaluate_pipeline runs "add 1 2 | multiply 3" pipelines (see
+    app.pipeline), compiling each one once.
+
+    Commands are dispatched by name with one dict lookup. Only a name that
+    is not a loaded command goes through registry() (see
+    app.commands.registry), which also accepts aliases and unambiguous
+    abbreviations; the REPL, batch mode and the Menu plugin all list and
+    resolve commands through it.'''
     def __init__(self):
         self.commands = {}
+        self.lazy_commands = {}
+        self.aliases = {}
+        self.version = 0
+        self._registry = None
+        self._lock = threading.RLock()
+        self.recorder = None
+        self.backend = None
+        self.pipelines = None
+
+    def use_backend(self, spec):
+        '''Makes every command that has a backend compute with the given numeric backend.
+
+        spec is a name from app.numeric.BACKENDS or a NumericBackend; None
+        restores the commands' built-in path. Returns the backend.'''
+        from app.numeric import get_backend  # app.numeric imports app.commands.reduce
+        self.backend = get_backend(spec) if spec is not None else None
+        for command in self.commands.values():
+            self._apply_backend(command)
+        return self.backend
+
+    def _apply_backend(self, command):
+        if hasattr(command, "backend"):
+            command.backend = self.backend
+
+    def enable_metrics(self):
+        '''Starts recording calls, errors and latency per command; returns the recorder.'''
+        if self.recorder is None:
+            from app.metrics import MetricsRecorder
+            self.recorder = MetricsRecorder()
+        return self.recorder
+
+    def disable_metrics(self):
+        '''Stops recording and drops the metrics collected so far.'''
+        self.recorder = None
+
+    def metrics(self):
+        '''Returns a snapshot of the per-command metrics ({} while disabled).'''
+        return self.recorder.snapshot() if self.recorder is not None else {}
+
+    def _publish(self, command_name: str, command=None, lazy=None):
+        '''Replaces commands and lazy_commands with copies where command_name maps to command or lazy.
+
+        Must be called with the lock held. The new commands are published
+        before the lazy entry goes away, so a concurrent lookup always finds
+        the name in one of them.'''
+        commands, lazy_commands = self.commands, self.lazy_commands
+        if command is not None or command_name in commands:
+            commands = dict(commands)
+            commands.pop(command_name, None)
+            if command is not None:
+                commands[command_name] = command
+        if lazy is not None or command_name in lazy_commands:
+            lazy_commands = dict(lazy_commands)
+            lazy_commands.pop(command_name, None)
+            if lazy is not None:
+                lazy_commands[command_name] = lazy
+        self.commands = commands
+        self.lazy_commands = lazy_commands
+        self.version += 1
 
     def Register_Command(self, command_name: str, command: Command):
         '''This function registers a command.'''
-        self.commands[command_name] = command
-        logging.info(f"Registered command: {command_name}")
+        if self.backend is not None:
+            self._apply_backend(command)
+        with self._lock:
+            self._publish(command_name, command=command)
+        logger.debug("Registered command: %s", command_name)
+
+    def register_lazy(self, command_name: str, target: str, *init_args):
+        '''Registers a command by its "module:Class" path without importing it.
+
+        The class is instantiated with init_args when the command is first used.'''
+        if ":" not in target:
+            raise ValueError(f"Lazy command target must look like 'module:Class', got {target!r}")
+        with self._lock:
+            self._publish(command_name, lazy=(target, init_args))
+
+    def register_alias(self, alias: str, command_name: str):
+        '''Makes alias another name of a registered command, "+" for "add".'''
+        with self._lock:
+            if alias in self.commands or alias in self.lazy_commands:
+                raise ValueError(f"Alias {alias!r} is already a command")
+            if command_name not in self.commands and command_name not in self.lazy_commands:
+                raise KeyError(f"{command_name}: Command not found")
+            self.aliases = {**self.aliases, alias: command_name}
+            self.version += 1
+
+    def registry(self):
+        '''Returns the Registry of the current command names and aliases.
+
+        The same immutable snapshot is returned until version changes.'''
+        registry = self._registry
+        if registry is None or registry.version != self.version:
+            from app.commands.registry import Registry
+            # version is read first: the commands read after it are at least that recent
+            version = self.version
+            commands = self.commands
+            # A command loaded between the two reads would otherwise be listed twice
+            names = [*commands, *(name for name in self.lazy_commands if name not in commands)]
+            registry = self._registry = Registry(version, names, self.aliases)
+        return registry
+
+    def resolve(self, command_name: str):
+        '''Returns the command name that command_name, an alias or an abbreviation, stands for.
+
+        Returns None if it stands for no command; raises KeyError if it
+        abbreviates several.'''
+        return self.registry().resolve(command_name)
+
+    def _lookup(self, command_name: str):
+        '''Returns (name, command) for a name, alias or abbreviation; command is None if there is none.'''
+        command = self.commands.get(command_name)
+        if command is not None:
+            return command_name, command
+        resolved = self.resolve(command_name)
+        if resolved is None:
+            return command_name, None
+        return resolved, self._command(resolved)
+
+    def _command(self, command_name: str):
+        '''Returns the command instance, importing a lazily registered one on first use.
+
+        Returns None for an unknown command; raises KeyError if a lazy
+        command's module or class cannot be loaded.'''
+        command = self.commands.get(command_name)
+        if command is not None:
+            return command
+        if command_name not in self.lazy_commands:
+            # Another thread may have loaded it since commands was read
+            return self.commands.get(command_name)
+        with self._lock:
+            # Checked again under the lock, so each lazy command is instantiated once
+            command = self.commands.get(command_name)
+            lazy = self.lazy_commands.get(command_name)
+            if command is not None or lazy is None:
+                return command
+            target, init_args = lazy
+            module_name, _, class_name = target.partition(":")
+            try:
+                command = getattr(import_module(module_name), class_name)(*init_args)
+            except (ImportError, AttributeError) as e:
+                raise KeyError(f"{command_name}: Command could not be loaded from {target} - {e}") from e
+            if self.backend is not None:
+                self._apply_backend(command)
+            self._publish(command_name, command=command)
+        logger.debug("Loaded command: %s from %s", command_name, target)
+        return command
 
     def Execute_Command(self, command_name: str, *args):
         '''Executes a registered command if it exists.'''
+        if self.recorder is None:
+            return self._execute(command_name, args)
+        return self._execute_measured(command_name, args)
+
+    def _execute(self, command_name: str, args):
         try:
-            if command_name in self.commands:
-                logging.info(f"Executing command: {command_name} with arguments: {args}")
-                return self.commands[command_name].execute(*args)
+            command = self.commands.get(command_name)
+            if command is None:
+                command_name, command = self._lookup(command_name)
+            if command is not None:
+                if operations_logger.isEnabledFor(logging.INFO) and sample_operation():
+                    operations_logger.info("Executing command: %s with arguments: %s", command_name, args)
+                return command.execute(*args)
             else:
-                logging.warning(f"{command_name}: Command not found")
+                logger.warning("%s: Command not found", command_name)
         except (KeyError, TypeError) as e:
-            logging.error(f"{command_name}: Invalid command or incorrect arguments provided - {e}")
+            logger.error("%s: Invalid command or incorrect arguments provided - %s", command_name, e)
+
+    def _execute_measured(self, command_name: str, args):
+        '''Execute_Command with metrics recording.
+
+        Commands with a compute method report bad input by returning None
+        from execute, so that counts as an error for them; any exception
+        counts as an error for every command.'''
+        recorder = self.recorder
+        try:
+            # Recorded under its own name, however it was typed; a lazy command's import is not part of its latency
+            command_name = self._lookup(command_name)[0]
+        except KeyError:
+            pass  # _execute logs it
+        started = perf_counter_ns()
+        error = True
+        try:
+            result = self._execute(command_name, args)
+            error = result is None and hasattr(self.commands.get(command_name), "compute")
+            return result
+        finally:
+            if command_name in self.commands:
+                recorder.record(command_name, perf_counter_ns() - started, error)
+
+    def evaluate(self, command_name: str, *args):
+        '''Evaluates a registered command without printing or logging.
+
+        Raises KeyError for an unknown command and ValueError, with a message
+        meant for the user, for invalid arguments. Commands that have no
+        compute method fall back to execute.'''
+        command = self.commands.get(command_name)
+        if command is None:
+            command_name, command = self._lookup(command_name)
+        if command is None:
+            raise KeyError(f"{command_name}: Command not found")
+        compute = getattr(command, "compute", None)
+        if compute is None:
+            compute = command.execute
+        recorder = self.recorder
+        if recorder is None:
+            return compute(*args)
+        started = perf_counter_ns()
+        error = True
+        try:
+            result = compute(*args)
+            error = False
+            return result
+        finally:
+            recorder.record(command_name, perf_counter_ns() - started, error)
+
+    def evaluate_pipeline(self, tokens):
+        '''Evaluates a tokenized pipeline, "add 1 2 | multiply 3" split on whitespace and "|".
+
+        Raises like evaluate. Compiled pipelines are cached in self.pipelines.'''
+        if self.pipelines is None:
+            from app.pipeline import PipelineCache
+            self.pipelines = PipelineCache(self)
+        return self.pipelines.evaluate(tokens)
+
+    def execute_batch(self, command_name: str, columns):
+        '''Executes a registered command over whole operand columns.
+
+        Returns a BatchResult with a result column and a per-row error mask,
+        or None if the command does not exist, is ambiguous or cannot be loaded.'''
+        try:
+            command_name, command = self._lookup(command_name)
+        except KeyError as e:
+            logger.error("%s: Invalid command or incorrect arguments provided - %s", command_name, e)
+            return None
+        if command is None:
+            logger.warning("%s: Command not found", command_name)
+            return None
+        operations_logger.info("Executing batch command: %s over %d columns", command_name, len(columns))
+        return command.execute_batch(*columns)
 
     def get_registered_commands(self):
-        '''Returns a list of registered commands.'''
-        logging.info("Fetching list of registered commands")
-        return list(self.commands.keys())
+        '''Returns the sorted names of the registered commands, lazy ones included, without loading them.
+
+        The tuple is shared until the commands change; see registry().'''
+        return self.registry().names
+
+    def Get_Registered_Commands(self):
+        '''Alias of get_registered_commands, used by the Menu plugin.'''
+        return self.get_registered_commands()
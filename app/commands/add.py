@@ -1,12 +1,35 @@
 from app.commands import Command
+from app.commands.batch import compute_rows, add_kernel, kernel_applies
+from app.commands.reduce import reduce_add
 
 class AddCommand(Command):
     '''Command to perform addition.'''
+    def __init__(self, accurate=False):
+        # accurate=True sums with math.fsum instead of naive float addition
+        self.accurate = accurate
+        # app.numeric backend set by CommandHandler.use_backend; None keeps the built-in int/float path
+        self.backend = None
+
+    def compute(self, *args):
+        '''Adds the arguments, raising ValueError with a user-facing message on bad input.'''
+        return self.reduce(args)
+
+    def reduce(self, values):
+        '''Streaming form of compute: values may be any iterable of tokens or numbers.'''
+        if self.backend is None:
+            return reduce_add(values, self.accurate)
+        return self.backend.add(values)
+
     def execute(self, *args):
         try:
-            numbers = list(map(float, args))  # Convert input arguments to float
-            result = sum(numbers)
-            return int(result) if result.is_integer() else result  # Convert to int if whole number
-        except ValueError:
-            print("Error: Invalid input. Please enter numbers.")
+            return self.compute(*args)
+        except ValueError as e:
+            print(f"Error: {e}")
             return None
+
+    def execute_batch(self, *columns):
+        '''Vectorized add over operand columns where the float kernel applies, else row by row;
+        errors are reported in the mask.'''
+        if kernel_applies(self, columns):
+            return add_kernel(*columns)
+        return compute_rows(self.compute, columns)
@@ -0,0 +1,227 @@
+'''Columnar kernels used by Command.execute_batch.
+
+Each kernel takes whole operand columns (lists, array.array or NumPy arrays)
+and returns a BatchResult: one result per row plus a per-row error mask,
+instead of printing an error and returning None like Command.execute does.
+
+The kernels compute in binary float. The arithmetic commands only use them
+where that is exactly what computing each row would give (see
+kernel_applies): under the float backend, or on columns of floats under the
+built-in path without compensated summation. Otherwise compute_rows runs the
+command on each row, so batches keep the command's number type and exact
+ints.
+'''
+from array import array
+import math
+import operator
+import sys
+from typing import Callable, List, NamedTuple, Sequence
+
+from app.commands.reduce import ScaledProduct
+
+# NumPy is optional and only looked up once a batch runs: importing it costs more than the rest of app
+numpy = None
+
+NAN = math.nan
+_NORMAL_MIN = sys.float_info.min
+
+
+class BatchResult(NamedTuple):
+    '''Result column and per-row error mask of a batch execution.'''
+    values: Sequence
+    errors: Sequence
+
+
+def numpy_columns(columns):
+    '''Returns the columns as float64 ndarrays when any of them is an ndarray.
+
+    Returns None when NumPy is unavailable, no column is an ndarray, or a
+    column does not convert; callers then use the per-row Python path.'''
+    global numpy
+    # A column can only be an ndarray if whoever built it already imported NumPy
+    if numpy is None:
+        numpy = sys.modules.get("numpy")
+    if numpy is None or not any(isinstance(column, numpy.ndarray) for column in columns):
+        return None
+    try:
+        return [numpy.asarray(column, dtype=numpy.float64) for column in columns]
+    except (TypeError, ValueError):
+        return None
+
+
+def row_count(columns) -> int:
+    '''Returns the common length of the columns, raising ValueError on a mismatch.'''
+    lengths = {len(column) for column in columns}
+    if len(lengths) > 1:
+        raise ValueError("All operand columns must have the same length.")
+    return lengths.pop() if lengths else 0
+
+
+def is_float_column(column) -> bool:
+    '''True when every operand in the column is already a float.'''
+    if isinstance(column, array):
+        return column.typecode in "fd"
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column.dtype.kind == "f"
+    return set(map(type, column)) <= {float}
+
+
+def kernel_applies(command, columns) -> bool:
+    '''True when a float kernel gives exactly the command's row-by-row results.
+
+    The float backend always computes in float. The built-in path (and the
+    auto backend) does too for float operands, unless it sums accurately;
+    integer operands stay exact ints there, and the other backends have
+    number types of their own.'''
+    global numpy
+    backend = command.backend
+    name = backend.name if backend is not None else "auto"
+    if name == "float":
+        return True
+    if name != "auto" or getattr(backend if backend is not None else command, "accurate", False):
+        return False
+    if numpy is None:
+        numpy = sys.modules.get("numpy")
+    return all(map(is_float_column, columns))
+
+
+def compute_rows(compute: Callable, columns) -> BatchResult:
+    '''compute(*row) for every row; rows that raise ValueError are flagged in the mask.'''
+    rows = row_count(columns)
+    values, errors = [None] * rows, [False] * rows
+    for index, row in enumerate(zip(*columns)):
+        try:
+            values[index] = compute(*row)
+        except ValueError:
+            errors[index] = True
+    return BatchResult(values, errors)
+
+
+def float_column(column, bad: set) -> List[float]:
+    '''Converts a column to floats, adding the index of every unparsable row to bad.'''
+    try:
+        return list(map(float, column))
+    except (TypeError, ValueError):
+        pass
+    values = []
+    for index, item in enumerate(column):
+        try:
+            values.append(float(item))
+        except (TypeError, ValueError):
+            values.append(NAN)
+            bad.add(index)
+    return values
+
+
+def finish(values: List[float], bad: set, rows: int) -> BatchResult:
+    '''Collapses whole numbers to int and blanks out failed rows.'''
+    values = [int(value) if value.is_integer() else value for value in values]
+    errors = [False] * rows
+    for index in bad:
+        values[index] = None
+        errors[index] = True
+    return BatchResult(values, errors)
+
+
+def fold(columns: List[List[float]], op: Callable[[float, float], float]) -> List[float]:
+    '''Folds the columns left to right with a binary operator.'''
+    result = columns[0]
+    for column in columns[1:]:
+        result = list(map(op, result, column))
+    return result
+
+
+def add_kernel(*columns) -> BatchResult:
+    '''Row-wise sum of all columns.'''
+    rows = row_count(columns)
+    if not columns:
+        return BatchResult([], [])
+    arrays = numpy_columns(columns)
+    if arrays is not None:
+        return _numpy_fold(arrays, numpy.add)
+    bad = set()
+    return finish(fold([float_column(column, bad) for column in columns], operator.add), bad, rows)
+
+
+def subtract_kernel(*columns) -> BatchResult:
+    '''Row-wise first column minus the sum of the remaining columns.'''
+    rows = row_count(columns)
+    if not columns:
+        return BatchResult([], [])
+    arrays = numpy_columns(columns)
+    if arrays is not None:
+        first, *rest = arrays
+        return _numpy_finish(first - sum(rest) if rest else first)
+    bad = set()
+    first, *rest = [float_column(column, bad) for column in columns]
+    # Same evaluation order as SubtractCommand: numbers[0] - sum(numbers[1:])
+    values = list(map(operator.sub, first, fold(rest, operator.add))) if rest else first
+    return finish(values, bad, rows)
+
+
+def multiply_kernel(*columns) -> BatchResult:
+    '''Row-wise product of all columns.'''
+    rows = row_count(columns)
+    if not columns:
+        return BatchResult([], [])
+    arrays = numpy_columns(columns)
+    if arrays is not None:
+        return _numpy_fold(arrays, numpy.multiply)
+    bad = set()
+    return finish(fold([float_column(column, bad) for column in columns], operator.mul), bad, rows)
+
+
+def divide_kernel(*columns) -> BatchResult:
+    '''Row-wise first column divided by the product of the remaining columns.
+
+    Like the commands, each row divides once, by its divisors' product; a
+    product out of the normal float range is recomputed as a ScaledProduct.
+    Rows with a zero divisor are flagged in the error mask, as is every row
+    when fewer than two columns are given.'''
+    rows = row_count(columns)
+    if len(columns) < 2:
+        return BatchResult([None] * rows, [True] * rows)
+    arrays = numpy_columns(columns)
+    if arrays is not None:
+        first, *rest = arrays
+        zero = numpy.zeros(rows, dtype=bool)
+        for column in rest:
+            zero |= column == 0
+        with numpy.errstate(divide="ignore", invalid="ignore", over="ignore", under="ignore"):
+            return _numpy_finish(first / _numpy_product(rest), zero)
+    bad = set()
+    first, *rest = [float_column(column, bad) for column in columns]
+    for column in rest:
+        bad.update(index for index, num in enumerate(column) if num == 0)
+    values = []
+    for index, (numerator, divisor) in enumerate(zip(first, fold(rest, operator.mul))):
+        if index in bad:
+            values.append(NAN)
+        elif _NORMAL_MIN <= abs(divisor) < math.inf:
+            values.append(numerator / divisor)
+        else:
+            scaled = ScaledProduct()
+            scaled.multiply([column[index] for column in rest])
+            values.append(scaled.divide(numerator))
+    return finish(values, bad, rows)
+
+
+def _numpy_product(arrays):
+    product = arrays[0]
+    for column in arrays[1:]:
+        product = product * column
+    return product
+
+
+def _numpy_fold(arrays, ufunc) -> BatchResult:
+    first, *rest = arrays
+    for column in rest:
+        first = ufunc(first, column)
+    return _numpy_finish(first)
+
+
+def _numpy_finish(values, errors=None) -> BatchResult:
+    '''NumPy results stay float64; failed rows are set to NaN.'''
+    if errors is None:
+        errors = numpy.zeros(len(values), dtype=bool)
+    return BatchResult(numpy.where(errors, numpy.nan, values), errors)
@@ -1,20 +1,32 @@
 from app.commands import Command
+from app.commands.batch import compute_rows, divide_kernel, kernel_applies
+from app.commands.reduce import reduce_divide
 
 class DivideCommand(Command):
     '''Command to perform division.'''
+    # app.numeric backend set by CommandHandler.use_backend; None keeps the built-in int/float path
+    backend = None
+
+    def compute(self, *args):
+        '''Divides the first argument by the product of the rest, raising ValueError on bad input.'''
+        return self.reduce(args)
+
+    def reduce(self, values):
+        '''Streaming form of compute: values may be any iterable of tokens or numbers.'''
+        if self.backend is None:
+            return reduce_divide(values)
+        return self.backend.divide(values)
+
     def execute(self, *args):
         try:
-            numbers = list(map(float, args))
-            if len(numbers) < 2:
-                print("Error: Division requires at least two numbers.")
-                return None
-            result = numbers[0]
-            for num in numbers[1:]:
-                if num == 0:
-                    print("Error: Division by zero is not allowed.")
-                    return None
-                result /= num
-            return int(result) if result.is_integer() else result
-        except ValueError:
-            print("Error: Invalid input. Please enter numbers.")
+            return self.compute(*args)
+        except ValueError as e:
+            print(f"Error: {e}")
             return None
+
+    def execute_batch(self, *columns):
+        '''Vectorized divide over operand columns where the float kernel applies, else row by row;
+        errors are reported in the mask.'''
+        if kernel_applies(self, columns):
+            return divide_kernel(*columns)
+        return compute_rows(self.compute, columns)
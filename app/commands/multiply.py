@@ -1,14 +1,32 @@
 from app.commands import Command
+from app.commands.batch import compute_rows, multiply_kernel, kernel_applies
+from app.commands.reduce import reduce_multiply
 
 class MultiplyCommand(Command):
     '''Command to perform multiplication.'''
+    # app.numeric backend set by CommandHandler.use_backend; None keeps the built-in int/float path
+    backend = None
+
+    def compute(self, *args):
+        '''Multiplies the arguments, raising ValueError with a user-facing message on bad input.'''
+        return self.reduce(args)
+
+    def reduce(self, values):
+        '''Streaming form of compute: values may be any iterable of tokens or numbers.'''
+        if self.backend is None:
+            return reduce_multiply(values)
+        return self.backend.multiply(values)
+
     def execute(self, *args):
         try:
-            numbers = list(map(float, args))
-            result = 1
-            for num in numbers:
-                result *= num
-            return int(result) if result.is_integer() else result
-        except ValueError:
-            print("Error: Invalid input. Please enter numbers.")
+            return self.compute(*args)
+        except ValueError as e:
+            print(f"Error: {e}")
             return None
+
+    def execute_batch(self, *columns):
+        '''Vectorized multiply over operand columns where the float kernel applies, else row by row;
+        errors are reported in the mask.'''
+        if kernel_applies(self, columns):
+            return multiply_kernel(*columns)
+        return compute_rows(self.compute, columns)
@@ -0,0 +1,428 @@
+'''
+Streaming reductions behind the arithmetic commands.
+
+Each reduction takes any iterable of operands, whether strings (tokens) or
+numbers, including a generator or read_tokens() over a file. It consumes the
+operands CHUNK_SIZE at a time, so memory stays constant however many operands
+there are:
+
+* chunks made only of integer tokens take an exact int fast path;
+* everything else is converted with float(), at C speed per chunk;
+* reduce_add/reduce_subtract(accurate=True) feed every float to a single
+  math.fsum, which rounds once instead of at every addition;
+* wide exact operands (more than TREE_MIN_BITS between them) are multiplied
+  as a product tree, not folded left to right (see balanced_reduce);
+* reduce_divide divides once, by the product of the divisors, after
+  checking each chunk of divisors for zero (see ScaledProduct).
+
+Results follow the commands' convention: whole floats come back as int.
+Bad operands raise ValueError with the commands' user-facing message.
+
+    python -m app.commands.reduce add numbers.txt --accurate
+'''
+import argparse
+from itertools import chain, islice
+import math
+import operator
+import sys
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, TextIO
+
+CHUNK_SIZE = 4096
+INVALID_INPUT = "Invalid input. Please enter numbers."
+# Exact operands totalling more bits than this are reduced as a balanced tree
+TREE_MIN_BITS = 1 << 13
+DIVISION_BY_ZERO = "Division by zero is not allowed."
+_NORMAL_MIN = sys.float_info.min
+
+
+def chunks(values: Iterable, size: int = CHUNK_SIZE) -> Iterable[Sequence]:
+    '''Sequences of up to size operands, in order.'''
+    if type(values) is tuple and len(values) <= size:
+        # compute(*args) passes a short tuple: use it as the only chunk, no copy, no generator
+        return (values,) if values else ()
+    return _chunked(values, size)
+
+
+def _chunked(values: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def balanced_reduce(numbers: Sequence, combine: Callable):
+    '''Reduce a non-empty sequence by combining neighbours pairwise, level by level.
+
+    Folding left to right multiplies an ever larger accumulator by one small
+    operand at a time, which is quadratic in the size of the result. A
+    product tree only combines operands of similar size, so the cost follows
+    the big multiplications at the top (Karatsuba for ints, NTT for
+    Decimals). Summed pairwise, Fractions likewise keep their denominators
+    small until the last levels.'''
+    while len(numbers) > 1:
+        paired = list(map(combine, numbers[::2], numbers[1::2]))
+        if len(numbers) % 2:
+            paired.append(numbers[-1])
+        numbers = paired
+    return numbers[0]
+
+
+def tree_product(numbers: Sequence):
+    return balanced_reduce(numbers, operator.mul)
+
+
+def pairwise_sum(numbers: Sequence):
+    return balanced_reduce(numbers, operator.add)
+
+
+class BalancedReduction:
+    '''balanced_reduce over a stream: partial results are pushed one at a time.
+
+    Partials are kept on a stack like the digits of a binary counter: a
+    partial is combined with the one below it as soon as that one covers no
+    more operands than it does. Memory is O(log n) partials, and the tree
+    stays balanced however many chunks arrive.'''
+
+    def __init__(self, combine: Callable):
+        self.combine = combine
+        self._stack = []  # (operands covered, partial), covering strictly fewer operands towards the top
+
+    def push(self, value, weight: int = 1):
+        '''Add the partial result of weight operands, which come after everything pushed so far.'''
+        stack = self._stack
+        while stack and stack[-1][0] <= weight:
+            covered, partial = stack.pop()
+            value = self.combine(partial, value)
+            weight += covered
+        stack.append((weight, value))
+
+    def __bool__(self):
+        return bool(self._stack)
+
+    def result(self):
+        '''The reduction of everything pushed (which must be something).'''
+        stack = self._stack
+        value = stack[-1][1]
+        for _, partial in reversed(stack[:-1]):
+            value = self.combine(partial, value)
+        return value
+
+
+def _frexp(value) -> tuple:
+    '''math.frexp, also for ints beyond float range.'''
+    if type(value) is int and value.bit_length() > 1000:
+        shift = value.bit_length() - 64
+        mantissa, exponent = math.frexp(value >> shift if value > 0 else -(-value >> shift))
+        return mantissa, exponent + shift
+    return math.frexp(value)
+
+
+class ScaledProduct:
+    '''A product of floats kept as mantissa * 2 ** exponent.
+
+    The exponent is a Python int, so the product never overflows or
+    underflows however many operands it covers; only the final quotient is
+    brought back into float range. Chunks are multiplied with math.prod at C
+    speed, and only a chunk whose product leaves the normal float range is
+    redone operand by operand.'''
+
+    __slots__ = ("mantissa", "exponent")
+
+    def __init__(self):
+        self.mantissa = 1.0  # 0.5 <= |mantissa| < 1 after the first multiply, or inf / nan
+        self.exponent = 0
+
+    def multiply(self, floats: Sequence[float]):
+        product = math.prod(floats, start=self.mantissa)
+        if not _NORMAL_MIN <= abs(product) < math.inf:
+            product = self.mantissa
+            for value in floats:
+                mantissa, exponent = math.frexp(value)
+                product, scale = math.frexp(product * mantissa)
+                self.exponent += exponent + scale
+        mantissa, exponent = math.frexp(product)
+        self.mantissa = mantissa
+        self.exponent += exponent
+
+    def multiply_int(self, value: int):
+        mantissa, exponent = _frexp(value)
+        self.multiply((mantissa,))
+        self.exponent += exponent
+
+    def divide(self, numerator) -> float:
+        '''numerator / product, as a float (rounded to 0 or infinity only if the quotient is out of range).'''
+        mantissa, exponent = _frexp(numerator)
+        quotient = mantissa / self.mantissa
+        try:
+            return math.ldexp(quotient, exponent - self.exponent)
+        except OverflowError:
+            return math.inf if quotient > 0 else -math.inf
+
+
+def wide_ints(numbers: Sequence[int]) -> bool:
+    '''True when integer operands are big enough for a product tree to pay off.'''
+    return len(numbers) > 2 and sum(map(int.bit_length, numbers)) > TREE_MIN_BITS
+
+
+def _int_chunk(chunk: Sequence) -> Optional[List[int]]:
+    '''The chunk as ints if every operand is an integer or integer token, else None.'''
+    if type(chunk[0]) is str:
+        try:
+            digits = "".join(chunk)
+        except TypeError:
+            return None  # mixed strings and numbers
+        # A cheap screen so float tokens never pay for a failed int() conversion
+        if not digits.isdigit() and not ("-" in digits and digits.replace("-", "").replace("+", "").isdigit()):
+            return None
+        try:
+            return list(map(int, chunk))
+        except ValueError:
+            return None
+    # int() would truncate float operands, so numbers must already be ints
+    if type(chunk[0]) is int and set(map(type, chunk)) == {int}:
+        return chunk
+    return None
+
+
+def _float_chunk(chunk: Sequence) -> List[float]:
+    try:
+        try:
+            return list(map(float, chunk))
+        except OverflowError:
+            return list(map(_to_float, chunk))  # an int beyond float range, e.g. from a pipeline stage
+    except (TypeError, ValueError):
+        raise ValueError(INVALID_INPUT) from None
+
+
+def parse_number(value):
+    '''One operand as int (integer tokens and ints) or float.'''
+    if type(value) is int:
+        return value
+    if type(value) is str and (value.isdigit() or value[:1] in ("-", "+") and value[1:].isdigit()):
+        return int(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(INVALID_INPUT) from None
+
+
+def _to_float(value) -> float:
+    '''float(value), with numbers beyond float range as infinities of their sign.'''
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf  # copysign would convert value to float too
+
+
+def normalize(result):
+    '''Whole floats become int, like the commands have always returned.'''
+    if isinstance(result, float) and result.is_integer():
+        return int(result)
+    return result
+
+
+def _sum(values: Iterable, accurate: bool):
+    '''Sum of the operands: an int if every operand was an integer, else a float.'''
+    if type(values) is tuple and len(values) <= CHUNK_SIZE:
+        # compute(*args) with a short argument list: a single chunk, reduced directly
+        if not values:
+            return 0
+        ints = _int_chunk(values)
+        if ints is not None:
+            return sum(ints)
+        floats = _float_chunk(values)
+        return math.fsum(floats) if accurate else sum(floats)
+
+    int_total = [0]
+    saw_float = [False]
+
+    def float_chunks():
+        # Integer chunks are summed exactly on the side; float chunks are passed on
+        for chunk in chunks(values):
+            ints = _int_chunk(chunk)
+            if ints is not None:
+                int_total[0] += sum(ints)
+                continue
+            saw_float[0] = True
+            yield _float_chunk(chunk)
+
+    if accurate:
+        # One fsum over the whole stream: its partials stay small, and the result is rounded once
+        total = math.fsum(chain.from_iterable(float_chunks()))
+        if not saw_float[0]:
+            return int_total[0]
+        return math.fsum((total, _to_float(int_total[0]))) if int_total[0] else total
+    total = 0.0
+    for floats in float_chunks():
+        total = sum(floats, total)
+    if not saw_float[0]:
+        return int_total[0]
+    return total + _to_float(int_total[0]) if int_total[0] else total
+
+
+def reduce_add(values: Iterable, accurate: bool = False):
+    '''Sum of the operands; accurate=True rounds once instead of at every step.'''
+    return normalize(_sum(values, accurate))
+
+
+def reduce_subtract(values: Iterable, accurate: bool = False):
+    '''First operand minus the sum of the rest.'''
+    if type(values) is tuple and len(values) <= CHUNK_SIZE:
+        first, rest = values[:1], values[1:]
+    else:
+        rest = iter(values)
+        first = tuple(islice(rest, 1))
+    if not first:
+        raise ValueError("Subtraction requires at least one number.")
+    first = parse_number(first[0])
+    rest = _sum(rest, accurate)
+    if isinstance(first, int) and isinstance(rest, int):
+        return first - rest
+    # One side is a float: an exact int beyond float range counts as an infinity, not an OverflowError
+    return normalize(_to_float(first) - _to_float(rest))
+
+
+def reduce_multiply(values: Iterable):
+    '''Product of the operands: an exact int if every operand is an integer, else a float.
+
+    The exact products of successive integer chunks are combined as a
+    balanced tree (BalancedReduction), not folded into one ever larger
+    running product.'''
+    product = 1
+    covered = 0  # operands in product while it is exact
+    exact = None  # BalancedReduction of the integer chunks' products, from the second one on
+    for chunk in chunks(values):
+        ints = _int_chunk(chunk) if isinstance(product, int) else None
+        if ints is not None:
+            partial = tree_product(ints) if wide_ints(ints) else math.prod(ints)
+            if not covered:
+                product, covered = partial, len(ints)
+                continue
+            if exact is None:
+                exact = BalancedReduction(operator.mul)
+                exact.push(product, covered)
+            exact.push(partial, len(ints))
+            continue
+        if exact is not None:
+            product, exact = exact.result(), None
+        start = product if isinstance(product, float) else _to_float(product)
+        product = math.prod(_float_chunk(chunk), start=start)
+    if exact is not None:
+        product = exact.result()
+    return normalize(product)
+
+
+def _short_divide(values: tuple):
+    '''reduce_divide of a short tuple, or None when it needs the general path.'''
+    if len(values) < 2:
+        return None
+    floats = _float_chunk(values)
+    if all(map(float.is_integer, floats)):
+        ints = _int_chunk(values)
+        if ints is None or 0 in ints or ints[0].bit_length() > 1000:
+            return None
+        divisor = math.prod(ints[1:]) if len(ints) > 2 else ints[1]
+        return normalize(ints[0] / divisor) if divisor.bit_length() <= 1000 else None
+    divisor = math.prod(floats[1:]) if len(floats) > 2 else floats[1]
+    if not _NORMAL_MIN <= abs(divisor) < math.inf:
+        return None  # zero, or out of range: the general path reports or scales it
+    return normalize(floats[0] / divisor)
+
+
+def reduce_divide(values: Iterable):
+    '''First operand divided by the product of the rest, with a single division.
+
+    Each chunk of divisors is checked for zero before any of it is used.
+    Integer divisors are multiplied exactly (as a product tree when wide),
+    float ones into a ScaledProduct, so the product cannot overflow or
+    underflow on the way. An all-integer division is rounded once, exactly.'''
+    if type(values) is tuple and len(values) <= CHUNK_SIZE:
+        quotient = _short_divide(values)
+        if quotient is not None:
+            return quotient
+        first, rest = values[:1], values[1:]
+    else:
+        rest = iter(values)
+        first = tuple(islice(rest, 1))
+    if not first:
+        raise ValueError("Division requires at least two numbers.")
+    first = parse_number(first[0])
+    int_product = 1
+    scaled = None
+    divisors = 0
+    for chunk in chunks(rest):
+        ints = _int_chunk(chunk)
+        if ints is not None:
+            if 0 in ints:
+                raise ValueError(DIVISION_BY_ZERO)
+            int_product *= tree_product(ints) if wide_ints(ints) else math.prod(ints)
+        else:
+            floats = _float_chunk(chunk)
+            if 0.0 in floats:
+                raise ValueError(DIVISION_BY_ZERO)
+            if scaled is None:
+                scaled = ScaledProduct()
+            scaled.multiply(floats)
+        divisors += len(chunk)
+    if not divisors:
+        raise ValueError("Division requires at least two numbers.")
+    if scaled is None and type(first) is int:
+        try:
+            return normalize(first / int_product)  # int true division is correctly rounded
+        except OverflowError:
+            return math.inf if (first > 0) == (int_product > 0) else -math.inf
+    if scaled is None:
+        scaled = ScaledProduct()
+    if int_product != 1:
+        scaled.multiply_int(int_product)
+    return normalize(scaled.divide(first))
+
+
+def read_tokens(source: TextIO, block_size: int = 1 << 16) -> Iterator[str]:
+    '''Yield whitespace-separated tokens from a text stream, reading block_size characters at a time.'''
+    carry = ""
+    while True:
+        block = source.read(block_size)
+        if not block:
+            break
+        tokens = (carry + block).split()
+        # The last token may continue in the next block unless the block ended on whitespace
+        carry = "" if block[-1].isspace() or not tokens else tokens.pop()
+        yield from tokens
+    if carry:
+        yield carry
+
+
+REDUCERS = {
+    "add": reduce_add,
+    "subtract": reduce_subtract,
+    "multiply": reduce_multiply,
+    "divide": reduce_divide,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reduce a stream of numbers with one command, in constant memory")
+    parser.add_argument("command", choices=sorted(REDUCERS))
+    parser.add_argument("source", nargs="?", default="-", help="file of whitespace-separated numbers ('-' for stdin)")
+    parser.add_argument("--accurate", action="store_true", help="use compensated summation for add/subtract")
+    args = parser.parse_args(argv)
+
+    reducer = REDUCERS[args.command]
+    options = {"accurate": True} if args.accurate and args.command in ("add", "subtract") else {}
+    source = sys.stdin if args.source == "-" else open(args.source, encoding="utf-8")
+    try:
+        print(reducer(read_tokens(source), **options))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
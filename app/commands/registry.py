@@ -0,0 +1,91 @@
+'''
+Command names: a prefix trie and immutable snapshots of a CommandHandler's registry.
+
+CommandHandler.registry() returns a Registry built from the handler's
+commands, lazy commands and aliases at one CommandHandler.version, and
+returns that same object until the version changes. A Registry is never
+mutated, so any number of threads can share it, and listing the commands
+(the REPL's menu, the Menu plugin) copies nothing.
+
+Registry.resolve turns what the user typed into a command name, trying in
+turn:
+
+1. the name itself, one set lookup;
+2. an alias, "+" for "add";
+3. an abbreviation, "mul" for "multiply": a prefix of the names and aliases
+   of exactly one command. A prefix of several commands is ambiguous and
+   raises KeyError naming them.
+
+Registry.complete lists the names and aliases starting with a prefix, for
+tab completion.
+'''
+from typing import Dict, Iterable, Optional, Tuple
+
+# Key of the words below a trie node; every other key is a single character
+_WORDS = ""
+
+
+class PrefixTrie:
+    '''Words by prefix. Every node keeps the sorted words below it, so a lookup walks len(prefix) nodes.'''
+
+    __slots__ = ("_root",)
+
+    def __init__(self, words: Iterable[str] = ()):
+        root = {_WORDS: []}
+        for word in sorted(set(words)):
+            node = root
+            node[_WORDS].append(word)
+            for character in word:
+                node = node.setdefault(character, {_WORDS: []})
+                node[_WORDS].append(word)
+        self._root = root
+
+    def complete(self, prefix: str) -> Tuple[str, ...]:
+        '''The words starting with prefix, sorted.'''
+        node = self._root
+        for character in prefix:
+            node = node.get(character)
+            if node is None:
+                return ()
+        return tuple(node[_WORDS])
+
+
+class Registry:
+    '''The command names and aliases of a CommandHandler at one version.'''
+
+    __slots__ = ("version", "names", "aliases", "_names", "_trie")
+
+    def __init__(self, version: int, names: Iterable[str], aliases: Dict[str, str]):
+        self.version = version
+        self.names = tuple(sorted(names))
+        self.aliases = aliases  # CommandHandler replaces its aliases, never mutates them
+        self._names = frozenset(self.names)
+        self._trie = PrefixTrie([*self.names, *aliases])
+
+    def __contains__(self, command_name: str) -> bool:
+        return command_name in self._names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, text: str) -> Optional[str]:
+        '''The command name text stands for, or None if there is none.
+
+        Raises KeyError for an abbreviation of several commands.'''
+        if text in self._names:
+            return text
+        command_name = self.aliases.get(text)
+        if command_name is not None or not text:
+            return command_name
+        aliases = self.aliases
+        matches = {aliases.get(word, word) for word in self._trie.complete(text)}
+        if len(matches) > 1:
+            raise KeyError(f"{text}: Ambiguous command, could be {', '.join(sorted(matches))}")
+        return matches.pop() if matches else None
+
+    def complete(self, prefix: str) -> Tuple[str, ...]:
+        '''The names and aliases starting with prefix, sorted.'''
+        return self._trie.complete(prefix)
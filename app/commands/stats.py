@@ -0,0 +1,54 @@
+import json
+from app.commands import Command
+from app.metrics import format_table, write_prometheus
+
+class StatsCommand(Command):
+    '''Command that reports the per-command metrics of its handler.
+
+    "stats" returns the metrics snapshot; "stats FILE" writes it to FILE
+    in the Prometheus text format instead.'''
+    def __init__(self, command_handler):
+        self.command_handler = command_handler
+
+    def compute(self, *args):
+        '''One line, so batch output stays aligned: a JSON snapshot, or where the dump went.'''
+        if len(args) > 1:
+            raise ValueError("Usage: stats [FILE]")
+        if args and not isinstance(args[0], str):
+            # e.g. "add 1 2 | stats", where a pipeline passes the previous result
+            raise ValueError(f"Usage: stats [FILE], where FILE is a path, not {args[0]!r}")
+        if self.command_handler.recorder is None:
+            raise ValueError("Metrics are disabled.")
+        snapshot = self.command_handler.metrics()
+        if args:
+            try:
+                write_prometheus(args[0], snapshot)
+            except OSError as e:
+                raise ValueError(f"Could not write metrics: {e}") from None
+            return f"Metrics written to {args[0]}"
+        return json.dumps(snapshot, sort_keys=True)
+
+    def execute(self, *args):
+        try:
+            if args:
+                return self.compute(*args)
+            self.compute()  # same checks as batch mode
+            return format_table(self.command_handler.metrics())
+        except ValueError as e:
+            print(f"Error: {e}")
+            return None
+
+class UnavailableStatsCommand(Command):
+    '''Stands in for stats where a handler only sees part of the commands.
+
+    A --workers process only evaluates its own chunks, so its metrics would
+    be a misleading fraction of the run's.'''
+    def __init__(self, reason):
+        self.reason = reason
+
+    def compute(self, *args):
+        raise ValueError(self.reason)
+
+    def execute(self, *args):
+        print(f"Error: {self.reason}")
+        return None
@@ -1,15 +1,35 @@
 from app.commands import Command
+from app.commands.batch import compute_rows, subtract_kernel, kernel_applies
+from app.commands.reduce import reduce_subtract
 
 class SubtractCommand(Command):
     '''Command to perform subtraction.'''
+    def __init__(self, accurate=False):
+        # accurate=True sums with math.fsum instead of naive float addition
+        self.accurate = accurate
+        # app.numeric backend set by CommandHandler.use_backend; None keeps the built-in int/float path
+        self.backend = None
+
+    def compute(self, *args):
+        '''Subtracts the remaining arguments from the first, raising ValueError on bad input.'''
+        return self.reduce(args)
+
+    def reduce(self, values):
+        '''Streaming form of compute: values may be any iterable of tokens or numbers.'''
+        if self.backend is None:
+            return reduce_subtract(values, self.accurate)
+        return self.backend.subtract(values)
+
     def execute(self, *args):
         try:
-            numbers = list(map(float, args))
-            result = numbers[0] - sum(numbers[1:])  # Subtract all subsequent numbers from the first
-            return int(result) if result.is_integer() else result
-        except ValueError:
-            print("Error: Invalid input. Please enter numbers.")
-            return None
-        except IndexError:
-            print("Error: Subtraction requires at least one number.")
+            return self.compute(*args)
+        except ValueError as e:
+            print(f"Error: {e}")
             return None
+
+    def execute_batch(self, *columns):
+        '''Vectorized subtract over operand columns where the float kernel applies, else row by row;
+        errors are reported in the mask.'''
+        if kernel_applies(self, columns):
+            return subtract_kernel(*columns)
+        return compute_rows(self.compute, columns)
@@ -0,0 +1,108 @@
+'''
+Central, non-blocking logging setup.
+
+configure_logging() loads logging.conf once, then moves every handler it
+configured on the root logger behind a QueueHandler: log calls only put the
+record on an in-memory queue and a QueueListener thread does the formatting
+and file/console I/O. Calling it again is a no-op.
+
+Per-operation messages (one per executed command) go to the
+"app.commands.operations" logger. set_operation_sampling(n) makes
+sample_operation() true for only every n-th operation; callers check it
+before logging, so skipped operations never even build a LogRecord.
+
+logging.config, logging.handlers and queue are not imported until logging
+is actually configured: the command modules import this one for
+sample_operation, and they should stay cheap to import.
+'''
+import atexit
+import itertools
+import logging
+import os
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logging.conf")
+OPERATIONS_LOGGER = "app.commands.operations"
+
+_listener = None  # QueueListener started by configure_logging
+_sample_every = 1
+_operation_counter = itertools.count()
+
+
+def configure_logging(config_path: str = DEFAULT_CONFIG):
+    '''Load the logging configuration once and start the background listener.'''
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    root = logging.getLogger()
+    if os.path.exists(config_path):
+        # The file handler in logging.conf writes to logs/, relative to the working directory
+        os.makedirs("logs", exist_ok=True)
+        from logging import config as logging_config
+        logging_config.fileConfig(config_path, disable_existing_loggers=False)
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+
+    _listener = install_queue_logging()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def install_queue_logging(handlers=None):
+    '''Move the root logger's handlers (or the given ones) behind a queue and start the listener.'''
+    from logging.handlers import QueueHandler, QueueListener
+    import queue
+
+    class ThreadQueueHandler(QueueHandler):
+        '''QueueHandler for an in-process listener thread.
+
+        The stock prepare() formats the message on the calling thread so the
+        record can be pickled; the listener here shares our memory, so the
+        record is queued as is and all formatting happens on the listener.'''
+
+        def prepare(self, record):
+            return record
+
+    root = logging.getLogger()
+    if handlers is None:
+        handlers = root.handlers[:]
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    records = queue.SimpleQueue()
+    root.addHandler(ThreadQueueHandler(records))
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def shutdown_logging():
+    '''Flush queued records, stop the listener and restore the real handlers.'''
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    from logging.handlers import QueueHandler
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+
+
+def set_operation_sampling(every: int | None):
+    '''Log only every n-th operation; None or 1 logs them all.'''
+    global _sample_every, _operation_counter
+    if every is not None and every <= 0:
+        raise ValueError("Sampling interval must be positive")
+    _sample_every = every or 1
+    _operation_counter = itertools.count()
+
+
+def sample_operation() -> bool:
+    '''True if the current operation should be logged under the sampling setting.'''
+    return _sample_every == 1 or next(_operation_counter) % _sample_every == 0
@@ -0,0 +1,185 @@
+'''
+Per-command counters and latency histograms.
+
+CommandMetrics keeps, for one command, the number of calls and errors, the
+total time spent, and a log-linear ("HDR-style") latency histogram: values
+are bucketed by their top SIGNIFICANT_BITS bits, so every bucket is within
+about 3% of the values in it whatever the magnitude, recording is a couple
+of integer operations and a list increment, and memory is a fixed-size list
+per command. Percentiles (p50/p99/p999) are read from the histogram and
+reported as the upper edge of their bucket, like HdrHistogram does.
+
+MetricsRecorder holds the metrics of every command of a CommandHandler. It
+is only created when metrics are enabled (CommandHandler.enable_metrics);
+with it disabled the handler pays a single "is None" check per call.
+Recorders merge, so the metrics of worker processes (see app.parallel) add
+up in the parent's recorder.
+'''
+import os
+from typing import Dict, List
+
+SIGNIFICANT_BITS = 6
+_SUB_BUCKETS = 1 << SIGNIFICANT_BITS
+_BUCKETS = 64 * _SUB_BUCKETS
+PERCENTILES = (50.0, 99.0, 99.9)
+
+
+def bucket_index(value: int) -> int:
+    '''Histogram bucket for a non-negative integer value.'''
+    shift = value.bit_length() - SIGNIFICANT_BITS
+    if shift <= 0:
+        return value
+    return (shift << SIGNIFICANT_BITS) + (value >> shift)
+
+
+def bucket_upper(index: int) -> int:
+    '''Largest value that falls into the given bucket.'''
+    shift, mantissa = divmod(index, _SUB_BUCKETS)
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    '''Log-linear histogram of integer latencies (nanoseconds).'''
+
+    __slots__ = ("counts", "count", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * _BUCKETS
+        self.count = 0
+        self.max = 0
+
+    def record(self, value: int):
+        shift = value.bit_length() - SIGNIFICANT_BITS  # bucket_index, inlined for the hot path
+        self.counts[(shift << SIGNIFICANT_BITS) + (value >> shift) if shift > 0 else value] += 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        '''Add another histogram's values to this one.'''
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> int:
+        '''Value at or below which percent of the recorded values fall (0 if empty).'''
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * percent // 100))  # ceil without floats drifting
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= target:
+                return min(bucket_upper(index), self.max)
+        return self.max
+
+
+class CommandMetrics:
+    '''Counters and latency histogram for one command.'''
+
+    __slots__ = ("calls", "errors", "total_ns", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.histogram = LatencyHistogram()
+
+    def record(self, elapsed_ns: int, error: bool):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.total_ns += elapsed_ns
+        self.histogram.record(elapsed_ns)
+
+    def merge(self, other: "CommandMetrics"):
+        '''Add another command's counters and latencies to these.'''
+        self.calls += other.calls
+        self.errors += other.errors
+        self.total_ns += other.total_ns
+        self.histogram.merge(other.histogram)
+
+    def snapshot(self) -> dict:
+        '''Plain-data copy of the counters; times are in seconds.'''
+        snapshot = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": self.total_ns / 1e9,
+            "mean_seconds": self.total_ns / self.calls / 1e9 if self.calls else 0.0,
+            "max_seconds": self.histogram.max / 1e9,
+        }
+        for percent in PERCENTILES:
+            snapshot[f"p{percent:g}".replace(".", "")] = self.histogram.percentile(percent) / 1e9
+        return snapshot
+
+
+class MetricsRecorder:
+    '''Metrics for every command executed through one CommandHandler.'''
+
+    def __init__(self):
+        self.commands: Dict[str, CommandMetrics] = {}
+
+    def record(self, command_name: str, elapsed_ns: int, error: bool):
+        try:
+            metrics = self.commands[command_name]
+        except KeyError:
+            # setdefault: two threads recording a new command's first call keep one CommandMetrics
+            metrics = self.commands.setdefault(command_name, CommandMetrics())
+        metrics.record(elapsed_ns, error)
+
+    def snapshot(self) -> Dict[str, dict]:
+        '''Command name -> counters and percentiles (see CommandMetrics.snapshot).'''
+        return {name: metrics.snapshot() for name, metrics in sorted(self.commands.items())}
+
+    def merge(self, commands: Dict[str, CommandMetrics]):
+        '''Add the metrics of another recorder's commands, e.g. a worker process's, to this one.'''
+        for command_name, metrics in commands.items():
+            self.commands.setdefault(command_name, CommandMetrics()).merge(metrics)
+
+    def take(self) -> Dict[str, CommandMetrics]:
+        '''The metrics recorded so far, starting over from none.'''
+        commands, self.commands = self.commands, {}
+        return commands
+
+    def reset(self):
+        self.commands.clear()
+
+
+def format_table(snapshot: Dict[str, dict]) -> str:
+    '''Human-readable table of a metrics snapshot.'''
+    if not snapshot:
+        return "No commands executed yet"
+    lines = [f"{'command':12} {'calls':>9} {'errors':>7} {'total':>10} {'p50':>10} {'p99':>10} {'p999':>10}"]
+    for name, stats in snapshot.items():
+        lines.append(
+            f"{name:12} {stats['calls']:9d} {stats['errors']:7d} {stats['total_seconds'] * 1e3:8.2f}ms "
+            f"{stats['p50'] * 1e6:8.1f}us {stats['p99'] * 1e6:8.1f}us {stats['p999'] * 1e6:8.1f}us"
+        )
+    return "\n".join(lines)
+
+
+def prometheus_text(snapshot: Dict[str, dict], prefix: str = "calculator_command") -> str:
+    '''Prometheus text exposition format of a metrics snapshot.'''
+    lines = [
+        f"# HELP {prefix}_calls_total Commands executed.",
+        f"# TYPE {prefix}_calls_total counter",
+    ]
+    lines += [f'{prefix}_calls_total{{command="{name}"}} {stats["calls"]}' for name, stats in snapshot.items()]
+    lines += [f"# HELP {prefix}_errors_total Commands that failed.", f"# TYPE {prefix}_errors_total counter"]
+    lines += [f'{prefix}_errors_total{{command="{name}"}} {stats["errors"]}' for name, stats in snapshot.items()]
+    lines += [f"# HELP {prefix}_latency_seconds Command latency.", f"# TYPE {prefix}_latency_seconds summary"]
+    for name, stats in snapshot.items():
+        for percent in PERCENTILES:
+            key = f"p{percent:g}".replace(".", "")
+            lines.append(f'{prefix}_latency_seconds{{command="{name}",quantile="{percent / 100:g}"}} {stats[key]:.9f}')
+        lines.append(f'{prefix}_latency_seconds_sum{{command="{name}"}} {stats["total_seconds"]:.9f}')
+        lines.append(f'{prefix}_latency_seconds_count{{command="{name}"}} {stats["calls"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, snapshot: Dict[str, dict]):
+    '''Atomically write the Prometheus text of a snapshot, e.g. for node_exporter's textfile collector.'''
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(prometheus_text(snapshot))
+    os.replace(temporary, path)
@@ -0,0 +1,344 @@
+'''
+Numeric backends: how operands are parsed and combined.
+
+app.commands has always computed in binary float and app.calculator in
+Decimal. A backend makes that choice explicit and selectable, per
+CommandHandler (CommandHandler.use_backend) and for the Calculator
+(Calculator.use_backend):
+
+* "float"    -- plain binary floats; the fastest, but 0.1 + 0.2 != 0.3
+* "decimal"  -- decimal.Decimal under a configurable context (precision,
+                rounding); results are rounded to the context once per step,
+                and a whole divide chain once
+* "fraction" -- fractions.Fraction, exact for +, -, * and /; tokens such as
+                "0.1", "1e-3" and "3/4" are all read exactly
+* "auto"     -- Python int while every operand is integral (exact and fast),
+                float otherwise; the default of the arithmetic commands
+
+Backends reduce any iterable of operands (tokens or numbers) chunk by chunk
+(see app.commands.reduce), so all of them run in constant memory. Invalid
+operands raise ValueError with the commands' user-facing message.
+
+Exact backends multiply wide operands (many digits between them) as a
+product tree instead of folding left to right, and the fraction backend
+adds non-integral operands pairwise, so denominators grow evenly; the
+chunks' partial results are combined the same way (see
+app.commands.reduce.balanced_reduce). Every backend divides once, by the
+product of the divisors, after checking each chunk of them for zero.
+'''
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from decimal import MAX_EMAX, MAX_PREC, MIN_EMIN, Context, Decimal, InvalidOperation, getcontext, localcontext
+from fractions import Fraction
+import math
+import operator
+from typing import Iterable, List, Optional, Sequence, Union
+
+from app.commands.reduce import (DIVISION_BY_ZERO, INVALID_INPUT, TREE_MIN_BITS, BalancedReduction, ScaledProduct,
+                                 chunks, normalize, pairwise_sum, reduce_add, reduce_divide, reduce_multiply,
+                                 reduce_subtract, tree_product, wide_ints)
+
+_BITS_PER_DIGIT = math.log2(10)
+# Extra digits a Decimal divisor product carries beyond the context's precision
+GUARD_DIGITS = 20
+
+
+def _int_product(numbers: List[int]) -> int:
+    return tree_product(numbers) if wide_ints(numbers) else math.prod(numbers)
+
+
+class NumericBackend(ABC):
+    '''Parses operands and reduces them; subclasses choose the number type.'''
+    name = ""
+
+    def coerce(self, value):
+        '''One operand as this backend's number type.'''
+        return self.convert((value,))[0]
+
+    @abstractmethod
+    def convert(self, chunk: Sequence) -> List:
+        '''A chunk of operands as this backend's number type.'''
+
+    def context(self):
+        '''Context manager to run this backend's arithmetic in.'''
+        return nullcontext()
+
+    def finish(self, result):
+        '''Final form of a reduction's result.'''
+        return result
+
+    def wide(self, numbers: List) -> bool:
+        '''True when a chunk is exact and big enough for a product tree to pay off.'''
+        return False
+
+    def pairwise(self, numbers: List) -> bool:
+        '''True when a chunk is better summed pairwise than left to right.'''
+        return False
+
+    def _sum(self, values: Iterable):
+        total = self.zero()
+        tree = BalancedReduction(operator.add)
+        for chunk in chunks(values):
+            numbers = self.convert(chunk)
+            if self.pairwise(numbers):
+                tree.push(pairwise_sum(numbers), len(numbers))
+            else:
+                total = sum(numbers, total)
+        return total + tree.result() if tree else total
+
+    def add(self, values: Iterable):
+        with self.context():
+            return self.finish(self._sum(values))
+
+    def subtract(self, values: Iterable):
+        iterator = iter(values)
+        first = next(iterator, None)
+        if first is None:
+            raise ValueError("Subtraction requires at least one number.")
+        first = self.coerce(first)
+        with self.context():
+            return self.finish(first - self._sum(iterator))
+
+    def multiply(self, values: Iterable):
+        product = self.one()
+        tree = BalancedReduction(operator.mul)
+        with self.context():
+            for chunk in chunks(values):
+                numbers = self.convert(chunk)
+                if self.wide(numbers):
+                    tree.push(tree_product(numbers), len(numbers))
+                else:
+                    product = math.prod(numbers, start=product)
+            return self.finish(product * tree.result() if tree else product)
+
+    def divide(self, values: Iterable):
+        '''First operand divided by the product of the rest, with a single division.'''
+        iterator = iter(values)
+        first = next(iterator, None)
+        if first is None:
+            raise ValueError("Division requires at least two numbers.")
+        first = self.coerce(first)
+        divisor, divisors = self.divisor_product(iterator)
+        if not divisors:
+            raise ValueError("Division requires at least two numbers.")
+        with self.context():
+            return self.finish(self.quotient(first, divisor))
+
+    def divisor_product(self, values: Iterable) -> tuple:
+        '''(product, count) of the divisors; each chunk is checked for zero before it is multiplied in.'''
+        product = self.one()
+        tree = BalancedReduction(operator.mul)
+        divisors = 0
+        with self.product_context():
+            for chunk in chunks(values):
+                numbers = self.convert(chunk)
+                if 0 in numbers:
+                    raise ValueError(DIVISION_BY_ZERO)
+                divisors += len(numbers)
+                if self.wide(numbers):
+                    tree.push(tree_product(numbers), len(numbers))
+                else:
+                    product = math.prod(numbers, start=product)
+            return (product * tree.result() if tree else product), divisors
+
+    def product_context(self):
+        '''Context to multiply divisors in; the backend's own by default.'''
+        return self.context()
+
+    def quotient(self, first, divisor):
+        return first / divisor
+
+    def zero(self):
+        return 0
+
+    def one(self):
+        return 1
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class FloatBackend(NumericBackend):
+    '''Binary floating point; whole results come back as int, like the commands always did.'''
+    name = "float"
+
+    def convert(self, chunk: Sequence) -> List[float]:
+        try:
+            return list(map(float, chunk))
+        except (TypeError, ValueError):
+            raise ValueError(INVALID_INPUT) from None
+
+    def finish(self, result):
+        return normalize(result)
+
+    def divisor_product(self, values: Iterable) -> tuple:
+        # Scaled, so a long chain of divisors cannot overflow or underflow before the division
+        product = ScaledProduct()
+        divisors = 0
+        for chunk in chunks(values):
+            numbers = self.convert(chunk)
+            if 0.0 in numbers:
+                raise ValueError(DIVISION_BY_ZERO)
+            divisors += len(numbers)
+            product.multiply(numbers)
+        return product, divisors
+
+    def quotient(self, first, divisor):
+        return divisor.divide(first)
+
+    def zero(self):
+        return 0.0
+
+    def one(self):
+        return 1.0
+
+
+class AutoBackend(NumericBackend):
+    '''Exact int while operands are integral, float otherwise (see app.commands.reduce).'''
+    name = "auto"
+
+    def __init__(self, accurate: bool = False):
+        # accurate=True sums floats with math.fsum instead of naive addition
+        self.accurate = accurate
+
+    def convert(self, chunk: Sequence) -> List:
+        numbers = []
+        for value in chunk:
+            if type(value) is int:
+                numbers.append(value)
+            elif type(value) is str and (value.isdigit() or value[:1] in ("-", "+") and value[1:].isdigit()):
+                numbers.append(int(value))
+            else:
+                try:
+                    numbers.append(float(value))
+                except (TypeError, ValueError):
+                    raise ValueError(INVALID_INPUT) from None
+        return numbers
+
+    def add(self, values: Iterable):
+        return reduce_add(values, self.accurate)
+
+    def subtract(self, values: Iterable):
+        return reduce_subtract(values, self.accurate)
+
+    def multiply(self, values: Iterable):
+        return reduce_multiply(values)
+
+    def divide(self, values: Iterable):
+        return reduce_divide(values)
+
+    def __repr__(self):
+        return f"AutoBackend(accurate={self.accurate})"
+
+
+class DecimalBackend(NumericBackend):
+    '''decimal.Decimal, computed under the given context (default: the thread's current one).'''
+    name = "decimal"
+
+    def __init__(self, context: Optional[Context] = None):
+        self.decimal_context = context
+
+    def convert(self, chunk: Sequence) -> List[Decimal]:
+        try:
+            # Floats go through str() so 0.1 becomes Decimal('0.1'), not its binary expansion
+            return [Decimal(value if type(value) is not float else repr(value)) for value in chunk]
+        except (TypeError, ValueError, InvalidOperation):
+            raise ValueError(INVALID_INPUT) from None
+
+    def context(self):
+        return localcontext(self.decimal_context) if self.decimal_context is not None else nullcontext()
+
+    def product_context(self):
+        # Guard digits and an unbounded exponent range: the divisors' product is far more precise
+        # than the context, so the quotient is in effect rounded once, by the final division
+        precision = (self.decimal_context or getcontext()).prec
+        return localcontext(Context(prec=min(precision + GUARD_DIGITS, MAX_PREC), Emax=MAX_EMAX, Emin=MIN_EMIN))
+
+    def finish(self, result):
+        return +result  # unary plus rounds a lone operand to the context too
+
+    def wide(self, numbers: List[Decimal]) -> bool:
+        # Under a narrow context every step is rounded to prec digits, so the product cannot grow
+        if len(numbers) <= 2 or getcontext().prec * _BITS_PER_DIGIT <= TREE_MIN_BITS:
+            return False
+        return sum(max(number.adjusted(), 0) + 1 for number in numbers) * _BITS_PER_DIGIT > TREE_MIN_BITS
+
+    def zero(self):
+        return Decimal(0)
+
+    def one(self):
+        return Decimal(1)
+
+    def __repr__(self):
+        return f"DecimalBackend({self.decimal_context!r})"
+
+
+class FractionBackend(NumericBackend):
+    '''fractions.Fraction: exact rational arithmetic; whole results come back as int.'''
+    name = "fraction"
+
+    def convert(self, chunk: Sequence) -> List[Fraction]:
+        try:
+            return list(map(Fraction, chunk))
+        except (TypeError, ValueError, ZeroDivisionError):
+            raise ValueError(INVALID_INPUT) from None
+
+    def finish(self, result):
+        return result.numerator if result.denominator == 1 else result
+
+    def wide(self, numbers: List[Fraction]) -> bool:
+        return wide_ints([number.numerator for number in numbers] + [number.denominator for number in numbers])
+
+    def pairwise(self, numbers: List[Fraction]) -> bool:
+        # Left to right, every addition multiplies a growing denominator by the next one
+        return len(numbers) > 2 and any(number.denominator != 1 for number in numbers)
+
+    def divisor_product(self, values: Iterable) -> tuple:
+        # Numerators and denominators are multiplied as plain ints. Fraction arithmetic would take
+        # gcds against the whole running product at every operand; here each chunk is reduced on
+        # its own, and the quotient takes the only gcd of the full numbers
+        numerators = BalancedReduction(operator.mul)
+        denominators = BalancedReduction(operator.mul)
+        divisors = 0
+        for chunk in chunks(values):
+            numbers = self.convert(chunk)
+            if 0 in numbers:
+                raise ValueError(DIVISION_BY_ZERO)
+            divisors += len(numbers)
+            numerator = _int_product([number.numerator for number in numbers])
+            denominator = _int_product([number.denominator for number in numbers])
+            common = math.gcd(numerator, denominator)
+            numerators.push(numerator // common, len(numbers))
+            denominators.push(denominator // common, len(numbers))
+        if not divisors:
+            return None, 0
+        return (numerators.result(), denominators.result()), divisors
+
+    def quotient(self, first, divisor):
+        numerator, denominator = divisor
+        return Fraction(first.numerator * denominator, first.denominator * numerator)
+
+
+BACKENDS = {
+    "float": FloatBackend,
+    "decimal": DecimalBackend,
+    "fraction": FractionBackend,
+    "auto": AutoBackend,
+}
+
+BackendSpec = Union[str, NumericBackend]
+
+
+def get_backend(spec: BackendSpec, precision: Optional[int] = None) -> NumericBackend:
+    '''A backend instance from a name in BACKENDS or an instance.
+
+    precision sets the significant digits of a "decimal" backend.'''
+    if isinstance(spec, NumericBackend):
+        return spec
+    if spec not in BACKENDS:
+        raise ValueError(f"Unknown numeric backend {spec!r}; choose from {', '.join(BACKENDS)}")
+    if precision is not None:
+        if spec != "decimal":
+            raise ValueError("A precision only applies to the decimal backend.")
+        return DecimalBackend(Context(prec=precision))
+    return BACKENDS[spec]()
@@ -0,0 +1,100 @@
+'''
+Process-pool parallel evaluation of command invocations.
+
+ParallelExecutor shards a (possibly endless) stream of (command_name, args)
+invocations into chunks and evaluates them on a ProcessPoolExecutor:
+
+* Each worker builds its CommandHandler once, in the pool initializer,
+  rather than once per task.
+* Chunks are submitted through a bounded window, so the input stream is
+  consumed lazily, and results are yielded in input order.
+* Calculations recorded in a worker's history while evaluating a chunk are
+  shipped back with the chunk's results and merged into the parent's
+  Calculations history, also in input order.
+* So are the per-command metrics of workers whose handler records them:
+  they are merged into the recorder given to ParallelExecutor, so the
+  parent's metrics cover every command evaluated.
+'''
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import os
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from app.batch_mode import evaluate_one
+from app.calculator.calculations import Calculations
+
+# CommandHandler of the current worker process, set by _init_worker
+_worker_handler = None
+
+
+def default_handler():
+    '''Return the application's shared handler with the standard commands registered.'''
+    from app import command_handler
+    return command_handler
+
+
+def _init_worker(handler_factory: Callable):
+    '''Pool initializer: build the worker's handler once and start from empty history.'''
+    global _worker_handler
+    _worker_handler = handler_factory()
+    Calculations.clear_history()
+
+
+def _run_chunk(chunk) -> Tuple[list, list, Optional[dict]]:
+    '''Evaluate one chunk in a worker; returns its results, the history it produced and its metrics.'''
+    results = [evaluate_one(_worker_handler, command_name, args) for command_name, args in chunk]
+    history = list(Calculations.get_history())
+    Calculations.clear_history()
+    recorder = _worker_handler.recorder
+    return results, history, recorder.take() if recorder is not None else None
+
+
+class ParallelExecutor:
+    '''Evaluates command invocations on a pool of worker processes.'''
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 1024,
+                 handler_factory: Callable = default_handler, merge_history: bool = True,
+                 mp_context=None, recorder=None):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.merge_history = merge_history
+        self.recorder = recorder  # MetricsRecorder that worker metrics are merged into, if any
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=mp_context,
+            initializer=_init_worker, initargs=(handler_factory,),
+        )
+
+    def map(self, invocations: Iterable[Tuple[str, Iterable]]) -> Iterator[Tuple[object, Optional[str]]]:
+        '''Yield (result, error_message) for each (command_name, args), in input order.'''
+        invocations = iter(invocations)
+        in_flight = deque()
+        # Keep every worker busy with one chunk queued behind it, but no more
+        window = self.max_workers * 2
+        while True:
+            while len(in_flight) < window:
+                chunk = [(command_name, tuple(args)) for command_name, args in islice(invocations, self.chunk_size)]
+                if not chunk:
+                    break
+                in_flight.append(self._pool.submit(_run_chunk, chunk))
+            if not in_flight:
+                return
+            results, history, metrics = in_flight.popleft().result()
+            if self.merge_history:
+                for calculation in history:
+                    Calculations.add_calculation(calculation)
+            if metrics and self.recorder is not None:
+                self.recorder.merge(metrics)
+            yield from results
+
+    def close(self):
+        '''Shut down the worker processes.'''
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,148 @@
+'''
+Command pipelines: "add 1 2 | multiply 3 | divide 4".
+
+Each stage's result is passed on as the first operand of the next stage, as
+the number it is (int, float, Decimal, Fraction): nothing is formatted or
+parsed between stages. A pipeline is compiled once, into its stages'
+compute methods and their operands already parsed the way the command
+would parse them (by its numeric backend, if it has one), so running it
+again is just the chain of compute calls.
+
+PipelineCache keeps compiled pipelines per CommandHandler, keyed by their
+tokens, and drops them all whenever the handler's commands
+(CommandHandler.version) or numeric backend change.
+
+Stage commands are resolved like CommandHandler.evaluate resolves them,
+aliases and abbreviations included. Errors follow it too: KeyError for an
+unknown or ambiguous command, ValueError with a message for the user for
+bad operands or an empty stage.
+'''
+from time import perf_counter_ns
+from typing import Callable, List, Sequence, Tuple
+
+from app.commands.reduce import parse_number
+
+PIPE = "|"
+
+
+def split_pipe(text: str) -> List[str]:
+    '''Tokens of a command line, with "|" a token of its own even without spaces around it.'''
+    return text.replace(PIPE, f" {PIPE} ").split()
+
+
+def split_stages(tokens: Sequence[str]) -> List[Tuple[str, list]]:
+    '''(command_name, args) per stage of a tokenized pipeline.'''
+    stages = []
+    stage: list = []
+    for token in [*tokens, PIPE]:
+        if token != PIPE:
+            stage.append(token)
+            continue
+        if not stage:
+            raise ValueError("Empty pipeline stage.")
+        stages.append((stage[0].lower(), stage[1:]))
+        stage = []
+    return stages
+
+
+def _operands(command, args: list) -> tuple:
+    '''args parsed once, as the command itself would; commands that do not reduce numbers get the tokens.'''
+    if not hasattr(command, "reduce"):
+        return tuple(args)
+    backend = getattr(command, "backend", None)
+    if backend is not None:
+        return tuple(backend.convert(args))
+    return tuple(map(parse_number, args))
+
+
+class Pipeline:
+    '''A compiled pipeline: (command_name, compute, operands) per stage.'''
+
+    __slots__ = ("stages", "_compute", "_operands", "_rest")
+
+    def __init__(self, stages: List[Tuple[str, Callable, tuple]]):
+        self.stages = stages
+        _, self._compute, self._operands = stages[0]
+        self._rest = tuple((compute, operands) for _, compute, operands in stages[1:])
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def __call__(self):
+        value = self._compute(*self._operands)
+        for compute, operands in self._rest:
+            value = compute(value, *operands)
+        return value
+
+    def run_measured(self, recorder):
+        '''__call__, recording every stage in a MetricsRecorder like CommandHandler.evaluate does.'''
+        value = None
+        for position, (command_name, compute, operands) in enumerate(self.stages):
+            started = perf_counter_ns()
+            error = True
+            try:
+                value = compute(*operands) if not position else compute(value, *operands)
+                error = False
+            finally:
+                recorder.record(command_name, perf_counter_ns() - started, error)
+        return value
+
+
+def compile_pipeline(command_handler, tokens: Sequence[str]) -> Pipeline:
+    '''Resolve every stage's command and parse its operands.'''
+    stages = []
+    for command_name, args in split_stages(tokens):
+        # Aliases and abbreviations resolve here, so stages are measured under their commands' names
+        command_name, command = command_handler._lookup(command_name)  # pylint: disable=protected-access
+        if command is None:
+            raise KeyError(f"{command_name}: Command not found")
+        compute = getattr(command, "compute", None) or command.execute
+        stages.append((command_name, compute, _operands(command, args)))
+    return Pipeline(stages)
+
+
+class PipelineCache:
+    '''Compiled pipelines of one CommandHandler, by their tokens.'''
+
+    def __init__(self, command_handler, maxsize: int = 1024):
+        if maxsize <= 0:
+            raise ValueError("Cache size must be positive")
+        self.command_handler = command_handler
+        self.maxsize = maxsize
+        self._pipelines = {}
+        # (CommandHandler.version, backend) the cached pipelines were compiled against
+        self._version = None
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._pipelines)
+
+    def get(self, tokens: Sequence[str]) -> Pipeline:
+        '''The compiled pipeline for tokens, compiling (and caching) it on a miss.'''
+        handler = self.command_handler
+        key = tuple(tokens)
+        if handler.version != self._version or handler.backend is not self._backend:
+            self._pipelines = {}
+        pipeline = self._pipelines.get(key)
+        if pipeline is not None:
+            self.hits += 1
+            return pipeline
+        self.misses += 1
+        pipeline = compile_pipeline(handler, key)
+        pipelines = self._pipelines
+        if len(pipelines) >= self.maxsize:
+            del pipelines[next(iter(pipelines))]  # the oldest entry
+        pipelines[key] = pipeline
+        # Compiling may have loaded lazy commands, which bumps the version: the entries are still valid
+        self._version, self._backend = handler.version, handler.backend
+        return pipeline
+
+    def evaluate(self, tokens: Sequence[str]):
+        '''Run the pipeline for tokens and return its result.'''
+        pipeline = self.get(tokens)
+        recorder = self.command_handler.recorder
+        if recorder is None:
+            return pipeline()
+        return pipeline.run_measured(recorder)
@@ -3,8 +3,8 @@ from decimal import Decimal, InvalidOperation
 from app.calculator import Calculator
 from app.commands import Command
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured once by app.logging_setup
+logger = logging.getLogger(__name__)
 
 class Add(Command):
     def __init__(self, command_handler):
@@ -14,18 +14,18 @@ class Add(Command):
         if not args:  # Prompts for input if arguments are not given
             args = input("Enter two numbers separated by space: ").split()
         if len(args) != 2:  # Ensures exactly two arguments are given
-            logging.warning("Only two arguments must be given")
+            logger.warning("Only two arguments must be given")
             print("Only two arguments must be given")
             return
 
         try:
             x, y = map(Decimal, args)  
             result = Calculator.add(x, y)
-            logging.info(f"Adding {x} and {y}, result: {result}")
+            logger.info("Adding %s and %s, result: %s", x, y, result)
             print(f"{x} + {y} = {result}")
         except InvalidOperation:
-            logging.error("One of the entered numbers is invalid. Please enter valid inputs.")
+            logger.error("One of the entered numbers is invalid. Please enter valid inputs.")
             print("One of the entered numbers is invalid. Please enter valid inputs.")
         except Exception as e:
-            logging.error(f"Error: {e}")
+            logger.error("Error: %s", e)
             print(f"Error: {e}")
@@ -0,0 +1,169 @@
+'''
+Plugin discovery for app/plugins and installed entry points.
+
+A plugin is a Command subclass whose constructor takes the command handler,
+like the classes in this package. Discovery finds them without importing
+them:
+
+* every app/plugins/*.py file is parsed with ast, and each class deriving
+  from Command (directly or through another class in the same file) becomes
+  a command named after the class, lower-cased: Add -> "add";
+* distributions can add plugins through the "homework6.plugins" entry point
+  group, as name = "module:Class".
+
+The result is saved as a JSON manifest in app/plugins/__pycache__, keyed on
+the mtimes of the plugin files and of the site-packages directories entry
+points come from. Later starts read the manifest and only rescan when one
+of those changed. register_plugins() then registers every plugin whose name
+is not a command already, lazily, so a plugin module is imported on first
+use and listing commands (the Menu plugin) imports nothing.
+'''
+import json
+import logging
+import os
+import sys
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_PACKAGE = __name__.rpartition(".")[0]
+ENTRY_POINT_GROUP = "homework6.plugins"
+MANIFEST_VERSION = 1
+_SKIP = {"__init__.py", "discovery.py"}
+
+
+def default_manifest_path(plugin_dir: str = PLUGIN_DIR) -> str:
+    return os.path.join(plugin_dir, "__pycache__", "plugin_manifest.json")
+
+
+def _file_mtimes(plugin_dir: str) -> dict:
+    '''mtime_ns of every candidate plugin file, plus the directory itself (catches added/removed files).'''
+    mtimes = {".": os.stat(plugin_dir).st_mtime_ns}
+    for entry in os.scandir(plugin_dir):
+        if entry.name.endswith(".py") and entry.name not in _SKIP:
+            mtimes[entry.name] = entry.stat().st_mtime_ns
+    return mtimes
+
+
+def _site_mtimes() -> dict:
+    '''mtime_ns of the site-packages directories: installing a distribution changes them.'''
+    mtimes = {}
+    for path in sys.path:
+        if os.path.basename(path) in ("site-packages", "dist-packages") and os.path.isdir(path):
+            mtimes[path] = os.stat(path).st_mtime_ns
+    return mtimes
+
+
+def scan_source(source: str) -> list:
+    '''Names of the Command subclasses defined in one module's source.'''
+    import ast
+    commands = {"Command"}
+    found = []
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        bases = {base.id if isinstance(base, ast.Name) else base.attr
+                 for base in node.bases if isinstance(base, (ast.Name, ast.Attribute))}
+        if bases & commands:
+            commands.add(node.name)
+            found.append(node.name)
+    return found
+
+
+def scan_directory(plugin_dir: str = PLUGIN_DIR, package: str = PLUGIN_PACKAGE) -> dict:
+    '''Command name -> "module:Class" for every plugin class under plugin_dir.'''
+    plugins = {}
+    for file_name in sorted(os.listdir(plugin_dir)):
+        if not file_name.endswith(".py") or file_name in _SKIP:
+            continue
+        with open(os.path.join(plugin_dir, file_name), encoding="utf-8") as source:
+            try:
+                class_names = scan_source(source.read())
+            except SyntaxError as e:
+                logger.error("Skipping plugin file %s: %s", file_name, e)
+                continue
+        for class_name in class_names:
+            plugins[class_name.lower()] = f"{package}.{file_name[:-3]}:{class_name}"
+    return plugins
+
+
+def scan_entry_points(group: str = ENTRY_POINT_GROUP) -> dict:
+    '''Command name -> "module:Class" for the installed entry points in group.'''
+    from importlib.metadata import entry_points
+    return {entry_point.name: entry_point.value for entry_point in entry_points(group=group)}
+
+
+def _read_manifest(manifest_path: str):
+    try:
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def _write_manifest(manifest_path: str, manifest: dict):
+    try:
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        temporary = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+        os.replace(temporary, manifest_path)
+    except OSError as e:
+        # A read-only install still works, it just rescans on every start
+        logger.debug("Could not write plugin manifest %s: %s", manifest_path, e)
+
+
+def load_manifest(plugin_dir: str = PLUGIN_DIR, package: str = PLUGIN_PACKAGE,
+                  manifest_path: Optional[str] = None, entry_points: bool = True) -> dict:
+    '''Return the plugin manifest, rescanning only the parts whose mtimes changed.'''
+    manifest_path = manifest_path or default_manifest_path(plugin_dir)
+    manifest = _read_manifest(manifest_path) or {"version": MANIFEST_VERSION}
+    changed = False
+
+    files = _file_mtimes(plugin_dir)
+    if manifest.get("files") != files or manifest.get("package") != package:
+        logger.debug("Scanning %s for plugins", plugin_dir)
+        manifest.update(files=files, package=package, plugins=scan_directory(plugin_dir, package))
+        changed = True
+
+    if entry_points:
+        sites = _site_mtimes()
+        if manifest.get("sites") != sites or "entry_points" not in manifest:
+            logger.debug("Scanning entry points in group %s", ENTRY_POINT_GROUP)
+            manifest.update(sites=sites, entry_points=scan_entry_points())
+            changed = True
+
+    if changed:
+        _write_manifest(manifest_path, manifest)
+    return manifest
+
+
+def discover_plugins(plugin_dir: str = PLUGIN_DIR, package: str = PLUGIN_PACKAGE,
+                     manifest_path: Optional[str] = None, entry_points: bool = True) -> dict:
+    '''Command name -> "module:Class" for every known plugin; package plugins win over entry points.'''
+    manifest = load_manifest(plugin_dir, package, manifest_path, entry_points)
+    plugins = dict(manifest.get("entry_points", {})) if entry_points else {}
+    plugins.update(manifest["plugins"])
+    return plugins
+
+
+def register_plugins(command_handler, **options) -> list:
+    '''Register every discovered plugin lazily on command_handler; returns the names registered.
+
+    Plugins never replace a command (or alias) that is already registered:
+    the plugin Add prints its result and returns None, so taking over "add"
+    would break batch mode and the server. Only new names, like "menu", are
+    added.'''
+    registry = command_handler.registry()
+    registered = []
+    for command_name, target in discover_plugins(**options).items():
+        if command_name in registry or command_name in registry.aliases:
+            logger.debug("Plugin %s not registered: %s is already a command", target, command_name)
+            continue
+        # Plugins take the handler they are registered with, e.g. Menu lists its commands
+        command_handler.register_lazy(command_name, target, command_handler)
+        registered.append(command_name)
+    logger.debug("Registered plugins: %s", ", ".join(registered))
+    return registered
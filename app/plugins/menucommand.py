@@ -1,8 +1,8 @@
 import logging
 from app.commands import Command
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured once by app.logging_setup
+logger = logging.getLogger(__name__)
 
 class Menu(Command):
     '''This displays available commands in the system'''
@@ -14,11 +14,11 @@ class Menu(Command):
         commands = self.command_handler.Get_Registered_Commands()
 
         if not commands:
-            logging.warning("No commands available in the system.")
+            logger.warning("No commands available in the system.")
             print("There are no commands")
             return
 
-        logging.info("Displaying available commands.")
+        logger.info("Displaying available commands.")
         print("Commands Available:")
         for command in commands:
             print(f"-> {command}") 
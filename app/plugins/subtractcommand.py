@@ -3,8 +3,8 @@ from decimal import Decimal, InvalidOperation
 from app.calculator import Calculator
 from app.commands import Command
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured once by app.logging_setup
+logger = logging.getLogger(__name__)
 
 class Subtract(Command):
     def __init__(self, command_handler):
@@ -14,18 +14,18 @@ class Subtract(Command):
         if not args:  # Prompts for input if arguments are not given
             args = input("Enter two numbers separated by space: ").split()
         if len(args) != 2:  # Ensures exactly two arguments are given
-            logging.warning("Only two arguments must be given.")
+            logger.warning("Only two arguments must be given.")
             print("Only two arguments must be given")
             return
 
         try:
             x, y = map(Decimal, args)  
             result = Calculator.subtract(x, y)
-            logging.info(f"Subtraction successful: {x} - {y} = {result}")
+            logger.info("Subtraction successful: %s - %s = %s", x, y, result)
             print(f"{x} - {y} = {result}")
         except InvalidOperation:
-            logging.error("Invalid input: One of the entered numbers is invalid.")
+            logger.error("Invalid input: One of the entered numbers is invalid.")
             print("One of the entered numbers is invalid. Please enter valid inputs.")
         except Exception as e:
-            logging.exception(f"An unexpected error occurred: {e}")
+            logger.exception("An unexpected error occurred: %s", e)
             print(f"Error: {e}")
@@ -0,0 +1,296 @@
+'''
+Asyncio network front-end for a CommandHandler.
+
+Line protocol (TCP): each request is one line, "command arg arg ...", and
+each response is one line: the result, or "Error: <message>". Clients may
+pipeline: send many requests without waiting, and responses come back in
+request order. Two lines are handled by the server itself:
+
+    history   -> JSON list of [request, response] pairs for this connection
+    quit      -> closes the connection
+
+Optional HTTP/JSON endpoint (one request per connection):
+
+    POST /execute  {"command": "add", "args": ["1", "2"]}  -> {"result": 3}
+    GET  /health                                          -> {"status": "ok"}
+
+Limits and backpressure: each connection has at most max_pipeline requests
+in flight; once that many are queued the server stops reading from the
+socket, so TCP flow control pushes back on the client. Across all
+connections at most max_concurrency evaluations run at once. Requests whose
+arguments are larger than heavy_threshold characters (for example huge
+Decimal multiplications) run in a thread pool instead of on the event loop.
+Request lines may be up to max_line bytes long (asyncio's default is only
+64 KiB); a longer line is skipped and answered, in order, with an error.
+Each connection's history keeps only its last max_history pairs.
+
+Usage:
+
+    python -m app.server --port 8765 [--http-port 8080] [--max-line 4194304] [--max-history 1000]
+'''
+import argparse
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from typing import Deque, Optional, Tuple
+
+from app.batch_mode import evaluate_one, format_result
+
+logger = logging.getLogger(__name__)
+
+# Longest request line (and HTTP header line) accepted by default, in bytes
+MAX_LINE = 1 << 22
+# [request, response] pairs kept per connection by default; older ones are dropped
+MAX_HISTORY = 1000
+# _read_line's result for a line longer than max_line, which it has skipped
+_TOO_LONG = object()
+
+
+class Session:
+    '''State kept for one client connection.'''
+
+    def __init__(self, peer, max_history: int = MAX_HISTORY):
+        self.peer = peer
+        self.history: Deque[Tuple[str, str]] = deque(maxlen=max_history)
+
+
+class CalculatorServer:
+    '''Serves a CommandHandler over TCP (and optionally HTTP).'''
+
+    def __init__(self, command_handler, host: str = "127.0.0.1", port: int = 0, http_port: Optional[int] = None,
+                 max_concurrency: int = 64, max_pipeline: int = 32, heavy_threshold: int = 1000,
+                 executor=None, max_line: int = MAX_LINE,
+                 max_history: int = MAX_HISTORY):
+        if max_history <= 0:
+            raise ValueError("max_history must be positive")
+        self.command_handler = command_handler
+        self.host = host
+        self.port = port
+        self.http_port = http_port
+        self.max_pipeline = max_pipeline
+        self.heavy_threshold = heavy_threshold
+        self.max_line = max_line
+        self.max_history = max_history
+        self.executor = executor or ThreadPoolExecutor(thread_name_prefix="calc-heavy")
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self._servers = []
+        self._connections = set()
+        self._closing = asyncio.Event()
+
+    @property
+    def addresses(self):
+        '''(host, port) of every listening socket, TCP first.'''
+        return [server.sockets[0].getsockname()[:2] for server in self._servers]
+
+    async def start(self):
+        '''Start listening; ports of 0 are replaced by the ones actually bound.'''
+        self._servers.append(await asyncio.start_server(self._serve_lines, self.host, self.port, limit=self.max_line))
+        self.port = self.addresses[0][1]
+        if self.http_port is not None:
+            self._servers.append(await asyncio.start_server(self._serve_http, self.host, self.http_port,
+                                                            limit=self.max_line))
+            self.http_port = self.addresses[1][1]
+        logger.info("Calculator server listening on %s", self.addresses)
+
+    async def serve_forever(self):
+        '''Run until shutdown() is called.'''
+        await self._closing.wait()
+
+    async def shutdown(self, timeout: float = 5.0):
+        '''Stop accepting, let in-flight requests finish, then close connections.'''
+        self._closing.set()
+        for server in self._servers:
+            server.close()
+        for server in self._servers:
+            await server.wait_closed()
+        if self._connections:
+            _, pending = await asyncio.wait(self._connections, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self.executor.shutdown(wait=False)
+        logger.info("Calculator server stopped")
+
+    async def evaluate(self, command_name: str, args) -> Tuple[object, Optional[str]]:
+        '''Evaluate one command under the global concurrency limit.'''
+        async with self._limit:
+            if sum(map(len, args)) > self.heavy_threshold:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, evaluate_one, self.command_handler, command_name, args)
+            return evaluate_one(self.command_handler, command_name, args)
+
+    def _track(self):
+        '''Register the current connection task so shutdown can wait for it.'''
+        task = asyncio.current_task()
+        self._connections.add(task)
+        task.add_done_callback(self._connections.discard)
+
+    async def _serve_lines(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._track()
+        session = Session(writer.get_extra_info("peername"), self.max_history)
+        responses = asyncio.Queue(maxsize=self.max_pipeline)
+        sender = asyncio.create_task(self._send_responses(session, responses, writer))
+        try:
+            while not self._closing.is_set():
+                line = await self._read_line(reader)
+                if line is None:
+                    break
+                if line is _TOO_LONG:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result(f"Error: Request line longer than {self.max_line} bytes")
+                    await responses.put(("(request too long)", future))
+                    continue
+                request = line.decode("utf-8", "replace").strip()
+                if not request:
+                    continue
+                if request == "quit":
+                    break
+                # put() blocks while max_pipeline responses are outstanding: that is the backpressure
+                future = None if request == "history" else asyncio.ensure_future(self._respond(request))
+                await responses.put((request, future))
+        finally:
+            await responses.put(None)
+            await sender
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_line(self, reader: asyncio.StreamReader):
+        '''Read the next line, or None at EOF or when the server starts closing.
+
+        Returns _TOO_LONG for a line longer than max_line, once it has been skipped.'''
+        read = asyncio.ensure_future(self._next_line(reader))
+        closing = asyncio.ensure_future(self._closing.wait())
+        done, _ = await asyncio.wait({read, closing}, return_when=asyncio.FIRST_COMPLETED)
+        closing.cancel()
+        if read not in done:
+            read.cancel()
+            return None
+        return read.result() or None
+
+    @staticmethod
+    async def _next_line(reader: asyncio.StreamReader):
+        '''The next line (b"" at EOF), or _TOO_LONG after skipping a line longer than the reader's limit.'''
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            return e.partial  # the last line had no newline
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+        # Drop the line chunk by chunk, so it is never buffered whole
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b"\n")
+                return _TOO_LONG
+            except asyncio.IncompleteReadError:
+                return _TOO_LONG  # EOF in the middle of it
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+
+    async def _respond(self, request: str) -> str:
+        '''Compute the response line for one request.'''
+        command_name, *args = request.split()
+        result, error = await self.evaluate(command_name.lower(), args)
+        return f"Error: {error}" if error is not None else format_result(result)
+
+    async def _send_responses(self, session: Session, responses: asyncio.Queue, writer: asyncio.StreamWriter):
+        '''Write responses in request order as they complete.'''
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            request, future = item
+            if future is None:
+                # "history" is answered in order, so it includes every earlier pipelined request
+                response = json.dumps(list(session.history), default=str)
+            else:
+                response = await future
+                session.history.append((request, response))
+            try:
+                writer.write(response.encode("utf-8") + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass  # client went away; keep draining so the reader can finish
+
+    async def _serve_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._track()
+        try:
+            status, body = await self._handle_http(reader)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, body = 400, {"error": str(e)}
+        payload = json.dumps(body, default=str).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n"
+            .encode("ascii") + payload
+        )
+        await writer.drain()
+        writer.close()
+
+    async def _handle_http(self, reader: asyncio.StreamReader):
+        '''Parse one HTTP request and return (status, json_body).'''
+        method, path, _ = (await reader.readline()).decode("ascii").split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method != "POST" or path != "/execute":
+            return 404, {"error": f"{method} {path} not found"}
+        request = json.loads(await reader.readexactly(int(headers.get("content-length", 0))))
+        if not isinstance(request, dict) or "command" not in request:
+            raise ValueError('Request body must be a JSON object with a "command"')
+        if not isinstance(request.get("args", []), list):
+            raise ValueError('"args" must be a JSON list')
+        result, error = await self.evaluate(str(request["command"]).lower(), [str(arg) for arg in request.get("args", [])])
+        if error is not None:
+            return 400, {"error": error}
+        try:
+            str(result)
+        except ValueError:
+            result = format_result(result)  # too many digits for json's int encoding: exact digits as a string
+        return 200, {"result": result}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculator network server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--http-port", type=int)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-pipeline", type=int, default=32)
+    parser.add_argument("--max-line", type=int, default=MAX_LINE, help="longest request line, in bytes")
+    parser.add_argument("--max-history", type=int, default=MAX_HISTORY,
+                        help="history entries kept per connection")
+    args = parser.parse_args(argv)
+
+    from app import command_handler
+    from app.logging_setup import configure_logging
+    configure_logging()
+
+    async def run():
+        server = CalculatorServer(command_handler, args.host, args.port, args.http_port,
+                                  max_concurrency=args.max_concurrency, max_pipeline=args.max_pipeline,
+                                  max_line=args.max_line, max_history=args.max_history)
+        await server.start()
+        try:
+            await server.serve_forever()
+        finally:
+            await server.shutdown()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+'''
+Throughput and accuracy of the numeric backends (see app.numeric).
+
+Reduces the same operand tokens with every backend through
+CommandHandler.evaluate and reports operands per second and the relative
+error of the result against the exact answer (the "fraction" backend's).
+Workloads: integer tokens, two-decimal-place tokens, and values close to 1
+for multiply and divide so products stay in range.
+
+    python -m benchmarks.bench_backends --operands 10000 --precision 28
+'''
+import argparse
+from decimal import Context
+from fractions import Fraction
+import random
+import time
+from typing import Dict, List, NamedTuple
+
+from app import register_commands
+from app.commands import CommandHandler
+from app.numeric import AutoBackend, DecimalBackend, FloatBackend, FractionBackend
+
+
+class BackendResult(NamedTuple):
+    workload: str
+    operation: str
+    backend: str
+    operands_per_second: float
+    relative_error: float  # against the exact result; 0.0 means exact
+
+
+def workloads(count: int, seed: int = 6) -> Dict[str, List[str]]:
+    '''Operand tokens by workload name.'''
+    generator = random.Random(seed)
+    return {
+        "int": [str(generator.randrange(1, 10**12)) for _ in range(count)],
+        "decimal": [f"{generator.uniform(0, 1000):.2f}" for _ in range(count)],
+        "near-one": [f"{generator.uniform(0.999, 1.001):.6f}" for _ in range(count)],
+    }
+
+
+def relative_error(result, exact: Fraction) -> float:
+    if not exact:
+        return float(abs(Fraction(result)))
+    return float(abs(Fraction(result) - exact) / abs(exact))
+
+
+def compare_backends(operations: Dict[str, List[str]], precision: int = 28, repeat: int = 3) -> List[BackendResult]:
+    '''Time every backend on each (operation -> tokens) workload; best of repeat runs.'''
+    backends = {
+        "auto": AutoBackend(),
+        "float": FloatBackend(),
+        "decimal": DecimalBackend(Context(prec=precision)),
+        "fraction": FractionBackend(),
+    }
+    results = []
+    for label, tokens in operations.items():
+        operation = label.split(":")[0]
+        exact = Fraction(getattr(FractionBackend(), operation)(tokens))
+        for name, backend in backends.items():
+            handler = register_commands(CommandHandler())
+            handler.use_backend(backend)
+            handler.evaluate(operation, "1", "1")  # load the command before timing it
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = handler.evaluate(operation, *tokens)
+                best = min(best, time.perf_counter() - started)
+            results.append(BackendResult(label.split(":")[-1], operation, name, len(tokens) / best,
+                                         relative_error(result, exact)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operands", type=int, default=10_000)
+    parser.add_argument("--precision", type=int, default=28, help="significant digits of the decimal backend")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tokens = workloads(args.operands)
+    operations = {
+        "add:int": tokens["int"],
+        "add:decimal": tokens["decimal"],
+        "multiply:near-one": tokens["near-one"],
+        "divide:near-one": tokens["near-one"],
+    }
+    print(f"{'workload':10} {'operation':10} {'backend':9} {'operands/s':>12} {'rel. error':>11}")
+    for row in compare_backends(operations, args.precision, args.repeat):
+        print(f"{row.workload:10} {row.operation:10} {row.backend:9} "
+              f"{row.operands_per_second:12,.0f} {row.relative_error:11.2e}")
+
+
+if __name__ == "__main__":
+    main()
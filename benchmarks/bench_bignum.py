@@ -0,0 +1,91 @@
+'''
+Product trees and pairwise sums against left folds, on wide exact operands.
+
+Multiplies and adds --operands integer tokens of --digits digits each as
+int, as Decimal under an exact context (precision and exponent range at
+their maximum) and as Fraction, once folding left to right (math.prod /
+sum) and once with app.commands.reduce's balanced tree. A left fold
+multiplies an ever larger product by one small operand at a time, which is
+quadratic in the product's size; the tree keeps both sides of every
+multiplication about the same size. The "backend" rows time the exact
+numeric backends end to end (tokens in, result out), which choose their
+strategy by themselves. Products folded over more than --fold-limit operands are
+skipped: at 10^5 operands they take minutes.
+
+    python -m benchmarks.bench_bignum --operands 100000 --digits 20
+'''
+import argparse
+from decimal import MAX_EMAX, MAX_PREC, MIN_EMIN, Context, Decimal, localcontext
+from fractions import Fraction
+import math
+import random
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from app.commands.reduce import pairwise_sum, tree_product
+from app.numeric import DecimalBackend, FractionBackend
+
+EXACT = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+
+class BignumResult(NamedTuple):
+    number_type: str
+    operation: str
+    strategy: str  # "fold", "tree" or "backend"
+    seconds: Optional[float]  # None when skipped
+
+
+def tokens(count: int, digits: int, seed: int = 22) -> List[str]:
+    '''count integer tokens of digits to digits + 5 digits.'''
+    generator = random.Random(seed)
+    return [str(generator.randrange(10 ** (digits - 1), 10 ** (digits + 5))) for _ in range(count)]
+
+
+def _time(function: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def compare_reductions(operands: List[str], fold_limit: int) -> List[BignumResult]:
+    '''Time fold, tree and backend reductions of the operands for every number type.'''
+    results = []
+    with localcontext(EXACT):
+        numbers = {
+            "int": list(map(int, operands)),
+            "decimal": list(map(Decimal, operands)),
+            "fraction": list(map(Fraction, operands)),
+        }
+        backends = {"decimal": DecimalBackend(EXACT), "fraction": FractionBackend()}
+        for number_type, values in numbers.items():
+            for operation, fold, tree in (("multiply", math.prod, tree_product), ("add", sum, pairwise_sum)):
+                start = values[0] * 0 if operation == "add" else None
+                fold_seconds = None
+                if operation == "add" or len(values) <= fold_limit:
+                    fold_seconds = _time(lambda: fold(values) if start is None else fold(values, start))
+                results.append(BignumResult(number_type, operation, "fold", fold_seconds))
+                results.append(BignumResult(number_type, operation, "tree", _time(lambda: tree(values))))
+                backend = backends.get(number_type)
+                if backend is not None:
+                    reduce = getattr(backend, operation)
+                    results.append(BignumResult(number_type, operation, "backend", _time(lambda: reduce(operands))))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operands", type=int, default=100_000)
+    parser.add_argument("--digits", type=int, default=20, help="minimum digits per operand")
+    parser.add_argument("--fold-limit", type=int, default=20_000,
+                        help="skip left-fold products over more operands than this")
+    args = parser.parse_args(argv)
+
+    print(f"{args.operands:,} operands of {args.digits}-{args.digits + 5} digits")
+    print(f"{'type':9} {'operation':9} {'strategy':8} {'seconds':>9}")
+    for row in compare_reductions(tokens(args.operands, args.digits), args.fold_limit):
+        seconds = "skipped" if row.seconds is None else f"{row.seconds:.3f}"
+        print(f"{row.number_type:9} {row.operation:9} {row.strategy:8} {seconds:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+'''
+Memory benchmark comparing the ListHistory and CompactHistory backends.
+
+Each backend is filled in its own child process so the resident set size of
+one does not leak into the other. Usage:
+
+    python -m benchmarks.bench_history_memory --entries 10000000
+'''
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from decimal import Decimal
+
+from app.calculator.calculation import Calculation
+from app.calculator.history import ListHistory, CompactHistory, OPERATIONS
+
+
+def max_rss_bytes() -> int:
+    '''Peak resident set size of this process (ru_maxrss is KiB on Linux).'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def fill(backend: str, entries: int) -> dict:
+    '''Fill one backend with entries calculations and report memory and time.'''
+    before = max_rss_bytes()
+    history = CompactHistory(capacity=entries) if backend == "compact" else ListHistory()
+    started = time.perf_counter()
+    for i in range(entries):
+        history.append(Calculation(Decimal(i), Decimal(i % 97 + 1), OPERATIONS[i % 4]))
+    elapsed = time.perf_counter() - started
+    used = max_rss_bytes() - before
+    return {
+        "backend": backend,
+        "entries": entries,
+        "rss_bytes": used,
+        "bytes_per_entry": used / entries,
+        "seconds": elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10_000_000)
+    parser.add_argument("--backend", choices=["list", "compact"], help="run a single backend in this process")
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        print(json.dumps(fill(args.backend, args.entries)))
+        return
+
+    for backend in ("list", "compact"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_history_memory", "--entries", str(args.entries), "--backend", backend],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        report = json.loads(output)
+        print(f"{backend:>8}: {report['rss_bytes'] / 2**20:10.1f} MiB "
+              f"{report['bytes_per_entry']:8.1f} B/entry {report['seconds']:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
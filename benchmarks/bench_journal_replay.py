@@ -0,0 +1,61 @@
+'''
+Journal write and replay throughput.
+
+replay rebuilds every Calculation; load is what Calculator.open_journal
+does, replaying straight into the history backend (--capacity: into a
+CompactHistory, which only rebuilds the newest entries it can hold).
+
+    python -m benchmarks.bench_journal_replay --entries 1000000 [--path FILE]
+'''
+import argparse
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+from app.calculator.calculation import Calculation
+from app.calculator.calculations import Calculations
+from app.calculator.history import OPERATIONS, CompactHistory, ListHistory
+from app.calculator.journal import Journal, replay, replay_frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--path", help="journal file to use (default: a temporary file)")
+    parser.add_argument("--sync", default="never", choices=["always", "group", "never"])
+    parser.add_argument("--capacity", type=int, help="load into a CompactHistory of this capacity")
+    args = parser.parse_args(argv)
+
+    path = args.path or os.path.join(tempfile.mkdtemp(), "bench.journal")
+    if os.path.exists(path):
+        os.remove(path)
+
+    journal = Journal(path, sync=args.sync, group_size=4096)
+    started = time.perf_counter()
+    for i in range(args.entries):
+        journal.append(Calculation(Decimal(i), Decimal(i % 97 + 1), OPERATIONS[i % 4]))
+    journal.close()
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    count = sum(1 for _ in replay(path))
+    replayed = time.perf_counter() - started
+
+    previous = Calculations.history
+    Calculations.use_backend(CompactHistory(args.capacity) if args.capacity else ListHistory())
+    try:
+        started = time.perf_counter()
+        loaded = Calculations.load(replay_frames(path, args.capacity))
+        load = time.perf_counter() - started
+    finally:
+        Calculations.use_backend(previous)
+
+    size = os.path.getsize(path)
+    print(f"write : {args.entries / written:12,.0f} records/s ({size / 2**20:.1f} MiB)")
+    print(f"replay: {count / replayed:12,.0f} records/s ({replayed:.2f} s for {count:,} records)")
+    print(f"load  : {count / load:12,.0f} records/s ({load:.2f} s, {loaded:,} calculations kept)")
+
+
+if __name__ == "__main__":
+    main()
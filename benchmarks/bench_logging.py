@@ -0,0 +1,58 @@
+'''
+Per-operation logging overhead of CommandHandler.Execute_Command.
+
+Compares the bare command (evaluate, which never logs) against
+Execute_Command with per-operation logging disabled, enabled through the
+queue handler, and enabled but sampled 1 in 100.
+
+    python -m benchmarks.bench_logging --calls 200000
+'''
+import argparse
+import logging
+import os
+import time
+
+from app import command_handler
+from app.logging_setup import OPERATIONS_LOGGER, install_queue_logging, set_operation_sampling
+
+
+def per_call_us(function, calls: int) -> float:
+    '''Average wall time of one call in microseconds.'''
+    started = time.perf_counter()
+    for _ in range(calls):
+        function("add", "1", "2")
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    # Route everything through the same queue setup configure_logging uses, into /dev/null
+    sink = logging.StreamHandler(open(os.devnull, "w", encoding="utf-8"))
+    sink.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    listener = install_queue_logging([sink])
+    operations = logging.getLogger(OPERATIONS_LOGGER)
+
+    baseline = per_call_us(command_handler.evaluate, args.calls)
+    print(f"no logging (evaluate)     : {baseline:6.2f} us/op")
+
+    operations.setLevel(logging.WARNING)
+    disabled = per_call_us(command_handler.Execute_Command, args.calls)
+    print(f"Execute_Command, disabled : {disabled:6.2f} us/op (+{disabled - baseline:.2f})")
+
+    operations.setLevel(logging.INFO)
+    enabled = per_call_us(command_handler.Execute_Command, args.calls)
+    print(f"Execute_Command, queued   : {enabled:6.2f} us/op (+{enabled - baseline:.2f})")
+
+    set_operation_sampling(100)
+    sampled = per_call_us(command_handler.Execute_Command, args.calls)
+    print(f"Execute_Command, 1 in 100 : {sampled:6.2f} us/op (+{sampled - baseline:.2f})")
+    set_operation_sampling(None)
+
+    listener.stop()
+
+
+if __name__ == "__main__":
+    main()
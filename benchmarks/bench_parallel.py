@@ -0,0 +1,46 @@
+'''
+Scaling benchmark for ParallelExecutor across 1, 2, 4 and N worker processes.
+
+    python -m benchmarks.bench_parallel --invocations 200000 --operands 50
+'''
+import argparse
+import os
+import time
+
+from app import command_handler
+from app.batch_mode import evaluate_one
+from app.parallel import ParallelExecutor
+
+
+def invocations(count: int, operands: int):
+    '''Multiply invocations with a fixed number of operands each.'''
+    args = tuple(str(1 + (i % 7) / 10) for i in range(operands))
+    return (("multiply", args) for _ in range(count))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invocations", type=int, default=200_000)
+    parser.add_argument("--operands", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    for command_name, operands in invocations(args.invocations, args.operands):
+        evaluate_one(command_handler, command_name, operands)
+    sequential = time.perf_counter() - started
+    print(f"sequential : {args.invocations / sequential:12,.0f} invocations/s")
+
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, 2, 4, cores}):
+        with ParallelExecutor(max_workers=workers, chunk_size=args.chunk_size) as executor:
+            started = time.perf_counter()
+            for _ in executor.map(invocations(args.invocations, args.operands)):
+                pass
+            elapsed = time.perf_counter() - started
+        print(f"{workers:3d} workers: {args.invocations / elapsed:12,.0f} invocations/s "
+              f"(speed-up {sequential / elapsed:5.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
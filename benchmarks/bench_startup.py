@@ -0,0 +1,72 @@
+'''
+Cold-start cost of importing the application.
+
+Runs a fresh interpreter with -X importtime for each sample and reports, for
+the fastest sample, the cumulative time of the top-level import and the time
+spent in the app's own modules (the sum of their self times, so stdlib
+imports such as logging are excluded). The app's share is what
+APP_IMPORT_BUDGET_US bounds; tests/test_startup.py enforces it.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --statement "import main"
+'''
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, NamedTuple
+
+# Self time of app.* modules imported by "import app", in microseconds
+APP_IMPORT_BUDGET_US = 15_000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ImportProfile(NamedTuple):
+    total_us: int  # cumulative time of the outermost imports
+    app_us: int  # summed self time of the app's own modules
+    modules: Dict[str, int]  # app module -> self time
+
+
+def profile_imports(statement: str = "import app", package: str = "app") -> ImportProfile:
+    '''Run statement in a fresh interpreter and parse its -X importtime report.'''
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total = 0
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Top-level imports are the ones printed without indentation
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+        name = name.strip()
+        if name == package or name.startswith(package + "."):
+            modules[name] = int(self_us)
+    return ImportProfile(total, sum(modules.values()), modules)
+
+
+def best_profile(runs: int, statement: str = "import app") -> ImportProfile:
+    '''Fastest of several runs; the minimum is the least noisy estimate.'''
+    return min((profile_imports(statement) for _ in range(runs)), key=lambda profile: profile.app_us)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--statement", default="import app")
+    args = parser.parse_args(argv)
+
+    profile = best_profile(args.runs, args.statement)
+    print(f"{args.statement!r}: {profile.total_us / 1000:.1f} ms total, "
+          f"{profile.app_us / 1000:.1f} ms in app modules (budget {APP_IMPORT_BUDGET_US / 1000:.1f} ms)")
+    for name, self_us in sorted(profile.modules.items(), key=lambda item: -item[1]):
+        print(f"  {name:30} {self_us / 1000:6.2f} ms")
+    return 0 if profile.app_us <= APP_IMPORT_BUDGET_US else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
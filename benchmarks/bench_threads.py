@@ -0,0 +1,77 @@
+'''
+Throughput of the Calculator and CommandHandler shared by 1, 2, 4 and 8 threads.
+
+Every thread performs the same number of Calculator.add calls and command
+evaluations against one shared CommandHandler while the history fills up;
+the run then checks that the history holds every calculation. Under the GIL
+the interesting number is how little throughput drops as threads are added,
+i.e. how little time goes to contention.
+
+    python -m benchmarks.bench_threads --operations 50000 --threads 1 2 4 8
+'''
+import argparse
+from decimal import Decimal
+import threading
+import time
+from typing import List, NamedTuple
+
+from app import register_commands
+from app.calculator import Calculator
+from app.calculator.calculations import Calculations
+from app.commands import CommandHandler
+
+
+class ThreadRun(NamedTuple):
+    threads: int
+    operations: int  # per thread
+    seconds: float
+    recorded: int  # calculations found in history afterwards
+
+    @property
+    def operations_per_second(self) -> float:
+        return self.threads * self.operations / self.seconds
+
+
+def run_threads(threads: int, operations: int) -> ThreadRun:
+    '''Run operations Calculator.add calls and handler evaluations on each of threads threads.'''
+    handler = register_commands(CommandHandler())
+    handler.evaluate("add", "1", "2")  # load the command before timing
+    Calculations.clear_history()
+    start = threading.Barrier(threads + 1)
+
+    def work(worker: int):
+        operand = Decimal(worker)
+        start.wait()
+        for i in range(operations):
+            Calculator.add(operand, Decimal(i))
+            handler.evaluate("add", "1", "2")
+
+    workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    recorded = len(Calculations.get_history())
+    seconds = time.perf_counter() - started
+    Calculations.clear_history()
+    return ThreadRun(threads, operations, seconds, recorded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=50_000, help="operations per thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+
+    runs: List[ThreadRun] = [run_threads(threads, args.operations) for threads in args.threads]
+    baseline = runs[0].operations_per_second
+    for run in runs:
+        lost = run.threads * run.operations - run.recorded
+        print(f"{run.threads:3d} threads: {run.operations_per_second:12,.0f} ops/s "
+              f"(scaling {run.operations_per_second / baseline:5.2f}x), lost {lost}")
+
+
+if __name__ == "__main__":
+    main()
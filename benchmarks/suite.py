@@ -0,0 +1,297 @@
+'''
+Benchmark suite with stored JSON baselines and regression gating.
+
+Covers CommandHandler dispatch (pipelines included), every app.commands command across argument
+counts from 2 to 1M, the Calculator operations, and Calculations insert
+(with its indexes maintained), cold index build and query at scale. Each
+benchmark reports the best time per call over several repeats (the minimum
+is the least noisy estimate).
+
+    python -m benchmarks.suite run --output results/baseline.json
+    python -m benchmarks.suite compare results/baseline.json --threshold 0.25
+    python -m benchmarks.suite compare results/baseline.json results/new.json
+
+compare runs the suite (or reads a second results file) and exits with
+status 1 when any benchmark is more than threshold slower than its
+baseline, so it can gate CI or a performance PR. Baselines are machine
+specific: record one on the machine that will run the comparison.
+'''
+import argparse
+from decimal import Decimal
+import fnmatch
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+from typing import Callable, List, NamedTuple, Optional
+
+from app import COMMANDS, register_commands
+from app.calculator import Calculator
+from app.calculator.calculation import Calculation
+from app.calculator.calculations import Calculations
+from app.calculator.history import CompactHistory, ListHistory, OPERATIONS
+from app.commands import CommandHandler
+
+ARG_COUNTS = (2, 100, 10_000, 1_000_000)
+HISTORY_SIZE = 100_000
+DEFAULT_THRESHOLD = 0.25
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable[[], Callable[[], object]]  # returns the function to time
+
+
+def _handler() -> CommandHandler:
+    handler = register_commands(CommandHandler())
+    for command_name in COMMANDS:
+        handler.evaluate(command_name, "1", "1")  # load lazy commands outside the timing
+    return handler
+
+
+def _dispatch(method: str, metrics: bool = False, command_name: str = "add"):
+    def setup():
+        handler = _handler()
+        if metrics:
+            handler.enable_metrics()
+        function = getattr(handler, method)
+        return lambda: function(command_name, "1", "2")
+    return setup
+
+
+def _pipeline(chained: bool):
+    def setup():
+        handler = _handler()
+        if chained:
+            # The same work without a pipeline: every result printed and parsed back
+            def run():
+                value = handler.evaluate("add", "1.5", "2")
+                value = handler.evaluate("multiply", str(value), "3")
+                return handler.evaluate("divide", str(value), "4")
+            return run
+        tokens = ("add", "1.5", "2", "|", "multiply", "3", "|", "divide", "4")
+        return lambda: handler.evaluate_pipeline(tokens)
+    return setup
+
+
+def _registry(method: str, *args):
+    def setup():
+        function = getattr(_handler(), method)
+        return lambda: function(*args)
+    return setup
+
+
+def _command(command_name: str, count: int):
+    def setup():
+        handler = _handler()
+        # Operands near 1 keep products and quotients finite for a million arguments
+        args = [str(1 + (i % 7) / 1000) for i in range(count)]
+        return lambda: handler.evaluate(command_name, *args)
+    return setup
+
+
+def _calculator(operation: Callable):
+    def setup():
+        # Every call records a calculation; a ring buffer keeps memory flat however many calls are timed
+        Calculations.use_backend(CompactHistory(capacity=65536))
+        x, y = Decimal("12.5"), Decimal("3.2")
+        return lambda: operation(x, y)
+    return setup
+
+
+def _fill(size: int, indexed: bool = False):
+    Calculations.use_backend(ListHistory())  # also drops the indexes
+    if indexed:
+        Calculations.find_by_operation("add")  # build them now, so every insert below maintains them
+    for i in range(size):
+        Calculations.add_calculation(Calculation(Decimal(i), Decimal(i % 97 + 1), OPERATIONS[i % 4]))
+    Calculations.flush()  # merge the buffered calculations into history (and the indexes)
+
+
+def _history_insert(size: int):
+    def setup():
+        return lambda: _fill(size, indexed=True)
+    return setup
+
+
+def _index_build(size: int):
+    def setup():
+        _fill(size)
+
+        def build():
+            # Cold: every index rebuilt from the whole history, results sorted
+            Calculations.index = None
+            return Calculations.find_by_result_range(Decimal(100), Decimal(200))
+        return build
+    return setup
+
+
+def _history_query(query: Callable, size: int):
+    def setup():
+        _fill(size)
+        return query
+    return setup
+
+
+def benchmarks(max_args: int = ARG_COUNTS[-1], history_size: int = HISTORY_SIZE) -> List[Benchmark]:
+    '''Every benchmark in the suite, with argument counts capped at max_args.'''
+    suite = [
+        Benchmark("dispatch.execute_command", _dispatch("Execute_Command")),
+        Benchmark("dispatch.evaluate", _dispatch("evaluate")),
+        Benchmark("dispatch.execute_command.metrics", _dispatch("Execute_Command", metrics=True)),
+        Benchmark("dispatch.evaluate.metrics", _dispatch("evaluate", metrics=True)),
+        Benchmark("dispatch.pipeline", _pipeline(chained=False)),
+        Benchmark("dispatch.pipeline.chained_evaluate", _pipeline(chained=True)),
+        Benchmark("dispatch.get_registered_commands", _registry("get_registered_commands")),
+        Benchmark("dispatch.resolve.abbreviation", _registry("resolve", "mul")),
+        Benchmark("dispatch.evaluate.alias", _dispatch("evaluate", command_name="+")),
+    ]
+    for command_name in ("add", "subtract", "multiply", "divide"):
+        for count in ARG_COUNTS:
+            if count <= max_args:
+                suite.append(Benchmark(f"command.{command_name}.{count}", _command(command_name, count)))
+    for operation in (Calculator.add, Calculator.subtract, Calculator.multiply, Calculator.divide):
+        suite.append(Benchmark(f"calculator.{operation.__name__}", _calculator(operation)))
+    suite += [
+        Benchmark(f"calculations.insert.{history_size}", _history_insert(history_size)),
+        Benchmark(f"calculations.index_build.{history_size}", _index_build(history_size)),
+        Benchmark(f"calculations.find_by_operation.{history_size}",
+                  _history_query(lambda: Calculations.find_by_operation("add"), history_size)),
+        Benchmark(f"calculations.find_by_operand.{history_size}",
+                  _history_query(lambda: Calculations.find_by_operand(Decimal(5)), history_size)),
+        Benchmark(f"calculations.find_by_result_range.{history_size}",
+                  _history_query(lambda: Calculations.find_by_result_range(Decimal(100), Decimal(200)), history_size)),
+        Benchmark(f"calculations.get_latest.{history_size}",
+                  _history_query(Calculations.get_latest, history_size)),
+    ]
+    return suite
+
+
+def measure(function: Callable[[], object], repeat: int = 3, min_time: float = 0.2) -> float:
+    '''Best seconds per call over repeat rounds of about min_time each.'''
+    timer = timeit.Timer(function)
+    number, elapsed = 1, 0.0
+    while True:  # like Timer.autorange, with a configurable target time
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, timer.timeit(number) / number)
+    return best
+
+
+def run_suite(pattern: str = "*", repeat: int = 3, min_time: float = 0.2,
+              max_args: int = ARG_COUNTS[-1], history_size: int = HISTORY_SIZE, report=None) -> dict:
+    '''Run the matching benchmarks and return a results document.'''
+    results = {}
+    history = Calculations.history
+    try:
+        for benchmark in benchmarks(max_args, history_size):
+            if not fnmatch.fnmatch(benchmark.name, pattern):
+                continue
+            seconds = measure(benchmark.setup(), repeat, min_time)
+            results[benchmark.name] = {"seconds": seconds}
+            if report is not None:
+                print(f"{benchmark.name:45} {format_seconds(seconds)}", file=report)
+    finally:
+        Calculations.use_backend(history)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s ", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:9.3f} {unit}"
+    return f"{seconds / 1e-9:9.1f} ns"
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+
+def compare(baseline: dict, current: dict) -> List[Comparison]:
+    '''Pair up the benchmarks present in both results documents.'''
+    previous = baseline["results"]
+    return [
+        Comparison(name, previous[name]["seconds"], result["seconds"])
+        for name, result in current["results"].items() if name in previous
+    ]
+
+
+def regressions(comparisons: List[Comparison], threshold: float = DEFAULT_THRESHOLD) -> List[Comparison]:
+    '''Benchmarks more than threshold (a fraction, 0.25 = 25%) slower than their baseline.'''
+    return [comparison for comparison in comparisons if comparison.ratio > 1 + threshold]
+
+
+def load_results(path: str) -> dict:
+    with open(path, encoding="utf-8") as results_file:
+        return json.load(results_file)
+
+
+def save_results(path: str, results: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+        results_file.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="mode", required=True)
+    run = commands.add_parser("run", help="run the suite and optionally save a baseline")
+    run.add_argument("--output", help="write results JSON here, e.g. results/baseline.json")
+    check = commands.add_parser("compare", help="fail if results regress against a baseline")
+    check.add_argument("baseline")
+    check.add_argument("current", nargs="?", help="results JSON to check (default: run the suite now)")
+    check.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="allowed slow-down as a fraction (default: %(default)s)")
+    for sub in (run, check):
+        sub.add_argument("--filter", default="*", help="fnmatch pattern of benchmark names to run")
+        sub.add_argument("--repeat", type=int, default=3)
+        sub.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+        sub.add_argument("--max-args", type=int, default=ARG_COUNTS[-1], help="largest argument count to run")
+        sub.add_argument("--history-size", type=int, default=HISTORY_SIZE)
+    args = parser.parse_args(argv)
+
+    def run_now():
+        return run_suite(args.filter, args.repeat, args.min_time, args.max_args, args.history_size, report=sys.stdout)
+
+    if args.mode == "run":
+        results = run_now()
+        if args.output:
+            save_results(args.output, results)
+            print(f"Saved {len(results['results'])} results to {args.output}")
+        return 0
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current) if args.current else run_now()
+    comparisons = compare(baseline, current)
+    failed = regressions(comparisons, args.threshold)
+    for comparison in comparisons:
+        flag = "REGRESSION" if comparison in failed else ""
+        print(f"{comparison.name:45} {format_seconds(comparison.baseline)} -> "
+              f"{format_seconds(comparison.current)} {comparison.ratio:6.2f}x {flag}")
+    print(f"{len(failed)} of {len(comparisons)} benchmarks regressed beyond {args.threshold:.0%}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,114 @@
-from app import CommandHandler, AddCommand, SubtractCommand, MultiplyCommand, DivideCommand
-
-def main():
-    # Create a command handler instance
-    command_handler = CommandHandler()
-    
-    # Register commands
-    command_handler.Register_Command("add", AddCommand())
-    command_handler.Register_Command("subtract", SubtractCommand())
-    command_handler.Register_Command("multiply", MultiplyCommand())
-    command_handler.Register_Command("divide", DivideCommand())
+import argparse
+import sys
+from app import CommandHandler, register_commands
+from app.logging_setup import configure_logging
 
+def build_command_handler(metrics=True, backend=None, precision=None):
+    # Create a command handler instance; commands are imported on first use
+    command_handler = register_commands(CommandHandler())
+    if metrics:
+        command_handler.enable_metrics()
+    if backend is not None:
+        from app.numeric import get_backend
+        command_handler.use_backend(get_backend(backend, precision))
+    return command_handler
+
+def batch(command_handler, source, workers=1):
+    # Stream commands from a file (or stdin for '-') without prompting
+    from app.batch_mode import run_batch
+    executor = None
+    if workers > 1:
+        # Process pools are only worth their import and start-up cost when asked for
+        from functools import partial
+        from app.parallel import ParallelExecutor
+        # Workers build their own handler, computing with the same numeric backend; their metrics add up here
+        metrics = command_handler.recorder is not None
+        executor = ParallelExecutor(max_workers=workers, recorder=command_handler.recorder,
+                                    handler_factory=partial(worker_handler, command_handler.backend, metrics))
+    try:
+        if source == "-":
+            summary = run_batch(command_handler, sys.stdin, sys.stdout, sys.stderr, executor)
+        else:
+            with open(source, encoding="utf-8") as lines:
+                summary = run_batch(command_handler, lines, sys.stdout, sys.stderr, executor)
+    finally:
+        if executor is not None:
+            executor.close()
+    print(summary, file=sys.stderr)
+    return 1 if summary.errors else 0
+
+def worker_handler(backend, metrics=False):
+    from app.commands.stats import UnavailableStatsCommand
+    command_handler = build_command_handler(metrics=metrics, backend=backend)
+    # A worker only sees its own chunks of the input; the parent has the merged metrics
+    command_handler.Register_Command("stats", UnavailableStatsCommand(
+        "stats is not available with --workers; use --metrics-file for the merged metrics"))
+    return command_handler
+
+def run_pipeline(command_handler, line):
+    # "add 1 2 | multiply 3": each result is passed on to the next command as a number
+    from app.batch_mode import format_result
+    from app.pipeline import split_pipe
+    try:
+        print(f"Result: {format_result(command_handler.evaluate_pipeline(split_pipe(line)))}")
+    except KeyError as e:
+        print(f"{e.args[0]}. Type 'menu' to see available commands.")
+    except (ValueError, TypeError, ArithmeticError) as e:
+        print(f"Error: {e}")
+
+def run_command(command_handler, text):
+    # Names, aliases ('+') and unambiguous abbreviations ('mul') all resolve through the registry
+    registry = command_handler.registry()
+    if text == "menu" and "menu" not in registry:
+        # Without the Menu plugin, list the commands here
+        print("Available commands:", ", ".join(registry.names))
+        return
+    try:
+        command_name = registry.resolve(text)
+    except KeyError as e:
+        print(f"{e.args[0]}. Type 'menu' to see available commands.")
+        return
+    if command_name is None:
+        print(f"{text}: Command not found. Type 'menu' to see available commands.")
+    elif command_name in ("stats", "menu"):
+        # These take no numbers here; "stats FILE" works in batch mode
+        result = command_handler.Execute_Command(command_name)
+        if result is not None:
+            print(result)
+    else:
+        try:
+            # Ask for numbers from the user
+            args = input(f"Enter the numbers separated by space for '{command_name}': ").strip().split()
+            # Execute the command with the provided arguments
+            result = command_handler.Execute_Command(command_name, *args)
+            if result is not None:
+                from app.batch_mode import format_result
+                print(f"Result: {format_result(result)}")
+        except Exception as e:
+            print(f"Error: {e}")
+
+def completer(command_handler):
+    # readline completer over the command names and aliases
+    def complete(text, state):
+        matches = command_handler.registry().complete(text.lower())
+        return matches[state] if state < len(matches) else None
+    return complete
+
+def enable_completion(command_handler):
+    # Tab completes commands where readline is available (not on every platform)
+    try:
+        import readline
+    except ImportError:
+        return False
+    readline.set_completer(completer(command_handler))
+    readline.parse_and_bind("tab: complete")
+    return True
+
+def repl(command_handler):
     print("Welcome to the Command Pattern Calculator!")
     print("Type 'menu' to see the available commands.")
-    
+    print("Chain commands with '|', e.g. 'add 1 2 | multiply 3'.")
+
     while True:
         # Ask the user for a command input
         command_name = input("\nEnter command (or 'exit' to quit): ").strip().lower()
@@ -20,22 +116,40 @@ def main():
         if command_name == "exit":
             print("Exiting... Goodbye!")
             break
-        elif command_name == "menu":
-            # Display all registered commands
-            available_commands = command_handler.get_registered_commands()
-            print("Available commands:", ", ".join(available_commands))
-        elif command_name in command_handler.get_registered_commands():
-            try:
-                # Ask for numbers from the user
-                args = input(f"Enter the numbers separated by space for '{command_name}': ").strip().split()
-                # Execute the command with the provided arguments
-                result = command_handler.Execute_Command(command_name, *args)
-                if result is not None:
-                    print(f"Result: {result}")
-            except Exception as e:
-                print(f"Error: {e}")
+        elif "|" in command_name:
+            run_pipeline(command_handler, command_name)
         else:
-            print(f"{command_name}: Command not found. Type 'menu' to see available commands.")
+            run_command(command_handler, command_name)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Command Pattern Calculator")
+    parser.add_argument("--batch", metavar="FILE", help="run 'command arg ...' lines from FILE ('-' for stdin) without prompts")
+    parser.add_argument("--workers", type=int, default=1, help="evaluate batch commands on this many processes")
+    parser.add_argument("--plugins", action="store_true", help="also load the commands from app/plugins and installed plugins")
+    parser.add_argument("--no-metrics", action="store_true", help="do not record per-command call counts and latencies")
+    parser.add_argument("--metrics-file", metavar="FILE", help="write per-command metrics to FILE (Prometheus text) on exit")
+    parser.add_argument("--backend", choices=["auto", "float", "decimal", "fraction"],
+                        help="number type the commands compute with (default: int while exact, else float)")
+    parser.add_argument("--precision", type=int, help="significant digits for --backend decimal")
+    args = parser.parse_args(argv)
+    if args.precision is not None and args.backend != "decimal":
+        parser.error("--precision requires --backend decimal")
+
+    command_handler = build_command_handler(metrics=not args.no_metrics, backend=args.backend, precision=args.precision)
+    if args.plugins:
+        from app.plugins.discovery import register_plugins
+        register_plugins(command_handler)
+    try:
+        if args.batch:
+            return batch(command_handler, args.batch, args.workers)
+        enable_completion(command_handler)
+        repl(command_handler)
+        return 0
+    finally:
+        if args.metrics_file and command_handler.recorder is not None:
+            from app.metrics import write_prometheus
+            write_prometheus(args.metrics_file, command_handler.metrics())
 
 if __name__ == "__main__":
-    main()
+    configure_logging()
+    sys.exit(main())
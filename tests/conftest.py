@@ -2,6 +2,10 @@
 # conftest.py
 from decimal import Decimal
 from faker import Faker
+import pytest
+import main
+from app.calculator import Calculator
+from app.calculator.calculations import Calculations
 from app.calculator.operations import add, subtract, multiply, divide
 
 fake = Faker()
@@ -48,3 +52,18 @@ def pytest_generate_tests(metafunc):
         # Modify parameters to fit test functions' expectations
         modified_parameters = [(a, b, op_name if 'operation_name' in metafunc.fixturenames else op_func, expected) for a, b, op_name, op_func, expected in parameters]
         metafunc.parametrize("a,b,operation,expected", modified_parameters)
+
+
+@pytest.fixture
+def empty_history():
+    '''Starts and ends the test with an empty shared history and no journal.'''
+    Calculations.clear_history()
+    yield
+    Calculator.close_journal()
+    Calculations.clear_history()
+
+
+@pytest.fixture
+def command_handler():
+    '''Handler with the built-in commands and aliases registered, metrics off'''
+    return main.build_command_handler(metrics=False)
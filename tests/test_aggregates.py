@@ -0,0 +1,134 @@
+'''Tests for the running aggregates behind Calculations.summary().'''
+from decimal import Decimal
+import random
+import statistics
+
+import pytest
+
+from app.calculator import Calculator
+from app.calculator.aggregates import RunningStats
+from app.calculator.calculation import Calculation, result_listeners
+from app.calculator.calculations import Calculations
+from app.calculator.history import CompactHistory
+from app.calculator.operations import add, divide
+
+
+def test_summary_matches_full_scan(empty_history):
+    '''Aggregates folded in batch by batch match statistics over every result'''
+    generator = random.Random(20)
+    for _ in range(3 * Calculations.FLUSH_EVERY + 7):
+        x, y = Decimal(generator.randrange(-1000, 1000)) / 8, Decimal(generator.randrange(1, 100))
+        Calculator.add(x, y) if generator.random() < 0.5 else Calculator.multiply(x, y)
+    summary = Calculations.summary()
+    assert summary["count"] == 3 * Calculations.FLUSH_EVERY + 7 and summary["pending"] == 0
+    for name, stats in summary["operations"].items():
+        results = [calc.perform() for calc in Calculations.find_by_operation(name)]
+        assert stats["count"] == len(results)
+        assert stats["sum"] == sum(results) and isinstance(stats["sum"], Decimal)
+        assert (stats["min"], stats["max"]) == (min(results), max(results))
+        assert stats["mean"] == pytest.approx(float(statistics.mean(results)), rel=1e-12)
+        assert stats["variance"] == pytest.approx(float(statistics.variance(results)), rel=1e-9)
+
+
+def test_clear_resets_aggregates(empty_history):
+    '''clear_history starts the aggregates over'''
+    Calculator.add(Decimal(1), Decimal(2))
+    assert Calculations.summary()["count"] == 1
+    Calculations.clear_history()
+    assert Calculations.summary() == {"count": 0, "pending": 0, "operations": {}}
+    Calculator.add(Decimal(5), Decimal(5))
+    assert Calculations.summary()["operations"]["add"] == {
+        "count": 1, "sum": 10, "min": 10, "max": 10, "mean": 10.0, "variance": 0.0, "invalid": 0,
+    }
+
+
+def test_pending_calculations_fold_in_once_evaluated(empty_history):
+    '''Deferred and failed calculations are pending until their result is known'''
+    deferred = Calculator.defer(Decimal(6), Decimal(3), divide)
+    with pytest.raises(ValueError):
+        Calculator.divide(Decimal(1), Decimal(0))
+    assert Calculations.summary()["pending"] == 2
+    assert deferred.perform() == 2
+    summary = Calculations.summary()
+    assert summary["pending"] == 1
+    assert summary["operations"]["divide"]["sum"] == 2
+
+
+def test_pending_calculations_are_bounded_by_history(empty_history):
+    '''Only deferred calculations a bounded history still holds are kept pending'''
+    previous = Calculations.history
+    Calculations.use_backend(CompactHistory(capacity=100))
+    try:
+        deferred = [Calculator.defer(Decimal(i), Decimal(1), add) for i in range(50_000)]
+        Calculations.flush()
+        assert len(Calculations.aggregates.pending) == len(result_listeners) == 100
+        assert deferred[0].perform() == 1 and deferred[-1].perform() == 50_000
+        summary = Calculations.summary()
+        assert summary["pending"] == 99 and summary["operations"]["add"]["sum"] == 50_000
+    finally:
+        Calculations.use_backend(previous)
+
+
+def test_rebuild_after_loading_history(empty_history, tmp_path):
+    '''A replayed or swapped-in history is summarized through the rebuild path'''
+    path = str(tmp_path / "history.journal")
+    Calculator.open_journal(path)
+    for i in range(10):
+        Calculator.multiply(Decimal(i), Decimal(2))
+    Calculator.close_journal()
+    Calculations.clear_history()
+    Calculator.open_journal(path)  # replayed calculations carry no results
+    assert Calculations.summary()["pending"] == 10
+    summary = Calculations.rebuild_summary(evaluate=True)
+    assert summary["pending"] == 0 and summary["operations"]["multiply"]["sum"] == 90
+
+    previous = Calculations.history
+    compact = CompactHistory(capacity=4)
+    for i in range(6):
+        compact.append(Calculation(Decimal(i), Decimal(1), add, Decimal(i + 1)))
+    Calculations.use_backend(compact)
+    try:
+        summary = Calculations.summary()  # packed histories keep their results
+        assert summary["pending"] == 0 and summary["operations"]["add"]["sum"] == 3 + 4 + 5 + 6
+    finally:
+        Calculations.use_backend(previous)
+
+
+def test_running_stats_mixed_and_combined():
+    '''Incompatible result types fall back to float sums; combine matches one stream'''
+    stats = RunningStats()
+    stats.add_batch([Decimal("1.5"), Decimal("2.5")])
+    stats.add_batch([1.0, 3.0])
+    assert stats.total == 8.0 and (stats.minimum, stats.maximum) == (1.0, 3.0)
+    assert stats.variance == pytest.approx(statistics.variance([1.5, 2.5, 1.0, 3.0]))
+    combined = RunningStats()
+    combined.combine(stats)
+    combined.combine(RunningStats())
+    assert (combined.count, combined.mean, combined.m2) == (stats.count, stats.mean, stats.m2)
+    huge = RunningStats()
+    huge.add_batch([10 ** 400, 1])
+    assert huge.total == 10 ** 400 + 1 and huge.mean == float("inf")
+
+
+def test_nan_results_do_not_break_the_merge(empty_history):
+    '''NaN results are counted as invalid, and the rest of their batch still folds in'''
+    Calculations.add_calculation(Calculation(Decimal("NaN"), Decimal(1), add, Decimal("NaN")))
+    Calculations.add_calculation(Calculation(Decimal(2), Decimal(1), add, Decimal(3)))
+    Calculations.add_calculation(Calculation(Decimal("sNaN"), Decimal(1), add, Decimal("sNaN")))
+    assert len(Calculations.get_history()) == 3
+    stats = Calculations.summary()["operations"]["add"]
+    assert (stats["count"], stats["invalid"]) == (1, 2)
+    assert stats["sum"] == stats["min"] == stats["max"] == 3
+    Calculations.add_calculation(Calculation(Decimal(4), Decimal(1), add, Decimal(5)))
+    stats = Calculations.summary()["operations"]["add"]
+    assert (stats["count"], stats["max"], stats["invalid"]) == (2, 5, 2)
+
+
+def test_failed_batches_leave_stats_unchanged():
+    '''NaN is left out of a batch; a batch that fails changes nothing'''
+    stats = RunningStats()
+    stats.add_batch([1.0, float("nan"), 3.0])
+    assert (stats.count, stats.invalid, stats.minimum, stats.maximum) == (2, 1, 1.0, 3.0)
+    with pytest.raises(ValueError):
+        stats.add_batch([2.0, "text"])
+    assert (stats.count, stats.total) == (2, 4.0)  # unchanged by the failed batch
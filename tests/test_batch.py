@@ -0,0 +1,109 @@
+"""
+This module contains tests for the columnar batch API, CommandHandler.execute_batch,
+checking that each vectorized kernel matches the row-by-row Command.execute results
+and reports invalid rows in the error mask instead of printing.
+"""
+from array import array
+import pytest
+from app import AddCommand, SubtractCommand, MultiplyCommand, DivideCommand
+from app.commands import CommandHandler, Command
+
+
+@pytest.fixture
+def handler():
+    '''CommandHandler with the arithmetic commands registered'''
+    command_handler = CommandHandler()
+    command_handler.Register_Command("add", AddCommand())
+    command_handler.Register_Command("subtract", SubtractCommand())
+    command_handler.Register_Command("multiply", MultiplyCommand())
+    command_handler.Register_Command("divide", DivideCommand())
+    return command_handler
+
+
+@pytest.mark.parametrize("name", ["add", "subtract", "multiply", "divide"])
+def test_batch_matches_execute(handler, name):
+    '''Each batch kernel gives the same per-row results as Execute_Command'''
+    columns = [["10", "7.5", "-3", "1e3"], [2, 0.5, 4, 8], array("d", [1, 3, 2, 0.25])]
+    result = handler.execute_batch(name, columns)
+    expected = [handler.Execute_Command(name, *row) for row in zip(*columns)]
+    assert result.values == expected
+    assert result.errors == [False] * 4
+    # Whole numbers are collapsed to int, like the single-row commands
+    assert all(isinstance(value, int) for value in result.values if float(value).is_integer())
+
+
+@pytest.mark.parametrize("backend", ["float", "decimal", "fraction", "auto", None])
+@pytest.mark.parametrize("name", ["add", "subtract", "multiply", "divide"])
+def test_batch_follows_the_backend(handler, name, backend):
+    '''Batches compute with the handler's backend, types and exact ints included'''
+    handler.use_backend(backend)
+    columns = [["0.1", "9007199254740993", "1e3", "7"], ["0.2", "3", "3", "-2"], [4, 5, 0.5, 3]]
+    result = handler.execute_batch(name, columns)
+    expected = [handler.Execute_Command(name, *row) for row in zip(*columns)]
+    assert result.values == expected and result.errors == [False] * 4
+    assert list(map(type, result.values)) == list(map(type, expected))
+
+
+def test_batch_float_kernels_only_where_exact(handler):
+    '''Float columns use the kernels; accurate sums and big ints are computed row by row'''
+    floats = [[1e16, 2.5], [1.0, 0.5], [-1e16, 1.0]]
+    assert handler.execute_batch("add", floats).values == [0, 4]
+    handler.Register_Command("add", AddCommand(accurate=True))
+    assert handler.execute_batch("add", floats).values == [1, 4]
+    big = [[2 ** 53 + 1], [3]]
+    assert handler.execute_batch("multiply", big).values == [(2 ** 53 + 1) * 3]
+    tiny = [[1.0], [1e-200], [1e-200]]
+    assert handler.execute_batch("divide", tiny).values == [handler.Execute_Command("divide", 1.0, 1e-200, 1e-200)]
+
+
+def test_batch_divide_by_zero_mask(handler, capsys):
+    '''Zero divisors are flagged per row without printing'''
+    result = handler.execute_batch("divide", [[10, 9, 8], [2, 0, 4], [1, 1, 0]])
+    assert result.values == [5, None, None]
+    assert result.errors == [False, True, True]
+    assert capsys.readouterr().out == ""
+
+
+def test_batch_divide_needs_two_columns(handler):
+    '''Division with a single column fails every row'''
+    result = handler.execute_batch("divide", [[1, 2]])
+    assert result.errors == [True, True]
+
+
+def test_batch_invalid_rows(handler):
+    '''Rows that do not parse as numbers are reported in the mask'''
+    result = handler.execute_batch("add", [["1", "x", "3"], ["1", "1", "1"]])
+    assert result.values == [2, None, 4]
+    assert result.errors == [False, True, False]
+
+
+def test_batch_length_mismatch(handler):
+    '''Columns of different lengths are rejected'''
+    with pytest.raises(ValueError):
+        handler.execute_batch("multiply", [[1, 2], [3]])
+
+
+def test_batch_unknown_command(handler):
+    '''An unknown command returns None'''
+    assert handler.execute_batch("power", [[1], [2]]) is None
+
+
+def test_batch_fallback_for_plain_commands(handler):
+    '''Commands without a kernel run row by row through execute'''
+    class Negate(Command):
+        '''Negates its only argument'''
+        def execute(self, *args):
+            return -float(args[0]) if args[0] != "skip" else None
+
+    handler.Register_Command("negate", Negate())
+    result = handler.execute_batch("negate", [["1", "skip"]])
+    assert result.values == [-1.0, None]
+    assert result.errors == [False, True]
+
+
+def test_batch_numpy_columns(handler):
+    '''NumPy columns are computed with vectorized ufuncs'''
+    numpy = pytest.importorskip("numpy")
+    result = handler.execute_batch("divide", [numpy.array([6.0, 1.0]), numpy.array([3.0, 0.0])])
+    assert result.values[0] == 2.0
+    assert list(result.errors) == [False, True]
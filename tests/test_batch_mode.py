@@ -0,0 +1,67 @@
+'''Tests for the streaming batch mode of main.py'''
+import io
+import main
+from app.batch_mode import run_batch, parse_lines
+
+
+def test_run_batch_in_order(command_handler):
+    '''Results come out one per command, in input order'''
+    lines = io.StringIO("add 1 2\n\n# comment\nmultiply 3 4 5\ndivide 9 4\nsubtract 10 1 2\n")
+    out, err = io.StringIO(), io.StringIO()
+    summary = run_batch(command_handler, lines, out, err)
+    assert out.getvalue() == "3\n60\n2.25\n7\n"
+    assert (summary.lines, summary.errors) == (4, 0)
+    assert err.getvalue() == ""
+
+
+def test_run_batch_reports_errors_with_line_numbers(command_handler, capsys):
+    '''Errors name their line and keep output aligned without printing'''
+    lines = io.StringIO("add 1 x\ndivide 1 0\npower 2 3\nADD 2 2\n")
+    out, err = io.StringIO(), io.StringIO()
+    summary = run_batch(command_handler, lines, out, err)
+    assert out.getvalue().splitlines() == [
+        "Error: Invalid input. Please enter numbers.",
+        "Error: Division by zero is not allowed.",
+        "Error: power: Command not found",
+        "4",
+    ]
+    assert err.getvalue().splitlines()[1] == "line 2: Division by zero is not allowed."
+    assert summary.errors == 3
+    assert capsys.readouterr().out == ""
+
+
+def test_parse_lines_is_lazy():
+    '''Lines are parsed one at a time from any iterable'''
+    def endless():
+        number = 0
+        while True:
+            number += 1
+            yield f"add {number} 1\n"
+    parsed = parse_lines(endless())
+    assert next(parsed) == (1, "add", ["1", "1"])
+    assert next(parsed) == (2, "add", ["2", "1"])
+
+
+def test_main_batch_file(tmp_path, capsys):
+    '''main --batch FILE prints results and a summary'''
+    source = tmp_path / "jobs.txt"
+    source.write_text("add 2 3\nmultiply 2 2\n")
+    assert main.main(["--batch", str(source)]) == 0
+    captured = capsys.readouterr()
+    assert captured.out == "5\n4\n"
+    assert "Processed 2 commands (0 errors)" in captured.err
+
+
+def test_main_batch_stdin(monkeypatch, capsys):
+    '''main --batch - reads commands from stdin'''
+    monkeypatch.setattr("sys.stdin", io.StringIO("divide 1 0\n"))
+    assert main.main(["--batch", "-"]) == 1
+    assert "line 1: Division by zero is not allowed." in capsys.readouterr().err
+
+
+def test_results_past_the_int_digit_limit(command_handler):
+    '''Exact results too long for str(int) are still written in full'''
+    operands = " ".join(["1" + "0" * 99] * 50)  # 10**4950, past the default 4300-digit limit
+    out, err = io.StringIO(), io.StringIO()
+    run_batch(command_handler, io.StringIO(f"multiply {operands}\n"), out, err)
+    assert out.getvalue() == "1" + "0" * 4950 + "\n"
@@ -0,0 +1,51 @@
+'''Tests for the benchmark suite's baselines and regression gating.'''
+import json
+
+import pytest
+
+from app.calculator.calculations import Calculations
+from benchmarks.suite import Comparison, compare, main, regressions, run_suite, save_results
+
+
+def results(**seconds):
+    '''A results document with the given seconds per benchmark'''
+    return {"meta": {}, "results": {name: {"seconds": value} for name, value in seconds.items()}}
+
+
+def test_compare_pairs_common_benchmarks():
+    '''Only benchmarks present in both documents are compared'''
+    comparisons = compare(results(fast=1.0, gone=2.0), results(fast=1.5, new=3.0))
+    assert comparisons == [Comparison("fast", 1.0, 1.5)]
+    assert comparisons[0].ratio == 1.5
+
+
+def test_regressions_respect_threshold():
+    '''A benchmark regresses only when it is slower by more than the threshold'''
+    comparisons = [Comparison("same", 1.0, 1.1), Comparison("slower", 1.0, 1.3), Comparison("faster", 1.0, 0.5)]
+    assert [c.name for c in regressions(comparisons, threshold=0.25)] == ["slower"]
+    assert regressions(comparisons, threshold=0.5) == []
+
+
+def test_compare_mode_exit_status(tmp_path, capsys):
+    '''compare exits non-zero on a regression beyond --threshold'''
+    save_results(str(tmp_path / "baseline.json"), results(dispatch=1e-6))
+    save_results(str(tmp_path / "current.json"), results(dispatch=1.4e-6))
+    args = ["compare", str(tmp_path / "baseline.json"), str(tmp_path / "current.json")]
+    assert main(args + ["--threshold", "0.25"]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    assert main(args + ["--threshold", "0.5"]) == 0
+
+
+@pytest.mark.slow
+def test_run_suite_and_save(tmp_path):
+    '''A scaled-down run covers every group and leaves the history backend alone'''
+    history = Calculations.history
+    document = run_suite(repeat=1, min_time=0.001, max_args=100, history_size=100)
+    assert Calculations.history is history
+    names = document["results"]
+    assert {"dispatch.execute_command", "command.divide.100", "calculator.add",
+            "calculations.find_by_result_range.100", "calculations.index_build.100"} <= set(names)
+    assert "command.add.10000" not in names
+    assert all(result["seconds"] > 0 for result in names.values())
+    save_results(str(tmp_path / "out" / "run.json"), document)
+    assert json.loads((tmp_path / "out" / "run.json").read_text())["results"] == names
@@ -0,0 +1,75 @@
+'''Tests for the Calculator memoization cache'''
+from decimal import Decimal, localcontext
+import pytest
+from app.calculator import Calculator
+from app.calculator.cache import OperationCache
+from app.calculator.calculations import Calculations
+from app.calculator.operations import add
+
+
+@pytest.fixture
+def cache():
+    '''Enable a small cache for one test'''
+    Calculations.clear_history()
+    yield Calculator.enable_cache(maxsize=2)
+    Calculator.disable_cache()
+    Calculations.clear_history()
+
+
+def test_hits_are_still_recorded_in_history(cache):
+    '''Cached results are returned and still appear in history'''
+    assert Calculator.add(Decimal('1'), Decimal('2')) == Decimal('3')
+    assert Calculator.add(Decimal('1'), Decimal('2')) == Decimal('3')
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(Calculations.get_history()) == 2
+
+
+def test_lru_eviction(cache):
+    '''The least recently used entry is evicted first'''
+    Calculator.multiply(Decimal('2'), Decimal('3'))
+    Calculator.multiply(Decimal('4'), Decimal('5'))
+    Calculator.multiply(Decimal('2'), Decimal('3'))  # refresh (2, 3)
+    Calculator.multiply(Decimal('6'), Decimal('7'))  # evicts (4, 5)
+    assert cache.stats()["evictions"] == 1
+    Calculator.multiply(Decimal('2'), Decimal('3'))
+    assert cache.hits == 2
+
+
+def test_key_includes_representation_and_context(cache):
+    '''Equal operands that print differently, and other precisions, miss'''
+    assert str(Calculator.add(Decimal('2'), Decimal('2'))) == '4'
+    assert str(Calculator.add(Decimal('2.0'), Decimal('2'))) == '4.0'
+    with localcontext() as context:
+        context.prec = 3
+        assert Calculator.divide(Decimal('1'), Decimal('3')) == Decimal('0.333')
+    assert Calculator.divide(Decimal('1'), Decimal('3')) != Decimal('0.333')
+    assert cache.hits == 0
+
+
+def test_errors_are_not_cached(cache):
+    '''Failing operations raise every time'''
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            Calculator.divide(Decimal('1'), Decimal('0'))
+    assert len(cache) == 0
+
+
+def test_ttl_expiry():
+    '''Entries older than the TTL count as misses'''
+    now = [0.0]
+    cache = OperationCache(maxsize=10, ttl=5, clock=lambda: now[0])
+    calls = []
+    compute = lambda: calls.append(1) or Decimal('3')
+    cache.lookup(add, Decimal('1'), Decimal('2'), compute)
+    now[0] = 4
+    cache.lookup(add, Decimal('1'), Decimal('2'), compute)
+    now[0] = 10
+    cache.lookup(add, Decimal('1'), Decimal('2'), compute)
+    assert len(calls) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_rejects_bad_size():
+    '''Cache size must be positive'''
+    with pytest.raises(ValueError):
+        OperationCache(maxsize=0)
@@ -0,0 +1,128 @@
+'''Stress tests for sharing a CommandHandler and the Calculations history between threads.'''
+from decimal import Decimal
+import sys
+import threading
+
+import pytest
+
+from app import register_commands
+from app.calculator import Calculator
+from app.calculator.calculations import Calculations
+from app.calculator.history import CompactHistory, ListHistory
+from app.commands import CommandHandler
+from benchmarks.bench_threads import run_threads
+
+THREADS = 16
+PER_THREAD = 2000
+
+
+@pytest.fixture(params=[ListHistory, lambda: CompactHistory(capacity=THREADS * PER_THREAD)], ids=["list", "compact"])
+def shared_history(request):
+    '''Each history backend in turn, empty.'''
+    previous = Calculations.history
+    Calculations.use_backend(request.param())
+    yield Calculations.history
+    Calculations.use_backend(previous)
+
+
+def run_all(target, count=THREADS):
+    '''Run target(worker) on count threads started together; re-raise the first failure.'''
+    barrier = threading.Barrier(count)
+    failures = []
+
+    def work(worker):
+        barrier.wait()
+        try:
+            target(worker)
+        except Exception as e:  # pylint: disable=broad-except
+            failures.append(e)
+
+    workers = [threading.Thread(target=work, args=(worker,)) for worker in range(count)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible to provoke races
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(interval)
+    if failures:
+        raise failures[0]
+
+
+def test_no_calculation_is_lost(shared_history):
+    '''Every thread's calculations reach history, each thread's in its own order'''
+    def work(worker):
+        for i in range(PER_THREAD):
+            Calculator.add(Decimal(worker), Decimal(i))
+            if i % 500 == 0:
+                Calculations.get_latest()  # readers merge buffers while others append
+
+    run_all(work)
+    history = Calculations.get_history()
+    assert len(history) == THREADS * PER_THREAD
+    for worker in range(THREADS):
+        assert [calc.b for calc in history if calc.a == worker] == [Decimal(i) for i in range(PER_THREAD)]
+    assert len(Calculations.find_by_operation("add")) == THREADS * PER_THREAD
+
+
+def test_queries_while_appending(shared_history):
+    '''Result range queries and reads racing flushes never repeat or drop a calculation'''
+    writers = THREADS // 4
+    finished = []
+    everything = (Decimal(-1), Decimal(THREADS * PER_THREAD * 2))
+
+    def distinct(calculations):
+        operands = [(calc.a, calc.b) for calc in calculations]
+        assert len(operands) == len(set(operands))
+        return len(operands)
+
+    def work(worker):
+        if worker < writers:
+            for i in range(PER_THREAD * 2):
+                Calculator.add(Decimal(worker), Decimal(i))
+            finished.append(worker)
+            return
+        while len(finished) < writers:
+            assert distinct(Calculations.find_by_result_range(*everything)) <= writers * PER_THREAD * 2
+            distinct(Calculations.get_history())
+
+    run_all(work, count=writers * 2)
+    assert distinct(Calculations.find_by_result_range(*everything)) == writers * PER_THREAD * 2
+    assert distinct(Calculations.get_history()) == writers * PER_THREAD * 2
+
+
+def test_buffers_of_finished_threads_are_merged(empty_history):
+    '''Entries buffered by a thread that has exited are still merged, then its buffer is dropped'''
+    worker = threading.Thread(target=Calculator.multiply, args=(Decimal(6), Decimal(7)))
+    worker.start()
+    worker.join()
+    assert Calculations.get_latest().perform() == 42
+    assert all(thread.is_alive() for thread, _ in Calculations._buffers)  # pylint: disable=protected-access
+
+
+def test_registration_while_executing():
+    '''Lookups never miss a stable command while others are registered and loaded concurrently'''
+    handler = register_commands(CommandHandler())
+    version = handler.version
+
+    def work(worker):
+        for i in range(200):
+            if worker % 4 == 0:
+                handler.register_lazy(f"extra{worker}_{i}", "app.commands.add:AddCommand")
+            assert handler.evaluate("add", "1", "2") == 3
+            assert handler.evaluate("multiply", "2", "3") == 6
+
+    run_all(work)
+    assert handler.version == version + 2 + THREADS // 4 * 200  # add and multiply loaded once each
+    names = handler.get_registered_commands()
+    assert len(names) == len(set(names))
+
+
+def test_thread_benchmark_counts_everything(empty_history):
+    '''The scaling benchmark finds every calculation in history'''
+    for threads in (1, 4):
+        run = run_threads(threads, 500)
+        assert run.recorded == threads * 500
+        assert run.operations_per_second > 0
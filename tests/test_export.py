@@ -0,0 +1,165 @@
+'''Tests for CSV, JSON Lines and columnar .npz history export and import.'''
+import ast
+from decimal import Decimal
+from fractions import Fraction
+import math
+import mmap
+import struct
+import zipfile
+
+import pytest
+
+from app.calculator import Calculator
+from app.calculator.calculation import Calculation
+from app.calculator.calculations import Calculations
+from app.calculator.export import (
+    ALIGNMENT, NPY_MAGIC, export_history, import_history, load_columns, main, read_history,
+)
+from app.calculator.history import CompactHistory
+from app.calculator.operations import add, divide, multiply, subtract
+
+
+def sample():
+    '''Calculations covering Fractions, long Decimals, unknown results and huge values.'''
+    known = [
+        Calculation(Decimal("1.5"), Decimal("2"), add, Decimal("3.5")),
+        Calculation(Decimal("0.12345678901234567890123"), Decimal("1"), multiply, Decimal("0.12345678901234567890123")),
+        Calculation(Fraction(1, 3), Fraction(1, 6), subtract, Fraction(1, 6)),
+        Calculation(Decimal("1E+400"), Decimal("-2"), multiply, Decimal("-2E+400")),
+    ]
+    return known + [Calculation(Decimal(6), Decimal(0), divide)]
+
+
+def as_rows(calculations):
+    return [(calc.operation, calc.a, calc.b, calc.perform() if calc.evaluated else None) for calc in calculations]
+
+
+@pytest.mark.parametrize("suffix", ["csv", "jsonl"])
+def test_text_formats_round_trip_exactly(tmp_path, suffix):
+    '''CSV and JSON Lines keep operands and results exactly, and unknown results unknown'''
+    path = str(tmp_path / f"history.{suffix}")
+    assert export_history(path, calculations=sample()) == 5
+    assert as_rows(read_history(path)) == as_rows(sample())
+    restored = list(read_history(path))
+    assert isinstance(restored[2].a, Fraction) and not restored[-1].evaluated
+
+
+def test_jsonl_writes_plain_numbers(tmp_path):
+    '''Decimals are written as JSON numbers; Fractions and unknown results are not'''
+    path = tmp_path / "history.jsonl"
+    export_history(str(path), calculations=sample())
+    lines = path.read_text().splitlines()
+    assert lines[0] == '{"operation": "add", "a": 1.5, "b": 2, "result": 3.5}'
+    assert '"a": "1/3"' in lines[2] and lines[4].endswith('"result": null}')
+
+
+def test_import_rejects_unknown_operations(tmp_path):
+    '''Import refuses operations it cannot map back to a function, and bad formats'''
+    path = tmp_path / "history.csv"
+    path.write_text("operation,a,b,result\npower,2,3,8\n")
+    with pytest.raises(ValueError, match="power"):
+        list(read_history(str(path)))
+    with pytest.raises(ValueError, match="format"):
+        export_history(str(tmp_path / "history.xml"), calculations=[])
+
+
+def test_npz_is_a_valid_aligned_numpy_archive(tmp_path):
+    '''Every member is stored, starts on a 64-byte boundary and carries a .npy v1.0 header'''
+    path = str(tmp_path / "history.npz")
+    export_history(path, calculations=sample())
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        infos = archive.infolist()
+        assert sorted(info.filename for info in infos) == ["a.npy", "b.npy", "operation.npy", "operations.npy", "result.npy"]
+    data = open(path, "rb").read()
+    for info in infos:
+        assert info.compress_type == zipfile.ZIP_STORED
+        name_length, extra_length = struct.unpack_from("<HH", data, info.header_offset + 26)
+        member = info.header_offset + 30 + name_length + extra_length
+        assert member % ALIGNMENT == 0 and data[member:member + 6] == NPY_MAGIC
+        header_length, = struct.unpack_from("<H", data, member + 8)
+        assert (10 + header_length) % ALIGNMENT == 0
+        header = ast.literal_eval(data[member + 10:member + 10 + header_length].decode("latin1"))
+        assert header["fortran_order"] is False
+
+
+def test_load_columns_maps_the_file(tmp_path):
+    '''Columns are memoryviews over the mapped file, and rebuild calculations on request'''
+    path = str(tmp_path / "history.npz")
+    export_history(path, calculations=sample())
+    with load_columns(path) as columns:
+        assert len(columns) == 5
+        assert isinstance(columns.a.obj, mmap.mmap)  # a view of the mapping, not a copy
+        assert columns.a.format == "d" and columns.operation.format == "B"
+        assert [columns.operation_names[code] for code in columns.operation] == [
+            "add", "multiply", "subtract", "multiply", "divide"]
+        assert columns.a[0] == 1.5 and columns.a[2] == 1 / 3
+        assert columns.result[3] == -math.inf and math.isnan(columns.result[4])
+        rebuilt = list(columns.calculations())
+        assert rebuilt[0].perform() == Decimal("3.5") and not rebuilt[4].evaluated
+    assert not columns.columns
+
+
+@pytest.mark.parametrize("suffix", ["csv", "jsonl"])
+def test_text_formats_from_compact_history(tmp_path, suffix):
+    '''A CompactHistory exports its stored results, exact ones included, and unknown ones as unknown'''
+    compact = CompactHistory(capacity=8)
+    known = sample()
+    for calculation in known:
+        compact.append(calculation)
+    compact.append(Calculation(Decimal("1.1"), Decimal("2"), add, Decimal("3.1")))
+    path = str(tmp_path / f"history.{suffix}")
+    assert export_history(path, calculations=compact) == 6
+    restored = list(read_history(path))
+    assert as_rows(restored[:-1]) == as_rows(known)
+    assert restored[-1].perform() == Decimal("3.1") and not restored[-2].evaluated
+
+
+def test_npz_from_compact_history(empty_history, tmp_path):
+    '''A CompactHistory exports its ring buffer arrays directly, oldest first'''
+    previous = Calculations.history
+    compact = CompactHistory(capacity=4)
+    Calculations.use_backend(compact)
+    try:
+        for i in range(6):
+            Calculator.add(Decimal(i), Decimal(1))
+        path = str(tmp_path / "history.npz")
+        assert export_history(path) == 4
+    finally:
+        Calculations.use_backend(previous)
+    with load_columns(path) as columns:
+        assert list(columns.a) == [2.0, 3.0, 4.0, 5.0]
+        assert list(columns.result) == [3.0, 4.0, 5.0, 6.0]
+
+
+def test_import_into_shared_history(empty_history, tmp_path):
+    '''import_history appends an export to Calculations'''
+    path = str(tmp_path / "history.jsonl")
+    export_history(path, calculations=sample())
+    assert import_history(path) == 5
+    assert len(Calculations.find_by_operation("multiply")) == 2
+
+
+def test_cli_exports_a_journal(empty_history, tmp_path, capsys):
+    '''The command line replays a journal, computes results and exports them'''
+    journal = str(tmp_path / "history.journal")
+    Calculator.open_journal(journal)
+    Calculator.add(Decimal(1), Decimal(2))
+    with pytest.raises(ValueError):
+        Calculator.divide(Decimal(1), Decimal(0))
+    Calculator.close_journal()
+    output = str(tmp_path / "history.csv")
+    main([journal, output])
+    assert "Exported 2 calculations" in capsys.readouterr().out
+    assert as_rows(read_history(output)) == [(add, 1, 2, 3), (divide, 1, 0, None)]
+
+
+def test_numpy_reads_the_export(tmp_path):
+    '''numpy.load reads the export as ordinary arrays'''
+    numpy = pytest.importorskip("numpy")
+    path = str(tmp_path / "history.npz")
+    export_history(path, calculations=sample())
+    with numpy.load(path) as archive:
+        assert archive["a"].dtype == numpy.float64 and list(archive["operations"]) == [
+            "add", "subtract", "multiply", "divide"]
+        assert archive["operation"].tolist() == [0, 2, 1, 2, 3]
@@ -0,0 +1,67 @@
+'''Tests for the expression compiler'''
+from decimal import Decimal, localcontext
+import pytest
+from app.calculator.expression import compile_expression, evaluate
+
+
+@pytest.mark.parametrize("text,bindings,value", [
+    ("(a + b) * c / d", {"a": 1, "b": 2, "c": 3, "d": 4}, Decimal("2.25")),
+    ("1 + 2 * 3", {}, Decimal("7")),
+    ("-x - -2", {"x": Decimal("0.5")}, Decimal("1.5")),
+    ("10 / 4 - 0.5", {}, Decimal("2")),
+    ("2e2 + .5", {}, Decimal("200.5")),
+])
+def test_evaluate(text, bindings, value):
+    '''Expressions follow the usual precedence rules'''
+    assert evaluate(text, **bindings) == value
+
+
+def test_constant_folding():
+    '''Constant sub-expressions are computed at compile time'''
+    plan = compile_expression("x * (2 + 3 * 4)")
+    assert len(plan.code) == 1
+    assert compile_expression("2 * (3 + 4)").code == []
+
+
+def test_common_subexpression_elimination():
+    '''Repeated sub-expressions run only once'''
+    plan = compile_expression("(a + b) * (a + b) - (a + b)")
+    assert len(plan.code) == 3
+    assert plan.evaluate(a=1, b=2) == Decimal("6")
+
+
+def test_compiled_plans_are_cached():
+    '''The same text reuses the same plan with new bindings'''
+    plan = compile_expression("rate * amount")
+    assert compile_expression("rate * amount") is plan
+    assert plan.evaluate(rate=Decimal("0.5"), amount=10) == Decimal("5.0")
+    assert plan.evaluate(rate=2, amount=3) == Decimal("6")
+
+
+def test_cache_respects_decimal_context():
+    '''Folding under another precision gives a separate plan'''
+    default = evaluate("1 / 3")
+    with localcontext() as context:
+        context.prec = 4
+        assert evaluate("1 / 3") == Decimal("0.3333")
+    assert evaluate("1 / 3") == default
+
+
+def test_division_by_zero_raises_at_evaluation():
+    '''Division by a zero constant is not folded and fails when evaluated'''
+    plan = compile_expression("x / (2 - 2)")
+    with pytest.raises(ValueError, match="Cannot divide by zero"):
+        plan.evaluate(x=1)
+
+
+@pytest.mark.parametrize("text", ["", "1 +", "(1 + 2", "1 $ 2", "1 2", ")"])
+def test_syntax_errors(text):
+    '''Malformed expressions raise ValueError'''
+    with pytest.raises(ValueError):
+        compile_expression(text)
+
+
+def test_missing_binding():
+    '''Unbound variables are reported by name'''
+    with pytest.raises(ValueError, match="'y'"):
+        evaluate("x + y", x=1)
@@ -0,0 +1,86 @@
+'''Tests for the compact, ring-buffer history backend'''
+from decimal import Decimal
+from fractions import Fraction
+import pytest
+from app.calculator import Calculator
+from app.calculator.calculation import Calculation
+from app.calculator.calculations import Calculations
+from app.calculator.history import CompactHistory, ListHistory
+from app.calculator.operations import add, subtract, divide
+
+
+@pytest.fixture
+def compact_history():
+    '''Install a small compact backend for the duration of a test'''
+    previous = Calculations.history
+    Calculations.use_backend(CompactHistory(capacity=3))
+    yield Calculations.history
+    Calculations.use_backend(previous)
+
+
+def test_calculation_has_no_dict():
+    '''Calculation uses __slots__'''
+    assert not hasattr(Calculation(Decimal('1'), Decimal('2'), add), '__dict__')
+
+
+def test_compact_round_trip(compact_history):
+    '''Calculations read back from the compact backend keep their values'''
+    Calculator.add(Decimal('10'), Decimal('5'))
+    Calculator.subtract(Decimal('0.1'), Decimal('-2.5'))
+    latest = Calculations.get_latest()
+    assert (latest.a, latest.b, latest.operation) == (Decimal('0.1'), Decimal('-2.5'), subtract)
+    assert [calc.perform() for calc in Calculations.get_history()] == [Decimal('15'), Decimal('2.6')]
+
+
+def test_compact_keeps_exact_operands(compact_history):
+    '''Operands a float cannot hold are kept exactly'''
+    precise = Decimal('1.23456789012345678901234567')
+    Calculations.add_calculation(Calculation(precise, Decimal('3'), add))
+    assert Calculations.get_latest().a == precise
+
+
+def test_compact_keeps_operands_beyond_float_range(compact_history):
+    '''Huge ints and Fractions are packed as their nearest float and kept exactly, without an OverflowError'''
+    huge = 10 ** 400
+    Calculations.add_calculation(Calculation(huge, 1, add, huge + 1))
+    Calculations.add_calculation(Calculation(Fraction(huge, 3), Fraction(-1, 3), subtract))
+    first, second = Calculations.get_history()
+    assert (first.a, first.b, first.perform()) == (huge, 1, huge + 1)
+    assert (second.a, second.b) == (Fraction(huge, 3), Fraction(-1, 3))
+    assert Calculations.history.results()[0] == float("inf")
+
+
+def test_compact_ring_buffer_eviction(compact_history):
+    '''The oldest entries are evicted once capacity is reached'''
+    for i in range(5):
+        Calculations.add_calculation(Calculation(Decimal(i), Decimal('1'), add if i % 2 else subtract))
+    assert [calc.a for calc in Calculations.get_history()] == [Decimal(2), Decimal(3), Decimal(4)]
+    assert len(Calculations.find_by_operation('subtract')) == 2
+    assert len(Calculations.find_by_operation('add')) == 1
+    assert Calculations.find_by_operation('power') == []
+
+
+def test_compact_failed_result_is_nan(compact_history):
+    '''A calculation that raises is stored with a NaN result'''
+    Calculations.add_calculation(Calculation(Decimal('1'), Decimal('0'), divide))
+    Calculations.flush()  # the backend is read directly, so merge the thread's buffer first
+    assert str(compact_history.results()[0]) == 'nan'
+
+
+def test_compact_clear_history(compact_history):
+    '''Clearing the compact backend empties it'''
+    Calculator.multiply(Decimal('2'), Decimal('3'))
+    Calculations.clear_history()
+    assert len(Calculations.get_history()) == 0
+    assert Calculations.get_latest() is None
+
+
+def test_compact_rejects_bad_capacity():
+    '''Capacity must be positive'''
+    with pytest.raises(ValueError):
+        CompactHistory(capacity=0)
+
+
+def test_default_backend_is_list():
+    '''The default backend stays a plain list'''
+    assert isinstance(Calculations.get_history(), ListHistory)
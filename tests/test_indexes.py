@@ -0,0 +1,79 @@
+'''Tests for the secondary indexes behind the Calculations queries'''
+from decimal import Decimal
+import pytest
+from app.calculator.calculation import Calculation
+from app.calculator.calculations import Calculations
+from app.calculator.history import CompactHistory
+from app.calculator.operations import add, subtract, multiply, divide
+
+
+@pytest.fixture
+def indexed_history():
+    """Clear history and add a known set of calculations."""
+    Calculations.clear_history()
+    for a, b, operation in [('10', '5', add), ('20', '3', subtract), ('4', '5', multiply),
+                            ('9', '0', divide), ('7', '7', add)]:
+        Calculations.add_calculation(Calculation(Decimal(a), Decimal(b), operation))
+    yield
+    Calculations.clear_history()
+
+
+def test_find_by_result_range(indexed_history):
+    """Range queries return matches ordered by result"""
+    results = [calc.perform() for calc in Calculations.find_by_result_range(Decimal('14'), Decimal('20'))]
+    assert results == [Decimal('14'), Decimal('15'), Decimal('17'), Decimal('20')]
+    assert Calculations.find_by_result_range(100, 200) == []
+
+
+def test_find_by_operand(indexed_history):
+    """Operand lookups match either operand without duplicates"""
+    assert [(c.a, c.b) for c in Calculations.find_by_operand(Decimal('5'))] == [(10, 5), (4, 5)]
+    assert len(Calculations.find_by_operand(7)) == 1
+
+
+def test_index_maintained_on_insert(indexed_history):
+    """Inserts after the index is built are visible to queries"""
+    assert len(Calculations.find_by_operation('add')) == 2
+    Calculations.add_calculation(Calculation(Decimal('1'), Decimal('1'), add))
+    assert len(Calculations.find_by_operation('add')) == 3
+    assert Calculations.find_by_result_range(2, 2)[0].a == 1
+
+
+def test_index_consistent_after_clear(indexed_history):
+    """clear_history empties the indexes too"""
+    assert Calculations.find_by_operand(Decimal('5'))
+    Calculations.clear_history()
+    assert Calculations.find_by_operand(Decimal('5')) == []
+    Calculations.add_calculation(Calculation(Decimal('5'), Decimal('2'), multiply))
+    assert [c.perform() for c in Calculations.find_by_result_range(0, 100)] == [Decimal('10')]
+
+
+def test_find_by_sequence(indexed_history):
+    """Sequence ranges return calculations in insertion order"""
+    assert [c.a for c in Calculations.find_by_sequence(1, 3)] == [Decimal('20'), Decimal('4')]
+
+
+def test_index_skips_evicted_entries():
+    """Entries evicted from a ring buffer drop out of every index"""
+    previous = Calculations.history
+    Calculations.use_backend(CompactHistory(capacity=2))
+    try:
+        for i in range(4):
+            Calculations.add_calculation(Calculation(Decimal(i), Decimal('1'), add))
+            assert Calculations.find_by_operation('add')  # build the index early
+        assert [c.a for c in Calculations.find_by_operation('add')] == [Decimal(2), Decimal(3)]
+        assert Calculations.find_by_operand(Decimal(0)) == []
+        assert [c.a for c in Calculations.find_by_result_range(0, 10)] == [Decimal(2), Decimal(3)]
+        assert [c.a for c in Calculations.find_by_sequence(0, 10)] == [Decimal(2), Decimal(3)]
+    finally:
+        Calculations.use_backend(previous)
+
+
+def test_result_index_merges_batches_in_order(indexed_history):
+    """Results inserted between range queries are merged into the sorted index"""
+    assert len(Calculations.find_by_result_range(0, 100)) == 4
+    for value in ('50', '1', '30', '12'):
+        Calculations.add_calculation(Calculation(Decimal(value), Decimal('0'), add))
+    results = [calc.perform() for calc in Calculations.find_by_result_range(0, 100)]
+    assert results == sorted(results) and len(results) == 8
+    assert not Calculations.index.unsorted
@@ -0,0 +1,152 @@
+'''Tests for the append-only calculation journal'''
+from decimal import Decimal
+from fractions import Fraction
+import os
+import pytest
+from app.calculator import Calculator
+from app.calculator.calculation import Calculation
+from app.calculator.calculations import Calculations
+from app.calculator.history import CompactHistory
+from app.calculator.journal import Journal, replay, main
+from app.calculator.operations import add, multiply, subtract
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    '''Path of a fresh journal file; the journal is detached afterwards'''
+    Calculations.clear_history()
+    yield str(tmp_path / "history.journal")
+    Calculator.close_journal()
+    Calculations.clear_history()
+
+
+def test_calculator_history_survives_restart(journal_path):
+    '''Calculations performed with a journal open are replayed on the next start'''
+    assert Calculator.open_journal(journal_path) == 0
+    Calculator.add(Decimal('1.10'), Decimal('2'))
+    Calculator.subtract(Decimal('5'), Decimal('0.000000000000000000001'))
+    Calculator.close_journal()
+
+    Calculations.clear_history()
+    assert Calculator.open_journal(journal_path) == 2
+    history = Calculations.get_history()
+    assert [(c.a, c.b, c.operation) for c in history] == [
+        (Decimal('1.10'), Decimal('2'), add),
+        (Decimal('5'), Decimal('1E-21'), subtract),
+    ]
+    assert str(history[0].a) == '1.10'
+
+
+def test_group_commit(journal_path):
+    '''Records are only written once a group fills or the journal is flushed'''
+    journal = Journal(journal_path, sync="never", group_size=3)
+    for i in range(2):
+        journal.append(Calculation(Decimal(i), Decimal('1'), add))
+    assert list(replay(journal_path)) == []
+    journal.append(Calculation(Decimal('2'), Decimal('1'), add))
+    assert len(list(replay(journal_path))) == 3
+    journal.close()
+
+
+def test_torn_tail_is_ignored_and_truncated(journal_path):
+    '''A partial record at the end is dropped by replay and cut off on reopen'''
+    journal = Journal(journal_path, sync="always")
+    journal.append(Calculation(Decimal('1'), Decimal('2'), add))
+    journal.close()
+    with open(journal_path, "ab") as file:
+        file.write(b"\x20\x00\x00\x00garbage")
+    assert len(list(replay(journal_path))) == 1
+
+    journal = Journal(journal_path)
+    journal.append(Calculation(Decimal('3'), Decimal('4'), add))
+    journal.close()
+    assert [c.a for c in replay(journal_path)] == [Decimal('1'), Decimal('3')]
+
+
+def test_corrupt_record_stops_replay(journal_path):
+    '''A frame whose checksum does not match ends replay'''
+    journal = Journal(journal_path, group_size=1)  # one frame per record
+    journal.append(Calculation(Decimal('1'), Decimal('2'), add))
+    journal.append(Calculation(Decimal('3'), Decimal('4'), add))
+    journal.close()
+    data = bytearray(open(journal_path, "rb").read())
+    data[-1] ^= 0xFF
+    open(journal_path, "wb").write(bytes(data))
+    assert len(list(replay(journal_path))) == 1
+
+
+def test_compaction(journal_path, capsys):
+    '''Compaction rewrites the journal to the current history'''
+    Calculator.open_journal(journal_path)
+    for i in range(5):
+        Calculator.add(Decimal(i), Decimal('1'))
+    Calculations.clear_history()
+    Calculator.multiply(Decimal('6'), Decimal('7'))
+    Calculator.compact_journal()
+    Calculator.add(Decimal('8'), Decimal('9'))
+    Calculator.close_journal()
+    assert [c.a for c in replay(journal_path)] == [Decimal('6'), Decimal('8')]
+
+    main(["compact", journal_path, "--keep", "1"])
+    assert [c.a for c in replay(journal_path)] == [Decimal('8')]
+    assert "1 calculations" in capsys.readouterr().out
+
+
+def test_invalid_sync_policy(journal_path):
+    '''Unknown sync policies are rejected'''
+    with pytest.raises(ValueError):
+        Journal(journal_path, sync="sometimes")
+
+
+def test_not_a_journal(tmp_path):
+    '''Files without the journal header are rejected'''
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a journal at all")
+    with pytest.raises(ValueError):
+        list(replay(str(path)))
+
+
+def test_operands_come_back_exactly(journal_path):
+    '''Packed and text operands alike come back with the same type and digits'''
+    operands = [
+        (Decimal("1.10"), Decimal("2")), (Decimal("1E+2"), Decimal("-0")), (7, Decimal("0.1")),
+        (Decimal("0.12345678901234567890123"), Fraction(1, 3)), (Decimal("NaN"), Decimal("-Infinity")),
+    ]
+    journal = Journal(journal_path)
+    for a, b in operands:
+        journal.append(Calculation(a, b, multiply))
+    journal.close()
+    restored = [(calc.a, calc.b) for calc in replay(journal_path)]
+    assert list(map(str, sum(restored, ()))) == list(map(str, sum(operands, ())))
+    assert isinstance(restored[3][1], Fraction)
+    # Plain Decimals are packed as binary64, not written as text
+    journal = Journal(journal_path)
+    journal.compact(Calculation(Decimal(i) / 4, Decimal(i), add) for i in range(1000))
+    journal.close()
+    assert os.path.getsize(journal_path) < 1000 * 18
+
+
+def test_overlong_operands_are_rejected(journal_path, monkeypatch):
+    '''An operand too long for an exact row raises ValueError and queues nothing'''
+    monkeypatch.setattr("app.calculator.journal.MAX_OPERAND_LENGTH", 20)
+    journal = Journal(journal_path)
+    with pytest.raises(ValueError, match="too long to journal"):
+        journal.append(Calculation(Decimal("1." + "1" * 20), Decimal(1), add))
+    journal.append(Calculation(Decimal("1." + "1" * 18), Decimal(2), add))
+    journal.close()
+    assert [calc.b for calc in replay(journal_path)] == [Decimal(2)]
+
+
+def test_bounded_history_replays_its_tail(journal_path):
+    '''A CompactHistory is loaded with the newest calculations it can hold'''
+    journal = Journal(journal_path, group_size=7)
+    journal.compact(Calculation(Decimal(i), Decimal(1), add) for i in range(10_000))
+    journal.close()
+    previous = Calculations.history
+    Calculations.use_backend(CompactHistory(capacity=100))
+    try:
+        assert Calculator.open_journal(journal_path) == 100
+        assert [calc.a for calc in Calculations.get_history()] == [Decimal(i) for i in range(9_900, 10_000)]
+        assert Calculations.summary()["pending"] == 100
+    finally:
+        Calculations.use_backend(previous)
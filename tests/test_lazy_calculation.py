@@ -0,0 +1,73 @@
+'''Tests for lazy, result-caching Calculation objects'''
+from decimal import Decimal
+import pickle
+import pytest
+from app.calculator import Calculator
+from app.calculator.calculation import Calculation, PENDING
+from app.calculator.calculations import Calculations
+from app.calculator.operations import divide
+
+
+def counting(calls):
+    '''Operation that records how often it runs'''
+    def operation(a, b):
+        calls.append((a, b))
+        return a + b
+    return operation
+
+
+def test_perform_computes_once():
+    '''The operation runs on the first perform() only'''
+    calls = []
+    calc = Calculation(Decimal('1'), Decimal('2'), counting(calls))
+    assert not calc.evaluated
+    assert calc.perform() == calc.perform() == Decimal('3')
+    assert len(calls) == 1
+    assert calc.evaluated
+
+
+def test_supplied_result_is_not_recomputed():
+    '''A result passed to the constructor is returned as is'''
+    calls = []
+    calc = Calculation(Decimal('1'), Decimal('2'), counting(calls), Decimal('3'))
+    assert calc.perform() == Decimal('3')
+    assert not calls
+
+
+def test_errors_are_not_cached():
+    '''A failing operation raises on every call and stays unevaluated'''
+    calc = Calculation(Decimal('1'), Decimal('0'), divide)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            calc.perform()
+    assert not calc.evaluated
+
+
+def test_calculator_records_evaluated_calculations():
+    '''History entries from Calculator already hold their result'''
+    Calculations.clear_history()
+    assert Calculator.multiply(Decimal('3'), Decimal('4')) == Decimal('12')
+    assert Calculations.get_latest().evaluated
+    with pytest.raises(ValueError):
+        Calculator.divide(Decimal('1'), Decimal('0'))
+    assert Calculations.get_latest().b == Decimal('0')
+    Calculations.clear_history()
+
+
+def test_deferred_calculations_evaluate_on_access():
+    '''Calculator.defer records work that only runs when read'''
+    Calculations.clear_history()
+    calls = []
+    deferred = [Calculator.defer(Decimal(i), Decimal('1'), counting(calls)) for i in range(5)]
+    assert not calls
+    assert deferred[2].perform() == Decimal('3')
+    assert len(calls) == 1
+    assert [calc.evaluated for calc in Calculations.get_history()] == [False, False, True, False, False]
+    Calculations.clear_history()
+
+
+def test_pending_marker_survives_pickling():
+    '''Unevaluated calculations stay unevaluated after a pickle round trip'''
+    calc = pickle.loads(pickle.dumps(Calculation(Decimal('1'), Decimal('2'), divide)))
+    assert calc._result is PENDING  # pylint: disable=protected-access
+    assert calc.perform() == Decimal('0.5')
@@ -0,0 +1,77 @@
+'''Tests for the central queue-based logging setup'''
+import logging
+from logging.handlers import QueueHandler
+import pytest
+from app import command_handler
+from app.logging_setup import configure_logging, shutdown_logging, set_operation_sampling, sample_operation
+
+
+@pytest.fixture
+def log_config(tmp_path, monkeypatch):
+    '''A logging.conf that writes to a file in a temporary directory'''
+    monkeypatch.chdir(tmp_path)
+    config = tmp_path / "logging.conf"
+    config.write_text(
+        "[loggers]\nkeys=root\n\n[handlers]\nkeys=fileHandler\n\n[formatters]\nkeys=simple\n\n"
+        "[logger_root]\nlevel=INFO\nhandlers=fileHandler\n\n"
+        "[handler_fileHandler]\nclass=FileHandler\nlevel=INFO\nformatter=simple\nargs=('logs/test.log', 'a')\n\n"
+        "[formatter_simple]\nformat=%(name)s - %(message)s\n"
+    )
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    yield str(config), tmp_path / "logs" / "test.log"
+    shutdown_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    for handler in saved_handlers:
+        root.addHandler(handler)
+    root.setLevel(saved_level)
+
+
+def test_configure_once_and_log_through_queue(log_config):
+    '''The config is loaded once and records reach the file via the listener'''
+    path, log_file = log_config
+    listener = configure_logging(path)
+    assert configure_logging(path) is listener
+    root_handlers = logging.getLogger().handlers
+    assert len(root_handlers) == 1 and isinstance(root_handlers[0], QueueHandler)
+    command_handler.Execute_Command("add", "1", "2")
+    shutdown_logging()
+    assert "app.commands.operations - Executing command: add with arguments: ('1', '2')" in log_file.read_text()
+
+
+def test_arguments_are_not_formatted_when_disabled():
+    '''Per-operation log arguments are only formatted when the record is emitted'''
+    formatted = []
+
+    class Spy(str):
+        '''String that notes when it is rendered'''
+        def __repr__(self):
+            formatted.append(1)
+            return str.__repr__(self)
+
+    operations = logging.getLogger("app.commands.operations")
+    saved = operations.level
+    operations.setLevel(logging.WARNING)
+    try:
+        assert command_handler.Execute_Command("add", Spy("1"), "2") == 3
+    finally:
+        operations.setLevel(saved)
+    assert not formatted
+
+
+def test_operation_sampling():
+    '''Sampling lets every n-th operation through'''
+    set_operation_sampling(3)
+    try:
+        assert [sample_operation() for _ in range(7)] == [True, False, False, True, False, False, True]
+    finally:
+        set_operation_sampling(None)
+    assert all(sample_operation() for _ in range(3))
+
+
+def test_sampling_rejects_bad_interval():
+    '''Sampling intervals must be positive'''
+    with pytest.raises(ValueError):
+        set_operation_sampling(0)
@@ -0,0 +1,121 @@
+'''Tests for per-command metrics and the stats command.'''
+import io
+import json
+import random
+
+import main
+from app import register_commands
+from app.batch_mode import run_batch
+from app.commands import CommandHandler
+from app.metrics import LatencyHistogram, MetricsRecorder, bucket_index, bucket_upper, prometheus_text
+
+
+def test_buckets_bound_values_tightly():
+    '''Every value lands in a bucket whose upper edge is within about 3% of it'''
+    rng = random.Random(7)
+    for value in list(range(300)) + [rng.randrange(10 ** 12) for _ in range(2000)]:
+        upper = bucket_upper(bucket_index(value))
+        assert value <= upper <= value * 1.032 + 1
+
+
+def test_histogram_percentiles():
+    '''Percentiles come from the bucket edges and never exceed the maximum'''
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    for value in range(1, 1001):
+        histogram.record(value * 1000)
+    assert abs(histogram.percentile(50) - 500_000) / 500_000 < 0.032
+    assert abs(histogram.percentile(99) - 990_000) / 990_000 < 0.032
+    assert histogram.percentile(99.9) <= histogram.percentile(100) == 1_000_000
+
+
+def test_metrics_disabled_by_default():
+    '''A plain handler records nothing'''
+    handler = register_commands(CommandHandler())
+    handler.Execute_Command("add", "1", "2")
+    assert handler.recorder is None and handler.metrics() == {}
+
+
+def test_execute_and_evaluate_are_counted(capsys):
+    '''Calls, errors and latency are recorded per command'''
+    handler = register_commands(CommandHandler())
+    handler.enable_metrics()
+    handler.Execute_Command("add", "1", "2")
+    handler.Execute_Command("add", "1", "x")
+    handler.Execute_Command("power", "2", "3")
+    try:
+        handler.evaluate("divide", "1", "0")
+    except ValueError:
+        pass
+    metrics = handler.metrics()
+    assert set(metrics) == {"add", "divide"}
+    assert (metrics["add"]["calls"], metrics["add"]["errors"]) == (2, 1)
+    assert (metrics["divide"]["calls"], metrics["divide"]["errors"]) == (1, 1)
+    assert 0 < metrics["add"]["p50"] <= metrics["add"]["p999"] <= metrics["add"]["max_seconds"]
+    handler.disable_metrics()
+    assert handler.metrics() == {}
+    capsys.readouterr()
+
+
+def test_prometheus_text():
+    '''The dump uses counters and a summary per command'''
+    text = prometheus_text({"add": {"calls": 3, "errors": 1, "total_seconds": 0.5,
+                                    "p50": 0.1, "p99": 0.2, "p999": 0.3}})
+    assert 'calculator_command_calls_total{command="add"} 3' in text
+    assert 'calculator_command_errors_total{command="add"} 1' in text
+    assert 'calculator_command_latency_seconds{command="add",quantile="0.999"} 0.300000000' in text
+    assert 'calculator_command_latency_seconds_count{command="add"} 3' in text
+
+
+def test_stats_in_batch_mode(tmp_path):
+    '''stats answers with one JSON line, or writes the Prometheus dump'''
+    handler = main.build_command_handler()
+    dump = tmp_path / "metrics.prom"
+    out, err = io.StringIO(), io.StringIO()
+    run_batch(handler, io.StringIO(f"add 1 2\nmultiply 2 x\nstats\nstats {dump}\n"), out, err)
+    lines = out.getvalue().splitlines()
+    stats = json.loads(lines[2])
+    assert stats["add"]["calls"] == 1 and stats["multiply"]["errors"] == 1
+    assert lines[3] == f"Metrics written to {dump}"
+    assert 'calculator_command_calls_total{command="stats"} 1' in dump.read_text()
+
+
+def test_stats_file_must_be_a_path():
+    '''A pipeline feeding stats a number gets a usage error, not a TypeError from the file write'''
+    handler = main.build_command_handler()
+    out, err = io.StringIO(), io.StringIO()
+    run_batch(handler, io.StringIO("add 1 2 | stats\n"), out, err)
+    assert out.getvalue() == "Error: Usage: stats [FILE], where FILE is a path, not 3\n"
+
+
+def test_stats_in_repl(monkeypatch, capsys):
+    '''The REPL prints the stats table'''
+    inputs = iter(["add", "2 3", "stats", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(inputs))
+    main.repl(main.build_command_handler())
+    output = capsys.readouterr().out
+    assert "calls" in output and "p999" in output
+    assert any(line.startswith("add ") for line in output.splitlines())
+
+
+def test_stats_with_metrics_disabled(tmp_path, capsys):
+    '''--no-metrics turns stats into an error and skips the metrics file'''
+    source = tmp_path / "jobs.txt"
+    source.write_text("add 1 1\nstats\n")
+    assert main.main(["--batch", str(source), "--no-metrics", "--metrics-file", str(tmp_path / "m.prom")]) == 1
+    assert "Error: Metrics are disabled." in capsys.readouterr().out
+    assert not (tmp_path / "m.prom").exists()
+
+
+def test_recorders_merge():
+    '''Merged recorders add calls, errors, totals and histograms'''
+    first, second = MetricsRecorder(), MetricsRecorder()
+    first.record("add", 1000, False)
+    second.record("add", 3000, True)
+    second.record("divide", 10, False)
+    first.merge(second.take())
+    assert second.commands == {}
+    snapshot = first.snapshot()
+    assert snapshot["add"]["calls"] == 2 and snapshot["add"]["errors"] == 1
+    assert snapshot["add"]["total_seconds"] == 4e-6 and snapshot["add"]["max_seconds"] == 3e-6
+    assert snapshot["add"]["p50"] <= 1.1e-6 and snapshot["divide"]["calls"] == 1
@@ -0,0 +1,152 @@
+'''Tests for the pluggable numeric backends.'''
+from decimal import MAX_EMAX, MAX_PREC, Context, Decimal
+from fractions import Fraction
+import math
+
+import pytest
+
+from app import register_commands
+from app.calculator import Calculator
+from app.calculator.calculations import Calculations
+from app.calculator.journal import replay
+from app.commands import CommandHandler
+from app.numeric import BACKENDS, AutoBackend, DecimalBackend, FractionBackend, NumericBackend, get_backend
+from benchmarks.bench_backends import compare_backends, workloads
+from benchmarks.bench_bignum import compare_reductions, tokens
+
+
+@pytest.fixture
+def calculator_backend():
+    '''Resets the Calculator's backend and history around a test.'''
+    Calculations.clear_history()
+    yield Calculator
+    Calculator.use_backend(None)
+    Calculations.clear_history()
+
+
+def test_backend_results():
+    '''Each backend computes in its own number type'''
+    tokens = ["0.1", "0.2"]
+    assert get_backend("float").add(tokens) == 0.30000000000000004
+    assert get_backend("decimal").add(tokens) == Decimal("0.3")
+    assert get_backend("fraction").add(tokens) == Fraction(3, 10)
+    assert get_backend("fraction").divide(["1", "3", "1/3"]) == 1
+    assert get_backend("auto").add(["9007199254740993", "1"]) == 9007199254740994
+    assert get_backend("float").subtract(["10", "2.5", "0.5"]) == 7
+    assert DecimalBackend(Context(prec=5)).divide(["1", "3"]) == Decimal("0.33333")
+
+
+def test_auto_multiply_stays_exact():
+    '''auto keeps integer products exact past 64 bits; only a float operand makes them float'''
+    operand = 12345678901234567890
+    auto = AutoBackend()
+    assert auto.multiply([str(operand)] * 3) == operand ** 3
+    assert auto.multiply((operand, operand, operand)) == 1881676372353657772490265749424677022198701224860897069000
+    assert auto.multiply([str(operand), str(operand), "1.5"]) == int(float(operand) * float(operand) * 1.5)
+
+
+def test_backend_errors():
+    '''Every backend reports bad input with the commands' messages'''
+    for name in BACKENDS:
+        backend = get_backend(name)
+        with pytest.raises(ValueError, match="Invalid input"):
+            backend.add(["1", "two"])
+        with pytest.raises(ValueError, match="Division by zero"):
+            backend.divide(["1", "0"])
+        with pytest.raises(ValueError, match="at least two"):
+            backend.divide(["1"])
+    with pytest.raises(ValueError, match="Unknown numeric backend"):
+        get_backend("complex")
+    with pytest.raises(ValueError, match="precision"):
+        get_backend("float", precision=10)
+    with pytest.raises(TypeError, match="convert"):
+        NumericBackend()  # abstract: a backend must say how it converts operands
+
+
+def test_handler_backend_reaches_every_command():
+    '''use_backend applies to loaded commands and to lazy ones as they load'''
+    handler = register_commands(CommandHandler())
+    assert handler.evaluate("add", "0.1", "0.2") == 0.30000000000000004
+    handler.use_backend("fraction")
+    assert handler.evaluate("add", "0.1", "0.2") == Fraction(3, 10)
+    assert handler.evaluate("divide", "1", "3") == Fraction(1, 3)
+    handler.use_backend(get_backend("decimal", precision=4))
+    assert handler.evaluate("multiply", "1.23456", "1") == Decimal("1.235")
+    handler.use_backend(None)
+    assert handler.evaluate("divide", "1", "4") == 0.25
+    assert register_commands(CommandHandler()).evaluate("add", "0.1", "0.2") == 0.30000000000000004
+
+
+def test_accurate_commands_keep_auto_default():
+    '''Without a backend, add keeps its accurate flag; AutoBackend matches it'''
+    handler = CommandHandler()
+    handler.register_lazy("add", "app.commands.add:AddCommand", True)
+    assert handler.evaluate("add", *["0.1"] * 10) == 1
+    assert AutoBackend(accurate=True).add(["0.1"] * 10) == 1
+
+
+def test_calculator_backend(calculator_backend, tmp_path):
+    '''The Calculator coerces operands with its backend, and the journal keeps Fractions'''
+    calculator_backend.use_backend("fraction")
+    assert calculator_backend.divide(1, 3) == Fraction(1, 3)
+    calculator_backend.use_backend(DecimalBackend(Context(prec=3)))
+    assert calculator_backend.divide(Decimal(2), Decimal(3)) == Decimal("0.667")
+    calculator_backend.use_backend("float")
+    assert calculator_backend.add(Decimal("0.5"), 1) == 1.5
+
+    calculator_backend.use_backend("fraction")
+    path = str(tmp_path / "fractions.journal")
+    calculator_backend.open_journal(path)
+    try:
+        calculator_backend.add("1/3", "1/6")
+    finally:
+        calculator_backend.close_journal()
+    (calculation,) = replay(path)
+    assert (calculation.a, calculation.b, calculation.perform()) == (Fraction(1, 3), Fraction(1, 6), Fraction(1, 2))
+
+
+def test_backend_benchmark_reports_accuracy():
+    '''The benchmark measures every backend and the exact ones have no error'''
+    tokens = workloads(50)
+    results = compare_backends({"add:decimal": tokens["decimal"]}, repeat=1)
+    errors = {row.backend: row.relative_error for row in results}
+    assert set(errors) == set(BACKENDS)
+    assert errors["fraction"] == 0 and errors["decimal"] == 0
+    assert all(row.operands_per_second > 0 for row in results)
+    assert FractionBackend().add(tokens["decimal"]) == sum(map(Fraction, tokens["decimal"]))
+
+
+def test_exact_backends_reduce_wide_operands_as_trees():
+    """Wide exact operands take the product tree and pairwise paths with unchanged results"""
+    operands = tokens(3 * 4096 + 5, 20)
+    exact = math.prod(map(int, operands))
+    decimal = DecimalBackend(Context(prec=MAX_PREC, Emax=MAX_EMAX))
+    with decimal.context():
+        assert decimal.wide(list(map(Decimal, operands[:100])))
+    assert not DecimalBackend().wide(list(map(Decimal, operands[:100])))  # 28 digits never grow
+    assert decimal.multiply(operands) == exact
+    assert FractionBackend().multiply(operands) == exact
+    fractions = [f"{i}/{i + 1}" for i in range(1, 2000)]
+    assert FractionBackend().add(fractions) == sum(Fraction(i, i + 1) for i in range(1, 2000))
+    assert FractionBackend().subtract(["1"] + fractions) == 1 - sum(Fraction(i, i + 1) for i in range(1, 2000))
+    assert DecimalBackend(Context(prec=5)).multiply(["1.23456", "2", "3"]) == Decimal("7.4076")  # rounded at every step, as before
+
+
+def test_backends_divide_once():
+    """Divisors are multiplied first: Decimals are rounded once, Fractions reduced once per chunk"""
+    assert DecimalBackend(Context(prec=5)).divide(["2", "3", "7"]) == Decimal("0.095238")  # 0.095239 in turn
+    assert DecimalBackend(Context(prec=5, Emin=-10)).divide(["1"] + ["1E+9"] * 4 + ["1E-9"] * 4) == 1
+    assert FractionBackend().divide(["1/2", "3/4", "-5/6"]) == Fraction(-4, 5)
+    assert FractionBackend().divide(["1"] + [f"{k}/{k + 1}" for k in range(1, 10_000)]) == 10_000
+    assert get_backend("float").divide(["1"] + ["1e200"] * 3 + ["1e-200"] * 3) == pytest.approx(1)
+    for backend in BACKENDS.values():
+        with pytest.raises(ValueError, match="Division by zero"):
+            backend().divide(iter(["1", "2", "0"]))
+
+
+def test_bignum_benchmark_reports_every_strategy():
+    """The big-number benchmark times folds, trees and backends, skipping long folds"""
+    rows = compare_reductions(tokens(50, 20), fold_limit=10)
+    assert {(row.number_type, row.strategy) for row in rows} >= {("int", "tree"), ("decimal", "backend")}
+    assert all(row.seconds is None for row in rows if row.strategy == "fold" and row.operation == "multiply")
+    assert all(row.seconds is not None for row in rows if row.operation == "add")
@@ -0,0 +1,80 @@
+'''Tests for the process-pool ParallelExecutor'''
+from decimal import Decimal
+import io
+import pytest
+import main
+from app.batch_mode import run_batch
+from app.calculator import Calculator
+from app.calculator.calculations import Calculations
+from app.commands import Command, CommandHandler
+from app.parallel import ParallelExecutor
+
+pytestmark = pytest.mark.slow
+
+
+class RecordingAdd(Command):
+    '''Adds two numbers through Calculator so the result lands in history'''
+    def execute(self, *args):
+        return Calculator.add(Decimal(args[0]), Decimal(args[1]))
+
+
+def recording_handler():
+    '''Worker handler whose command records into Calculations'''
+    handler = CommandHandler()
+    handler.Register_Command("add", RecordingAdd())
+    return handler
+
+
+def test_results_keep_input_order():
+    '''Results come back in input order across chunks and workers'''
+    invocations = (("multiply", (str(i), "2")) for i in range(500))
+    with ParallelExecutor(max_workers=2, chunk_size=7) as executor:
+        results = list(executor.map(invocations))
+    assert results == [(i * 2, None) for i in range(500)]
+
+
+def test_errors_are_reported_per_invocation():
+    '''Failures come back as error messages instead of raising'''
+    with ParallelExecutor(max_workers=2, chunk_size=2) as executor:
+        results = list(executor.map([("divide", ("1", "0")), ("nope", ()), ("add", ("1", "1"))]))
+    assert results == [(None, "Division by zero is not allowed."), (None, "nope: Command not found"), (2, None)]
+
+
+def test_worker_history_is_merged():
+    '''Calculations recorded by workers are merged into the parent history in order'''
+    Calculations.clear_history()
+    invocations = [("add", (str(i), "1")) for i in range(20)]
+    with ParallelExecutor(max_workers=2, chunk_size=3, handler_factory=recording_handler) as executor:
+        results = [result for result, _ in executor.map(invocations)]
+    assert results == [Decimal(i + 1) for i in range(20)]
+    assert [calc.a for calc in Calculations.get_history()] == [Decimal(i) for i in range(20)]
+    Calculations.clear_history()
+
+
+def test_batch_mode_with_executor():
+    '''Batch mode keeps line numbers and order when evaluated in parallel'''
+    lines = io.StringIO("".join(f"add {i} {i}\n" for i in range(50)) + "divide 1 0\n")
+    out, err = io.StringIO(), io.StringIO()
+    with ParallelExecutor(max_workers=2, chunk_size=8) as executor:
+        summary = run_batch(None, lines, out, err, executor)
+    assert out.getvalue().splitlines()[:50] == [str(2 * i) for i in range(50)]
+    assert err.getvalue() == "line 51: Division by zero is not allowed.\n"
+    assert summary.errors == 1
+
+
+def test_rejects_bad_chunk_size():
+    '''Chunk size must be positive'''
+    with pytest.raises(ValueError):
+        ParallelExecutor(chunk_size=0)
+
+
+def test_worker_metrics_are_merged(tmp_path, capsys):
+    '''With --workers, the metrics file covers every worker; stats says why it cannot answer'''
+    source = tmp_path / "jobs.txt"
+    source.write_text("".join(f"add {i} 1\n" for i in range(30)) + "stats\n")
+    metrics_file = tmp_path / "m.prom"
+    assert main.main(["--batch", str(source), "--workers", "2", "--metrics-file", str(metrics_file)]) == 1
+    output = capsys.readouterr().out.splitlines()
+    assert output[:30] == [str(i + 1) for i in range(30)]
+    assert output[30] == "Error: stats is not available with --workers; use --metrics-file for the merged metrics"
+    assert 'calculator_command_calls_total{command="add"} 30' in metrics_file.read_text()
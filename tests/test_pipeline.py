@@ -0,0 +1,102 @@
+'''Tests for "add 1 2 | multiply 3" command pipelines.'''
+from decimal import Decimal
+import io
+
+import pytest
+
+import main
+from app.batch_mode import run_batch
+from app.commands.add import AddCommand
+from app.pipeline import compile_pipeline, split_pipe, split_stages
+
+
+def test_split_pipe_and_stages():
+    '''Pipes split stages with or without spaces; commands are case-insensitive'''
+    tokens = split_pipe("add 1 2|MULTIPLY 3 | divide 4")
+    assert tokens == ["add", "1", "2", "|", "MULTIPLY", "3", "|", "divide", "4"]
+    assert split_stages(tokens) == [("add", ["1", "2"]), ("multiply", ["3"]), ("divide", ["4"])]
+    with pytest.raises(ValueError, match="Empty pipeline stage"):
+        split_stages(split_pipe("add 1 | | divide 2"))
+    with pytest.raises(ValueError, match="Empty pipeline stage"):
+        split_stages(split_pipe("add 1 |"))
+
+
+def test_values_pass_between_stages_as_numbers(command_handler):
+    '''Each result reaches the next command as a number, never as text'''
+    pipeline = compile_pipeline(command_handler, split_pipe("multiply 3037000499 3037000499 | add 1"))
+    assert pipeline.stages[1][2] == (1,)  # operands are parsed once, at compile time
+    assert pipeline() == 3037000499 ** 2 + 1  # exact: no float round trip in between
+    assert command_handler.evaluate_pipeline(split_pipe("add 1 2 | multiply 3 | divide 4")) == 2.25
+    command_handler.use_backend("decimal")
+    assert command_handler.evaluate_pipeline(split_pipe("add 0.1 0.2 | multiply 3")) == Decimal("0.9")
+    command_handler.use_backend("fraction")
+    assert command_handler.evaluate_pipeline(split_pipe("divide 1 3 | multiply 3")) == 1
+
+
+def test_huge_exact_values_meet_floats(command_handler):
+    '''An exact product beyond float range flows into a float stage as an infinity'''
+    huge = "1" + "0" * 200
+    assert command_handler.evaluate_pipeline(split_pipe(f"multiply {huge} {huge} | add 0.5")) == float("inf")
+    assert command_handler.Execute_Command("subtract", "1" + "0" * 400, "1.5") == float("inf")
+
+
+def test_compiled_pipelines_are_cached(command_handler):
+    '''A repeated pipeline is compiled once, until the commands or backend change'''
+    tokens = split_pipe("add 1 2 | multiply 3")
+    assert command_handler.evaluate_pipeline(tokens) == 9
+    cache = command_handler.pipelines
+    pipeline = cache.get(tokens)
+    assert command_handler.evaluate_pipeline(tokens) == 9
+    assert (cache.hits, cache.misses) == (2, 1) and len(cache) == 1
+    command_handler.Register_Command("add", AddCommand(accurate=True))
+    assert cache.get(tokens) is not pipeline
+    command_handler.use_backend("decimal")
+    assert command_handler.evaluate_pipeline(tokens) == Decimal(9)
+    assert cache.misses == 3
+
+
+def test_pipeline_errors(command_handler):
+    '''Unknown commands, bad operands and failed stages raise like evaluate'''
+    with pytest.raises(KeyError, match="power: Command not found"):
+        command_handler.evaluate_pipeline(split_pipe("add 1 2 | power 2"))
+    with pytest.raises(ValueError, match="Invalid input"):
+        command_handler.evaluate_pipeline(split_pipe("add 1 2 | multiply x"))
+    with pytest.raises(ValueError, match="Division by zero"):
+        command_handler.evaluate_pipeline(split_pipe("add 1 2 | divide 0 | add 1"))
+
+
+def test_pipelines_in_batch_mode(command_handler):
+    '''Batch lines may be pipelines; errors name the failing command'''
+    lines = io.StringIO("add 1 2 | multiply 3 | divide 4\nadd 1 2|multiply 3\nadd 1 | power 2\nmultiply 2 3\n")
+    out, err = io.StringIO(), io.StringIO()
+    summary = run_batch(command_handler, lines, out, err)
+    assert out.getvalue().splitlines() == ["2.25", "9", "Error: power: Command not found", "6"]
+    assert summary.errors == 1
+
+
+def test_batch_lines_starting_with_a_pipe(command_handler):
+    '''A leading pipe is an empty first stage, not an unknown command'''
+    lines = io.StringIO("| add 1\n|add 1\nadd 1 2 |\n")
+    out, err = io.StringIO(), io.StringIO()
+    summary = run_batch(command_handler, lines, out, err)
+    assert out.getvalue().splitlines() == ["Error: Empty pipeline stage."] * 3
+    assert summary.errors == 3
+
+
+def test_pipeline_metrics_record_every_stage():
+    '''With metrics on, every stage is counted under its own command'''
+    handler = main.build_command_handler()
+    handler.evaluate_pipeline(split_pipe("add 1 2 | multiply 3 | multiply 2"))
+    metrics = handler.metrics()
+    assert metrics["add"]["calls"] == 1 and metrics["multiply"]["calls"] == 2
+
+
+def test_pipelines_in_repl(monkeypatch, capsys):
+    '''The REPL runs a line with pipes as a pipeline'''
+    inputs = iter(["add 1 2 | multiply 3", "add 1 | nope", "divide 1 0 | add 1", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(inputs))
+    main.repl(main.build_command_handler(metrics=False))
+    output = capsys.readouterr().out
+    assert "Result: 9" in output
+    assert "nope: Command not found" in output
+    assert "Error: Division by zero is not allowed." in output
@@ -0,0 +1,130 @@
+'''Tests for plugin discovery and the cached plugin manifest.'''
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import main
+from app import register_commands
+from app.commands import CommandHandler
+from app.plugins import discovery
+from app.plugins.discovery import discover_plugins, load_manifest, register_plugins, scan_source
+
+PLUGIN_SOURCE = '''
+from app.commands import Command
+
+class Hello(Command):
+    def __init__(self, command_handler):
+        self.command_handler = command_handler
+
+    def execute(self, *args):
+        print("hello", *args)
+
+class LoudHello(Hello):
+    pass
+
+class NotACommand:
+    pass
+'''
+
+
+@pytest.fixture
+def plugin_dir(tmp_path):
+    '''A plugin directory with one module defining two commands'''
+    directory = tmp_path / "plugins"
+    directory.mkdir()
+    (directory / "__init__.py").write_text("")
+    (directory / "hello.py").write_text(PLUGIN_SOURCE)
+    return directory
+
+
+def test_scan_source_finds_command_subclasses():
+    '''Direct and indirect Command subclasses are found, other classes are not'''
+    assert scan_source(PLUGIN_SOURCE) == ["Hello", "LoudHello"]
+
+
+def test_discovers_bundled_plugins(tmp_path):
+    '''The plugins shipped in app/plugins are all discovered'''
+    plugins = discover_plugins(manifest_path=str(tmp_path / "manifest.json"), entry_points=False)
+    assert plugins == {
+        "add": "app.plugins.addcommand:Add",
+        "divide": "app.plugins.dividecommand:Divide",
+        "menu": "app.plugins.menucommand:Menu",
+        "multiply": "app.plugins.multiplycommand:Multiply",
+        "subtract": "app.plugins.subtractcommand:Subtract",
+    }
+
+
+def test_manifest_is_reused_until_a_file_changes(plugin_dir, monkeypatch):
+    '''A second start reads the manifest; touching a plugin file triggers a rescan'''
+    manifest_path = str(plugin_dir.parent / "manifest.json")
+    first = load_manifest(str(plugin_dir), "plugins", manifest_path, entry_points=False)
+    assert first["plugins"] == {"hello": "plugins.hello:Hello", "loudhello": "plugins.hello:LoudHello"}
+    assert json.loads((plugin_dir.parent / "manifest.json").read_text())["plugins"] == first["plugins"]
+
+    def no_scan(*args):
+        raise AssertionError("plugin directory rescanned")
+    monkeypatch.setattr(discovery, "scan_directory", no_scan)
+    assert load_manifest(str(plugin_dir), "plugins", manifest_path, entry_points=False) == first
+
+    monkeypatch.undo()
+    (plugin_dir / "hello.py").write_text(PLUGIN_SOURCE.replace("LoudHello", "QuietHello"))
+    stat = os.stat(plugin_dir / "hello.py")
+    os.utime(plugin_dir / "hello.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    rescanned = load_manifest(str(plugin_dir), "plugins", manifest_path, entry_points=False)
+    assert "quiethello" in rescanned["plugins"] and "loudhello" not in rescanned["plugins"]
+
+
+def test_entry_points_are_merged(tmp_path, monkeypatch):
+    '''Entry point plugins are listed, but bundled plugins keep their names'''
+    monkeypatch.setattr(discovery, "scan_entry_points",
+                        lambda group=discovery.ENTRY_POINT_GROUP: {"power": "ext.power:Power", "add": "ext.add:Add"})
+    plugins = discover_plugins(manifest_path=str(tmp_path / "manifest.json"))
+    assert plugins["power"] == "ext.power:Power"
+    assert plugins["add"] == "app.plugins.addcommand:Add"
+
+
+def test_registered_plugins_run_lazily(tmp_path, capsys):
+    '''Plugins get the handler they are registered with and run on first use'''
+    handler = CommandHandler()
+    names = register_plugins(handler, manifest_path=str(tmp_path / "manifest.json"), entry_points=False)
+    assert "menu" in names and handler.commands == {}
+    handler.Execute_Command("add", "2", "3")
+    assert "2 + 3 = 5" in capsys.readouterr().out
+    assert handler.commands["add"].command_handler is handler
+
+
+def test_menu_does_not_import_other_plugins(tmp_path):
+    '''Menu lists every plugin from the manifest without importing the others'''
+    code = (
+        "import sys\n"
+        "from app.commands import CommandHandler\n"
+        "from app.plugins.discovery import register_plugins\n"
+        "handler = CommandHandler()\n"
+        f"register_plugins(handler, manifest_path={str(tmp_path / 'manifest.json')!r}, entry_points=False)\n"
+        "handler.Execute_Command('menu')\n"
+        "print(sorted(m for m in sys.modules if m.startswith('app.plugins.') and m != 'app.plugins.discovery'))\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert "-> divide" in completed.stdout
+    assert completed.stdout.strip().splitlines()[-1] == "['app.plugins.menucommand']"
+
+
+def test_plugins_do_not_replace_commands(tmp_path):
+    '''Built-in commands keep their names; only new plugins such as menu are added'''
+    handler = register_commands(CommandHandler())
+    names = register_plugins(handler, manifest_path=str(tmp_path / "manifest.json"), entry_points=False)
+    assert names == ["menu"]
+    assert handler.lazy_commands["add"][0] == "app.commands.add:AddCommand"
+
+
+def test_batch_mode_with_plugins(tmp_path, capsys):
+    '''--plugins --batch still prints the built-in commands' results'''
+    source = tmp_path / "commands.txt"
+    source.write_text("add 2 3\nmultiply 2 3 4\ndivide 1 0\n")
+    assert main.main(["--plugins", "--no-metrics", "--batch", str(source)]) == 1
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == ["5", "24", "Error: Division by zero is not allowed."]
+    assert "(1 errors)" in captured.err
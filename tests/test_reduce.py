@@ -0,0 +1,127 @@
+'''Tests for the streaming reductions behind the arithmetic commands.'''
+import io
+import itertools
+import math
+import operator
+import random
+import tracemalloc
+
+import pytest
+
+from app.commands.add import AddCommand
+from app.commands.reduce import (CHUNK_SIZE, BalancedReduction, main, pairwise_sum, read_tokens, reduce_add,
+                                 reduce_divide, reduce_multiply, reduce_subtract, tree_product, wide_ints)
+
+
+def test_exact_integer_fast_paths():
+    '''Integer tokens are reduced exactly, beyond float precision'''
+    assert reduce_add(["9007199254740993", "1"]) == 9007199254740994
+    assert reduce_subtract(["9007199254740993", "-1", "+1"]) == 9007199254740993
+    assert reduce_multiply(["3037000499", "3037000499"]) == 3037000499 ** 2
+    assert reduce_add([1.5, 2]) == 3.5  # float operands are never truncated to int
+
+
+def test_balanced_reductions_match_folds():
+    '''Product trees and pairwise sums, whole or streamed, give the left fold's exact result'''
+    generator = random.Random(22)
+    numbers = [generator.randrange(10 ** 19, 10 ** 25) for _ in range(1001)]
+    assert tree_product(numbers) == math.prod(numbers)
+    assert pairwise_sum(numbers) == sum(numbers)
+    assert wide_ints(numbers) and not wide_ints(numbers[:2]) and not wide_ints(list(range(100)))
+    streamed = BalancedReduction(operator.mul)
+    assert not streamed
+    for start in range(0, len(numbers), 97):
+        streamed.push(tree_product(numbers[start:start + 97]), len(numbers[start:start + 97]))
+    assert streamed.result() == math.prod(numbers)
+    # Order is kept, so non-commutative combinations work too
+    words = BalancedReduction(operator.add)
+    for word in "abcdefg":
+        words.push(word)
+    assert words.result() == "abcdefg"
+    # Integer operands keep their exact product, however wide
+    assert reduce_multiply(map(str, numbers)) == math.prod(numbers)
+    assert reduce_multiply(map(str, numbers[:10])) == math.prod(numbers[:10])
+    # Streamed over several chunks, the chunks' products are combined as a tree, still exactly
+    streamed_numbers = numbers * 5
+    assert reduce_multiply(iter(map(str, streamed_numbers))) == math.prod(streamed_numbers)
+    assert reduce_multiply(iter(["1"] * (2 * CHUNK_SIZE) + ["3", "0.5"])) == 1.5  # exact chunks, then a float one
+
+
+def test_divide_once_by_the_product():
+    '''Divisors are multiplied first, without overflow or underflow, then divided once'''
+    assert reduce_divide(["1"] + ["1e200"] * 3 + ["1e-200"] * 3) == pytest.approx(1)  # 0 when divided in turn
+    assert reduce_divide(("1e-300", "1e200", "1e-200")) == 1e-300  # dividing in turn underflowed to 0
+    assert reduce_divide(["1e300"] + ["2"] * 1000) == 1e300 / 2 ** 1000
+    # Integer operands are divided exactly and rounded once
+    assert reduce_divide(("9007199254740993", "3")) == 3002399751580331
+    assert reduce_divide([str(10 ** 400), str(10 ** 399)]) == 10
+    assert reduce_divide(["1", str(10 ** 400)]) == 0
+    assert reduce_divide(("6", "3", "2", "1.5")) == reduce_divide(iter(["6", "3", "2", "1.5"])) == 1 / 1.5
+    with pytest.raises(ValueError, match="Division by zero"):
+        reduce_divide(itertools.chain(["1"], itertools.repeat("2", CHUNK_SIZE), ["0"]))
+
+
+def test_accurate_summation():
+    '''accurate=True avoids the rounding drift of naive summation'''
+    tokens = ["0.1"] * 10
+    assert reduce_add(tokens) == 0.9999999999999999
+    assert reduce_add(tokens, accurate=True) == 1
+    big = ["1e16", "1", "-1e16"] * (CHUNK_SIZE + 1)
+    assert reduce_add(big, accurate=True) == CHUNK_SIZE + 1
+    assert AddCommand(accurate=True).compute(*tokens) == 1
+
+
+def test_results_match_commands():
+    '''Floats, errors and whole-number results behave as the commands always did'''
+    assert reduce_add(["2.5", "2.5"]) == 5 and isinstance(reduce_add(["2.5", "2.5"]), int)
+    assert reduce_add([]) == 0 and reduce_multiply([]) == 1
+    assert reduce_divide(["9", "4"]) == 2.25
+    with pytest.raises(ValueError, match="Invalid input"):
+        reduce_add(["1", "two"])
+    with pytest.raises(ValueError, match="Division by zero"):
+        reduce_divide(["1", "0.0"])
+    with pytest.raises(ValueError, match="at least two"):
+        reduce_divide(["1"])
+    with pytest.raises(ValueError, match="at least one"):
+        reduce_subtract(iter([]))
+
+
+def test_ints_beyond_float_range_with_floats():
+    '''An exact int too big for a float meets a float as an infinity, not an OverflowError'''
+    huge = 10 ** 400
+    assert reduce_subtract([str(huge), "1.5"]) == math.inf
+    assert reduce_subtract(["1.5", str(huge)]) == -math.inf
+    assert reduce_subtract([huge, "1.5"]) == reduce_add([huge, "0.5"]) == math.inf
+    assert reduce_add([-huge, 0.5], accurate=True) == -math.inf
+    assert reduce_multiply([huge, "0.5"]) == math.inf
+    assert reduce_subtract([huge, "1"]) == huge - 1  # exact when both sides are ints
+
+
+def test_generators_are_consumed_in_constant_memory():
+    '''A long generator is reduced without materializing it'''
+    count = 500_000
+    tracemalloc.start()
+    try:
+        assert reduce_add(str(i % 10) for i in range(count)) == 45 * count // 10
+        assert reduce_multiply(itertools.repeat("1.0000001", count)) == pytest.approx(1.0000001 ** count)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 2_000_000
+
+
+def test_read_tokens_across_blocks():
+    '''Tokens split across read blocks are joined back together'''
+    source = io.StringIO("12 345\n6789  0.5\n-7")
+    assert list(read_tokens(source, block_size=3)) == ["12", "345", "6789", "0.5", "-7"]
+
+
+def test_reduce_cli(tmp_path, capsys):
+    '''python -m app.commands.reduce streams a file'''
+    numbers = tmp_path / "numbers.txt"
+    numbers.write_text("\n".join(["0.1"] * 10))
+    assert main(["add", str(numbers), "--accurate"]) == 0
+    assert capsys.readouterr().out == "1\n"
+    numbers.write_text("1 x")
+    assert main(["multiply", str(numbers)]) == 1
+    assert "Invalid input" in capsys.readouterr().err
@@ -0,0 +1,123 @@
+'''Tests for the command registry: snapshots, aliases, abbreviations and completion.'''
+import io
+
+import pytest
+
+import main
+from app import register_commands
+from app.batch_mode import run_batch
+from app.commands import CommandHandler
+from app.commands.add import AddCommand
+from app.commands.registry import PrefixTrie, Registry
+from app.pipeline import split_pipe
+
+
+def test_prefix_trie():
+    '''Completions are sorted and every prefix of a word finds it'''
+    trie = PrefixTrie(["multiply", "menu", "add", "menu"])
+    assert trie.complete("m") == ("menu", "multiply")
+    assert trie.complete("mul") == trie.complete("multiply") == ("multiply",)
+    assert trie.complete("") == ("add", "menu", "multiply")
+    assert trie.complete("x") == trie.complete("addition") == ()
+
+
+def test_resolve_names_aliases_and_abbreviations():
+    '''Names win over aliases, aliases over abbreviations; ambiguity raises'''
+    registry = Registry(0, ["add", "menu", "multiply", "addall"], {"+": "add", "sum": "add"})
+    assert registry.resolve("add") == "add"
+    assert registry.resolve("+") == "add"
+    assert registry.resolve("mul") == "multiply"
+    assert registry.resolve("su") == "add"  # an abbreviation of an alias
+    assert registry.resolve("nope") is None and registry.resolve("") is None
+    with pytest.raises(KeyError, match="m: Ambiguous command, could be menu, multiply"):
+        registry.resolve("m")
+    with pytest.raises(KeyError, match="addall"):
+        registry.resolve("ad")
+
+
+def test_registry_is_a_cached_snapshot(command_handler):
+    '''registry() returns the same object until the commands change'''
+    registry = command_handler.registry()
+    assert command_handler.registry() is registry
+    assert command_handler.get_registered_commands() is registry.names
+    assert registry.names == ("add", "divide", "multiply", "stats", "subtract")
+    command_handler.Register_Command("addall", AddCommand())
+    assert command_handler.registry() is not registry
+    assert "addall" in command_handler.registry() and "addall" not in registry
+
+
+def test_aliases_are_validated(command_handler):
+    '''An alias needs an existing command and must not hide one'''
+    with pytest.raises(KeyError, match="power: Command not found"):
+        command_handler.register_alias("^", "power")
+    with pytest.raises(ValueError, match="already a command"):
+        command_handler.register_alias("add", "multiply")
+    command_handler.register_alias("times", "multiply")
+    assert command_handler.evaluate("times", "2", "3") == 6
+
+
+def test_every_entry_point_resolves(command_handler):
+    '''evaluate, Execute_Command and pipelines accept aliases and abbreviations'''
+    assert command_handler.evaluate("+", "1", "2") == 3
+    assert command_handler.evaluate("mul", "2", "3") == 6
+    assert command_handler.Execute_Command("div", "6", "3") == 2
+    assert command_handler.evaluate_pipeline(split_pipe("+ 1 2 | * 3 | sub 1")) == 8
+    with pytest.raises(KeyError, match="Command not found"):
+        command_handler.evaluate("power", "2", "3")
+
+
+def test_batches_report_bad_lookups(command_handler, caplog):
+    '''execute_batch logs ambiguous and unloadable commands and returns None, like Execute_Command'''
+    assert command_handler.execute_batch("s", [[1], [2]]) is None
+    assert "Ambiguous command" in caplog.text
+    command_handler.register_lazy("broken", "app.commands.missing:Missing")
+    assert command_handler.execute_batch("broken", [[1], [2]]) is None
+    assert "could not be loaded" in caplog.text
+    assert command_handler.execute_batch("sub", [[5], [2]]).values == [3]
+
+
+def test_metrics_use_command_names():
+    '''Calls made through an alias are recorded under the command's name'''
+    handler = main.build_command_handler()
+    handler.evaluate("+", "1", "2")
+    handler.Execute_Command("ad", "1", "2")
+    handler.evaluate_pipeline(split_pipe("add 1 | + 2"))
+    assert handler.metrics()["add"]["calls"] == 4 and "+" not in handler.metrics()
+
+
+def with_menu():
+    '''Handler with the built-in commands and the Menu plugin'''
+    handler = register_commands(CommandHandler())
+    handler.register_lazy("menu", "app.plugins.menucommand:Menu", handler)
+    return handler
+
+
+def test_batch_mode_resolves():
+    '''Batch lines may use aliases and abbreviations; ambiguous ones are errors'''
+    handler = with_menu()
+    lines = io.StringIO("+ 1 2\nmul 2 3\nm 1 2\n")
+    out, err = io.StringIO(), io.StringIO()
+    run_batch(handler, lines, out, err)
+    assert out.getvalue().splitlines() == ["3", "6", "Error: m: Ambiguous command, could be menu, multiply"]
+
+
+def test_menu_plugin_lists_the_registry(capsys):
+    '''The Menu plugin lists the registry's names'''
+    handler = with_menu()
+    handler.Execute_Command("me")
+    output = capsys.readouterr().out
+    assert all(f"-> {name}" in output for name in handler.registry().names)
+
+
+def test_repl_resolves_and_completes(monkeypatch, capsys, command_handler):
+    '''The REPL accepts abbreviations and lists commands; the completer offers names and aliases'''
+    inputs = iter(["mul", "2 3", "menu", "s", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(inputs))
+    main.repl(command_handler)
+    output = capsys.readouterr().out
+    assert "Result: 6" in output
+    assert "Available commands: add, divide, multiply, stats, subtract" in output
+    assert "s: Ambiguous command, could be stats, subtract" in output
+    complete = main.completer(command_handler)
+    assert [complete("D", state) for state in range(3)] == ["divide", None, None]
+    assert complete("+", 0) == "+"
@@ -0,0 +1,128 @@
+'''Tests for the asyncio calculator server, run entirely against localhost'''
+import asyncio
+import json
+import pytest
+import main
+from app.server import CalculatorServer
+
+
+def run_with_server(client, **options):
+    '''Start a server on a free port, run the client coroutine against it, then shut down'''
+    async def scenario():
+        server = CalculatorServer(main.build_command_handler(), port=0, http_port=0, **options)
+        await server.start()
+        try:
+            return await client(server)
+        finally:
+            await server.shutdown()
+    return asyncio.run(scenario())
+
+
+async def send_lines(server, lines):
+    '''Pipeline all lines at once and read one response per line'''
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    writer.write("".join(f"{line}\n" for line in lines).encode())
+    await writer.drain()
+    responses = [(await reader.readline()).decode().strip() for _ in lines]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def test_pipelined_requests_answered_in_order():
+    '''Responses to pipelined requests come back in request order'''
+    lines = [f"add {i} 1" for i in range(100)] + ["divide 1 0", "bogus 1"]
+    responses = run_with_server(lambda server: send_lines(server, lines), max_pipeline=4)
+    assert responses[:100] == [str(i + 1) for i in range(100)]
+    assert responses[100:] == ["Error: Division by zero is not allowed.", "Error: bogus: Command not found"]
+
+
+def test_session_history_is_per_connection():
+    '''Each connection only sees its own history'''
+    async def client(server):
+        first = await send_lines(server, ["multiply 2 3", "history"])
+        second = await send_lines(server, ["history"])
+        return first, second
+    first, second = run_with_server(client)
+    assert first[0] == "6"
+    assert json.loads(first[1]) == [["multiply 2 3", "6"]]
+    assert json.loads(second[0]) == []
+
+
+def test_session_history_is_bounded():
+    '''A connection's history keeps only its most recent max_history pairs'''
+    lines = [f"add {i} 1" for i in range(10)] + ["history"]
+    responses = run_with_server(lambda server: send_lines(server, lines), max_history=3)
+    assert json.loads(responses[-1]) == [[f"add {i} 1", str(i + 1)] for i in range(7, 10)]
+    with pytest.raises(ValueError, match="max_history"):
+        CalculatorServer(main.build_command_handler(), max_history=0)
+
+
+def test_heavy_requests_run_in_executor():
+    '''Requests above the size threshold are evaluated off the event loop'''
+    big = "9" * 150
+    responses = run_with_server(lambda server: send_lines(server, [f"multiply {big} {big}", "add 1 1"]), heavy_threshold=100)
+    # Integer operands are multiplied exactly
+    assert responses == [str(int(big) ** 2), "2"]
+
+
+def test_long_lines():
+    '''Lines past asyncio's 64 KiB default are served; lines past max_line get an error, in order'''
+    operands = " ".join(["12345678901234567890"] * 4500)  # about 94 KB
+    lines = [f"add {operands}", "add 1 1", "multiply 2 3"]
+    responses = run_with_server(lambda server: send_lines(server, lines), max_line=200_000)
+    assert responses == [str(12345678901234567890 * 4500), "2", "6"]
+    responses = run_with_server(lambda server: send_lines(server, lines), max_line=50_000)
+    assert responses == ["Error: Request line longer than 50000 bytes", "2", "6"]
+
+
+async def http_request(server, request: bytes):
+    '''Send a raw HTTP request and return (status, json_body)'''
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.http_port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+@pytest.mark.parametrize("payload,response", [
+    ({"command": "add", "args": ["1", "2"]}, (200, {"result": 3})),
+    ({"command": "divide", "args": [1, 0]}, (400, {"error": "Division by zero is not allowed."})),
+    ({"command": "multiply", "args": ["1" + "0" * 99] * 50}, (200, {"result": "1" + "0" * 4950})),
+    ({"args": ["1", "2"]}, (400, {"error": 'Request body must be a JSON object with a "command"'})),
+    ([1, 2], (400, {"error": 'Request body must be a JSON object with a "command"'})),
+    ({"command": "add", "args": 12}, (400, {"error": '"args" must be a JSON list'})),
+])
+def test_http_execute(payload, response):
+    '''POST /execute evaluates a JSON request'''
+    body = json.dumps(payload).encode()
+    request = b"POST /execute HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+    assert run_with_server(lambda server: http_request(server, request)) == response
+
+
+def test_http_health_and_not_found():
+    '''GET /health answers and unknown paths are 404'''
+    async def client(server):
+        health = await http_request(server, b"GET /health HTTP/1.1\r\n\r\n")
+        missing = await http_request(server, b"GET /nope HTTP/1.1\r\n\r\n")
+        return health, missing
+    health, missing = run_with_server(client)
+    assert health == (200, {"status": "ok"})
+    assert missing[0] == 404
+
+
+def test_graceful_shutdown_closes_idle_connections():
+    '''Shutdown finishes open connections instead of hanging on them'''
+    async def scenario():
+        server = CalculatorServer(main.build_command_handler(), port=0)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"add 2 2\n")
+        await writer.drain()
+        assert (await reader.readline()) == b"4\n"
+        await asyncio.wait_for(server.shutdown(timeout=2), timeout=5)
+        assert await reader.read() == b""
+        writer.close()
+    asyncio.run(scenario())
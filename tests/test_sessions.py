@@ -0,0 +1,132 @@
+'''Tests for session-scoped histories, quotas and the session registry.'''
+import asyncio
+from decimal import Decimal
+import threading
+
+import pytest
+
+from app.calculator import Calculator
+from app.calculator.calculations import Calculations
+from app.calculator.operations import divide
+from app.calculator.sessions import Session, SessionRegistry, current_history, entry_bytes
+
+
+class FakeClock:
+    '''A clock the test moves by hand.'''
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_session_isolates_history(empty_history):
+    '''Inside a session the Calculator records there, and nowhere else'''
+    session = Session("tenant")
+    with session.activate():
+        assert current_history() is session
+        assert Calculator.add(Decimal(1), Decimal(2)) == 3
+        Calculator.defer(Decimal(6), Decimal(3), divide)
+    assert current_history() is Calculations
+    assert Calculations.get_history() == []
+    assert [calc.perform() for calc in session.get_history()] == [3, 2]
+    assert session.get_latest().perform() == 2
+    assert len(session.find_by_operation("add")) == 1
+    Calculator.multiply(Decimal(2), Decimal(2))
+    assert len(Calculations.get_history()) == 1 and len(session) == 2
+
+
+def test_sessions_follow_threads_and_tasks(empty_history):
+    '''Each thread and asyncio task records into the session it activated'''
+    first, second = Session("first"), Session("second")
+
+    def work(session):
+        with session.activate():
+            for i in range(100):
+                Calculator.add(Decimal(i), Decimal(0))
+
+    workers = [threading.Thread(target=work, args=(session,)) for session in (first, second)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    async def task(session):
+        with session.activate():
+            for i in range(10):
+                Calculator.subtract(Decimal(i), Decimal(0))
+                await asyncio.sleep(0)
+
+    async def both():
+        await asyncio.gather(task(first), task(second))
+
+    asyncio.run(both())
+    assert len(first) == len(second) == 110
+    assert len(first.find_by_operation("subtract")) == 10
+    assert Calculations.get_history() == []
+
+
+def test_entry_quota_evicts_oldest(empty_history):
+    '''max_entries keeps the newest calculations'''
+    session = Session("small", max_entries=3)
+    with session.activate():
+        for i in range(5):
+            Calculator.add(Decimal(i), Decimal(0))
+    assert [calc.a for calc in session.get_history()] == [2, 3, 4]
+    assert session.evicted == 2
+    assert session.bytes == sum(entry_bytes(calc) for calc in session.get_history())
+
+
+def test_memory_quota_evicts_oldest(empty_history):
+    '''max_bytes bounds the estimated memory; a single oversized entry is still kept'''
+    Calculator.add(Decimal(1), Decimal(1))
+    one = entry_bytes(Calculations.get_latest())
+    session = Session("bounded", max_bytes=one * 4)
+    with session.activate():
+        for _ in range(10):
+            Calculator.add(Decimal(1), Decimal(1))
+    assert len(session) == 4 and session.bytes <= one * 4
+    tiny = Session("tiny", max_bytes=1)
+    with tiny.activate():
+        Calculator.add(Decimal(1), Decimal(1))
+    assert len(tiny) == 1
+    with pytest.raises(ValueError):
+        Session("broken", max_entries=0)
+
+
+def test_registry_lists_and_releases_idle_sessions():
+    '''The registry creates sessions with default quotas and releases idle ones'''
+    clock = FakeClock()
+    registry = SessionRegistry(max_entries=10, idle_timeout=60, clock=clock)
+    alice = registry.get("alice")
+    assert registry.get("alice") is alice and alice.max_entries == 10
+    bob = registry.get("bob", max_entries=2)
+    assert bob.max_entries == 2
+    with bob.activate():
+        Calculator.add(Decimal(1), Decimal(2))
+    clock.now = 30
+    with alice.activate():
+        Calculator.add(Decimal(1), Decimal(2))
+    assert list(registry.sessions()) == ["alice", "bob"]
+    assert registry.sessions()["bob"]["idle_seconds"] == 30
+    assert registry.total_bytes() == alice.bytes + bob.bytes > 0
+
+    clock.now = 70
+    assert registry.release_idle() == ["bob"]
+    assert "bob" not in registry and "alice" in registry
+    assert registry.release("alice") is alice and len(registry) == 0
+    with pytest.raises(ValueError):
+        SessionRegistry().release_idle()
+
+
+def test_sessions_are_not_journaled(empty_history, tmp_path):
+    '''Only the shared history is persisted to the journal'''
+    path = str(tmp_path / "history.journal")
+    Calculator.open_journal(path)
+    with Session("tenant").activate():
+        Calculator.add(Decimal(1), Decimal(2))
+    Calculator.add(Decimal(3), Decimal(4))
+    Calculator.close_journal()
+    Calculations.clear_history()
+    assert Calculator.open_journal(path) == 1
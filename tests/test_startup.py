@@ -0,0 +1,55 @@
+'''Tests for lazy command registration and the import-time budget.'''
+import subprocess
+import sys
+
+import pytest
+
+from app import COMMANDS, HANDLER_COMMANDS, register_commands
+from app.commands import CommandHandler
+from benchmarks.bench_startup import APP_IMPORT_BUDGET_US, best_profile, profile_imports
+
+
+def test_lazy_command_loads_on_first_use():
+    '''A lazily registered command is listed, then imported only when executed'''
+    handler = register_commands(CommandHandler())
+    assert sorted(handler.get_registered_commands()) == sorted([*COMMANDS, *HANDLER_COMMANDS])
+    assert handler.commands == {}
+    assert handler.Execute_Command("add", "1", "2") == 3
+    assert "add" in handler.commands and "add" not in handler.lazy_commands
+    assert sorted(handler.get_registered_commands()) == sorted([*COMMANDS, *HANDLER_COMMANDS])
+
+
+def test_lazy_command_with_bad_target():
+    '''A lazy command that cannot be imported behaves like a missing command'''
+    handler = CommandHandler()
+    handler.register_lazy("broken", "app.commands.nope:Nothing")
+    assert handler.Execute_Command("broken", "1") is None
+    with pytest.raises(KeyError, match="could not be loaded"):
+        handler.evaluate("broken", "1")
+    with pytest.raises(ValueError):
+        handler.register_lazy("broken", "app.commands.add")
+
+
+def test_register_command_replaces_lazy_entry():
+    '''An eagerly registered instance takes over a lazy name'''
+    from app.commands.add import AddCommand
+    handler = register_commands(CommandHandler())
+    command = AddCommand()
+    handler.Register_Command("add", command)
+    assert handler.commands["add"] is command
+    assert handler.get_registered_commands().count("add") == 1
+
+
+def test_import_app_does_not_load_commands():
+    '''import app registers the commands without importing their modules'''
+    code = "import sys, app; print(sorted(m for m in sys.modules if m.startswith(('app.commands.', 'app.calculator', 'numpy', 'logging.'))))"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "[]"
+    assert "app.commands" in profile_imports().modules
+
+
+@pytest.mark.slow
+def test_startup_within_budget():
+    '''The app's own modules stay within the import-time budget'''
+    profile = best_profile(runs=3)
+    assert profile.app_us <= APP_IMPORT_BUDGET_US, profile.modules